@@ -0,0 +1,148 @@
+"""Result cache of the sales summaries."""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Optional
+
+from src.apps.sales.data_utils import DatasetVersion
+from src.apps.sales.dto import GroupedSummaryRequest, SummaryRequest
+from src.core.metrics import Gauge, registry
+from src.core.settings import settings
+
+
+def summary_cache_key(
+    summary_request: SummaryRequest, version: DatasetVersion
+) -> str:
+    """
+    Return the canonical key of a summary request on a dataset version.
+
+    Requests selecting the same data get the same key: categories and product
+    ids are sorted and deduplicated and empty filters are left out, the way
+    `filter_data` ignores them.
+    """
+
+    filters = summary_request.filters
+    canonical_filters: dict[str, list[Any]] = {}
+    if filters and filters.date_range:
+        canonical_filters["date_range"] = [
+            filters.date_range.start_date.isoformat(),
+            filters.date_range.end_date.isoformat(),
+        ]
+    if filters and filters.category:
+        canonical_filters["category"] = sorted(set(filters.category))
+    if filters and filters.product_ids:
+        canonical_filters["product_ids"] = sorted(set(filters.product_ids))
+
+    canonical_request = {
+        "dataset": [str(version.path), version.sha256],
+        "columns": list(dict.fromkeys(summary_request.columns or [])),
+        "statistics": sorted(summary_request.requested_statistics()),
+        "filters": canonical_filters,
+        "approximate": summary_request.approximate,
+        # streamed summaries have approximate quantiles
+        "streaming": settings.streaming,
+    }
+    if isinstance(summary_request, GroupedSummaryRequest):
+        canonical_request["group_by"] = summary_request.group_by
+    return hashlib.sha256(
+        json.dumps(canonical_request, sort_keys=True).encode()
+    ).hexdigest()
+
+
+class SummaryCache:
+    """Thread safe LRU cache with a time to live and hit/miss counters."""
+
+    __slots__ = (
+        "_clock",
+        "_entries",
+        "_lock",
+        "hits",
+        "max_size",
+        "misses",
+        "ttl",
+    )
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize an empty cache of at most max_size entries."""
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached entries, expired ones included."""
+
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        """Return whether the key is cached, without counting a lookup."""
+
+        with self._lock:
+            entry = self._entries.get(key)  # type: ignore[call-overload]
+            return entry is not None and entry[0] > self._clock()
+
+    @property
+    def hit_ratio(self) -> float:
+        """Return the share of lookups that were hits."""
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value of the key, None if missing or expired."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any) -> None:
+        """Cache the value, evicting the least recently used entries."""
+
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+summary_cache = SummaryCache(
+    max_size=settings.summary_cache_size, ttl=settings.summary_cache_ttl
+)
+registry.register(
+    Gauge(
+        "sales_summary_cache_hit_ratio",
+        "Share of the summary cache lookups that were hits.",
+        lambda: summary_cache.hit_ratio,
+    )
+)
@@ -0,0 +1,180 @@
+"""
+Binary columnar sidecar cache of the sales data file.
+
+Every column of a parsed sales DataFrame, as well as the arrays of the indexes
+built over it, is stored as a `.npy` file next to the CSV, in a directory
+named after the SHA-256 of the CSV it was built from.
+Loading memory-maps those files instead of parsing the CSV again, so the
+pages are shared between worker processes through the OS page cache.
+"""
+
+import contextlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = 5
+
+
+def sidecar_root(path: Path) -> Path:
+    """Return the directory holding the sidecar caches of a CSV file."""
+
+    return path.with_name(f"{path.name}.columnar")
+
+
+def _column_to_arrays(
+    column: pd.Series,
+) -> tuple[list[np.ndarray], dict[str, Any]]:
+    """Return the arrays stored for a column and its manifest entry."""
+
+    # nullable integers are stored as their values and their missing mask
+    integers = column.array
+    if isinstance(integers, pd.arrays.IntegerArray):
+        values = integers.to_numpy(dtype=integers.dtype.type, na_value=0)
+        return [values, integers.isna()], {"kind": "masked"}
+
+    if not isinstance(column.dtype, pd.CategoricalDtype) and (
+        column.dtype.kind in "biufcmM"
+    ):
+        return [column.to_numpy()], {"kind": "array"}
+
+    # anything that is not fixed width is stored dictionary encoded
+    categorical = pd.Categorical(column)
+    return [categorical.codes], {
+        "kind": "categorical",
+        "categories": [str(cat) for cat in categorical.categories],
+    }
+
+
+def _arrays_to_column(arrays: list[np.ndarray], entry: dict[str, Any]) -> Any:
+    """Rebuild a DataFrame column from its stored arrays without copying."""
+
+    if entry["kind"] == "categorical":
+        return pd.Categorical.from_codes(
+            arrays[0],  # type: ignore[arg-type]
+            categories=entry["categories"],
+        )
+    if entry["kind"] == "masked":
+        return pd.arrays.IntegerArray(arrays[0], arrays[1])
+    return arrays[0]
+
+
+def _load_array(path: Path) -> np.ndarray:
+    """Memory-map a stored array."""
+
+    # a plain ndarray view, the memmap stays alive as its base
+    return np.asarray(np.load(path, mmap_mode="r"))
+
+
+def read_sidecar(
+    path: Path, sha256: str, root: Optional[Path] = None
+) -> Optional[tuple[pd.DataFrame, dict[str, np.ndarray]]]:
+    """
+    Return the memory-mapped frame and index arrays of the CSV version.
+
+    The sidecars are looked up in root, next to the CSV by default.
+    """
+
+    directory = (sidecar_root(path) if root is None else root) / sha256
+    try:
+        manifest = json.loads((directory / MANIFEST_FILE).read_text())
+        if (
+            manifest["format"] != MANIFEST_FORMAT
+            or manifest["source_sha256"] != sha256
+        ):
+            return None
+
+        columns = {}
+        for entry in manifest["columns"]:
+            column_arrays = [
+                _load_array(directory / file) for file in entry["files"]
+            ]
+            if any(len(array) != manifest["rows"] for array in column_arrays):
+                return None
+            columns[entry["name"]] = _arrays_to_column(column_arrays, entry)
+
+        arrays = {
+            entry["name"]: _load_array(directory / entry["file"])
+            for entry in manifest["arrays"]
+        }
+
+    # a missing, partial or corrupt sidecar is a cache miss
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    # copy=False keeps every column backed by its memory-mapped file
+    return pd.DataFrame(columns, copy=False), arrays
+
+
+def write_sidecar(
+    path: Path,
+    sha256: str,
+    frame: pd.DataFrame,
+    arrays: dict[str, np.ndarray],
+    root: Optional[Path] = None,
+) -> None:
+    """
+    Store the frame and index arrays as the sidecar of the CSV version.
+
+    The sidecar is stored in root, next to the CSV by default, and replaces
+    the sidecars of the other versions of the CSV stored there. It is written
+    to a temporary directory first and renamed into place, so concurrent
+    readers and writers never observe a partial cache. Failures are ignored,
+    the sidecar is only an optimization.
+    """
+
+    root = sidecar_root(path) if root is None else root
+    directory = root / sha256
+    staging = root / f".{sha256}.{os.getpid()}.tmp"
+
+    try:
+        staging.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for position, name in enumerate(frame.columns):
+            column_arrays, entry = _column_to_arrays(frame[name])
+            files = [
+                f"{position}-{part}.npy" for part in range(len(column_arrays))
+            ]
+            for file, array in zip(files, column_arrays):
+                np.save(staging / file, array, allow_pickle=False)
+            entry.update(name=str(name), files=files)
+            entries.append(entry)
+
+        array_entries = []
+        for position, (name, array) in enumerate(arrays.items()):
+            array_entry = {"name": name, "file": f"index-{position}.npy"}
+            np.save(staging / array_entry["file"], array, allow_pickle=False)
+            array_entries.append(array_entry)
+
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "source_sha256": sha256,
+            "rows": len(frame),
+            "columns": entries,
+            "arrays": array_entries,
+        }
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest))
+        staging.rename(directory)
+
+    # another worker may have published the same version first
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+
+    _remove_stale_sidecars(root, keep=sha256)
+
+
+def _remove_stale_sidecars(root: Path, keep: str) -> None:
+    """Remove sidecars of previous CSV versions."""
+
+    for directory in root.iterdir():
+        if directory.name != keep and not directory.name.startswith("."):
+            # files still mapped by other workers stay valid once unlinked
+            with contextlib.suppress(OSError):
+                shutil.rmtree(directory)
@@ -0,0 +1,80 @@
+"""
+Conditional requests of the summaries.
+
+A summary only depends on its request and the version of the sales data, so
+its strong ETag is the canonical hash of both, the one of the summary cache,
+known before computing anything. A client or cache sending it back in
+`If-None-Match` gets a 304 Not Modified straight away while the sales data
+file is unchanged. `Last-Modified` is when the sales data was loaded.
+"""
+
+import hashlib
+from collections.abc import Sequence
+from email.utils import formatdate
+from http.client import NOT_MODIFIED
+from typing import Any, Optional, Union
+
+from fastapi.responses import Response
+
+from src.apps.sales.cache import summary_cache_key
+from src.apps.sales.data_utils import SalesSource
+from src.apps.sales.dto import SummaryRequest
+from src.core.settings import settings
+
+__all__ = ("NOT_MODIFIED_RESPONSE", "cache_headers", "not_modified")
+
+# documentation of the 304 of the summary routes
+NOT_MODIFIED_RESPONSE: dict[Union[int, str], dict[str, Any]] = {
+    NOT_MODIFIED: {
+        "description": (
+            "The summary is unchanged since the one of the ETag given in "
+            "If-None-Match, nothing was computed."
+        ),
+    },
+}
+
+
+def entity_tag(
+    summary_requests: Sequence[SummaryRequest], source: SalesSource
+) -> str:
+    """Return the strong ETag of the summaries of requests on the source."""
+
+    keys = [
+        summary_cache_key(summary_request, source.version)
+        for summary_request in summary_requests
+    ]
+    if len(keys) == 1:
+        return f'"{keys[0]}"'
+    return f'"{hashlib.sha256(",".join(keys).encode()).hexdigest()}"'
+
+
+def cache_headers(
+    summary_requests: Sequence[SummaryRequest], source: SalesSource
+) -> dict[str, str]:
+    """Return the ETag, Last-Modified and Cache-Control of summaries."""
+
+    return {
+        "ETag": entity_tag(summary_requests, source),
+        "Last-Modified": formatdate(source.loaded_at, usegmt=True),
+        "Cache-Control": settings.summary_cache_control,
+    }
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Return whether an If-None-Match header matches the ETag."""
+
+    # If-None-Match compares weakly, a weak tag matches its strong one
+    return any(
+        tag == "*" or tag.removeprefix("W/") == etag
+        for tag in (tag.strip() for tag in if_none_match.split(","))
+    )
+
+
+def not_modified(
+    if_none_match: Optional[str], headers: dict[str, str]
+) -> Optional[Response]:
+    """Return a 304 if the If-None-Match matches the ETag, None otherwise."""
+
+    if if_none_match is None or not _matches(if_none_match, headers["ETag"]):
+        return None
+    return Response(status_code=NOT_MODIFIED, headers=headers)
@@ -1,9 +1,41 @@
 """Constants used in the sales app."""
 
-EXPECTED_COLUMNS = {
-    "date",
-    "product_id",
-    "category",
-    "quantity_sold",
-    "price_per_unit",
+# dtype of every column of the sales data file; dates use the coarsest
+# resolution pandas supports, categories are stored dictionary encoded and
+# product ids may be missing
+SALES_SCHEMA = {
+    "date": "datetime64[s]",
+    "product_id": "Int64",
+    "category": "category",
+    "quantity_sold": "float64",
+    "price_per_unit": "float64",
 }
+
+EXPECTED_COLUMNS = frozenset(SALES_SCHEMA)
+
+# numeric columns holding the sales figures
+MEASURE_COLUMNS = ("quantity_sold", "price_per_unit")
+
+# statistics computed for every summarized column
+STATISTICS = (
+    "mean",
+    "median",
+    "mode",
+    "std_dev",
+    "percentile_25",
+    "percentile_75",
+)
+
+# statistics of approximate summaries, the mode needs every value counted
+APPROXIMATE_STATISTICS = tuple(stat for stat in STATISTICS if stat != "mode")
+
+# statistics that need the values in sorted order
+ORDER_STATISTICS = frozenset(
+    {"median", "mode", "percentile_25", "percentile_75"}
+)
+
+# statistics derived from count, sum and sum of squared deviations alone
+MOMENT_STATISTICS = frozenset({"mean", "std_dev"})
+
+# samples a quantile sketch keeps per partition, see `sketches`
+QUANTILE_SKETCH_SIZE = 256
@@ -0,0 +1,177 @@
+"""
+Pre-aggregated cube of sufficient statistics of the sales measures.
+
+Each cell holds the count, sum and sum of squared deviations from the cell
+mean of every measure for one (day, category, product_id). Since those merge
+exactly, the mean and standard deviation of any combination of filters are
+answered by merging the matching cells instead of scanning rows.
+"""
+
+from collections.abc import Collection
+from dataclasses import dataclass
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from src.apps.sales.indexes import DateIndex
+
+
+@dataclass(frozen=True, slots=True)
+class SalesCube:
+    """
+    Cells of sufficient statistics, ordered by day, missing days last.
+
+    The `counts`, `sums` and `squared_deviations` matrices hold a row per
+    cell and a column per measure. The cells of the rows without a product
+    id have a `product_ids` of 0 and are not in `has_product`.
+    """
+
+    measures: tuple[str, ...]
+    days: DateIndex
+    category_codes: np.ndarray
+    product_ids: np.ndarray
+    has_product: np.ndarray
+    counts: np.ndarray
+    sums: np.ndarray
+    squared_deviations: np.ndarray
+
+    @classmethod
+    def from_frame(
+        cls, frame: pd.DataFrame, measures: tuple[str, ...]
+    ) -> "SalesCube":
+        """Aggregate the cells of a typed sales DataFrame."""
+
+        product_ids = frame["product_id"]
+        keys = [
+            frame["date"].to_numpy().astype("datetime64[D]"),
+            frame["category"].cat.codes.to_numpy(),
+            product_ids.to_numpy(dtype=np.int64, na_value=0),
+            product_ids.notna().to_numpy(),
+        ]
+        # cells are aggregated in float64 whatever the storage dtype is
+        grouped = (
+            frame[list(measures)]
+            .astype(np.float64)
+            .groupby(keys, sort=True, dropna=False)
+        )
+        counts = grouped.count()
+        squared_deviations = grouped.var(ddof=0).fillna(0.0) * counts
+
+        return cls(
+            measures=measures,
+            days=DateIndex(
+                counts.index.get_level_values(0).to_numpy("datetime64[s]")
+            ),
+            category_codes=counts.index.get_level_values(1).to_numpy(),
+            product_ids=counts.index.get_level_values(2).to_numpy(),
+            has_product=counts.index.get_level_values(3).to_numpy(bool),
+            counts=counts.to_numpy(np.float64),
+            sums=grouped.sum().to_numpy(np.float64),
+            squared_deviations=squared_deviations.to_numpy(np.float64),
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: dict[str, np.ndarray], measures: tuple[str, ...]
+    ) -> "SalesCube":
+        """Rebuild the cube from the arrays returned by `to_arrays`."""
+
+        return cls(
+            measures=measures,
+            days=DateIndex(arrays["cube_days"]),
+            category_codes=arrays["cube_category_codes"],
+            product_ids=arrays["cube_product_ids"],
+            has_product=arrays["cube_has_product"],
+            counts=arrays["cube_counts"],
+            sums=arrays["cube_sums"],
+            squared_deviations=arrays["cube_squared_deviations"],
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Return the arrays the cube is made of, for persisting it."""
+
+        return {
+            "cube_days": self.days.dates,
+            "cube_category_codes": self.category_codes,
+            "cube_product_ids": self.product_ids,
+            "cube_has_product": self.has_product,
+            "cube_counts": self.counts,
+            "cube_sums": self.sums,
+            "cube_squared_deviations": self.squared_deviations,
+        }
+
+    def rebuild_from(self, frame: pd.DataFrame, start: int) -> "SalesCube":
+        """
+        Return the cube of frame, aggregating only its rows from start on.
+
+        The rows before start must be the ones this cube was built from, with
+        the same categories, and the rows from start on must be dated on or
+        after the day of the last of them. Only the cells of the days from
+        the row at start on are aggregated again.
+        """
+
+        day = frame["date"].to_numpy()[start].astype("datetime64[D]")
+        row = int(frame["date"].to_numpy().searchsorted(day))
+        cell = int(self.days.dates.searchsorted(day))
+        rebuilt = SalesCube.from_frame(frame.iloc[row:], self.measures)
+
+        def concatenate(kept: np.ndarray, added: np.ndarray) -> np.ndarray:
+            return np.concatenate((kept[:cell], added))
+
+        return SalesCube(
+            measures=self.measures,
+            days=DateIndex(concatenate(self.days.dates, rebuilt.days.dates)),
+            category_codes=concatenate(
+                self.category_codes, rebuilt.category_codes
+            ),
+            product_ids=concatenate(self.product_ids, rebuilt.product_ids),
+            has_product=concatenate(self.has_product, rebuilt.has_product),
+            counts=concatenate(self.counts, rebuilt.counts),
+            sums=concatenate(self.sums, rebuilt.sums),
+            squared_deviations=concatenate(
+                self.squared_deviations, rebuilt.squared_deviations
+            ),
+        )
+
+    def __len__(self) -> int:
+        """Return the number of cells."""
+
+        return len(self.category_codes)
+
+    def summarize(
+        self,
+        cells: Union[slice, np.ndarray],
+        columns: Collection[str],
+        statistics: Collection[str],
+    ) -> dict[str, dict[str, Union[float, None]]]:
+        """Merge the selected cells into the moment statistics of columns."""
+
+        counts = self.counts[cells]
+        sums = self.sums[cells]
+
+        count = counts.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = sums.sum(axis=0) / count
+            # Chan et al. merge of the per cell squared deviations
+            cell_deviations = np.where(
+                counts > 0, counts * (sums / counts - mean) ** 2, 0.0
+            )
+            std_dev = np.sqrt(
+                (
+                    self.squared_deviations[cells].sum(axis=0)
+                    + cell_deviations.sum(axis=0)
+                )
+                / (count - 1)
+            )
+
+        values = {"mean": mean, "std_dev": std_dev}
+        positions = {measure: pos for pos, measure in enumerate(self.measures)}
+        return {
+            column: {
+                statistic: float(values[statistic][positions[column]])
+                for statistic in statistics
+            }
+            for column in columns
+            if column in positions and count[positions[column]] > 0
+        }
@@ -1,11 +1,235 @@
 """File containing data loading and data validation functions."""
 
+import contextlib
+import hashlib
+import io
+import os
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import numpy as np
 import pandas as pd
 
-from src.apps.sales.const import EXPECTED_COLUMNS
+from src.apps.sales.columnar_cache import read_sidecar, write_sidecar
+from src.apps.sales.const import (
+    EXPECTED_COLUMNS,
+    MEASURE_COLUMNS,
+    QUANTILE_SKETCH_SIZE,
+    SALES_SCHEMA,
+)
+from src.apps.sales.cube import SalesCube
+from src.apps.sales.indexes import CategoryIndex, DateIndex, ProductIndex
+from src.apps.sales.shared_memory import (
+    attach_segment,
+    loader_lock,
+    publish_segment,
+)
+from src.apps.sales.sketches import QuantileSketches
+from src.core.metrics import Gauge, registry, stage_seconds
 from src.core.settings import settings
 
 
+class DatasetChangedError(ValueError):
+    """The sales data file no longer holds the dataset version asked for."""
+
+
+@dataclass(frozen=True, slots=True)
+class DatasetVersion:
+    """Identity of the sales data file a dataset snapshot was built from."""
+
+    path: Path
+    mtime_ns: int
+    size: int
+    sha256: str
+
+    def matches(self, path: Path, stat: os.stat_result) -> bool:
+        """Return True if the given file stat still describes this version."""
+
+        return (
+            self.path == path
+            and self.mtime_ns == stat.st_mtime_ns
+            and self.size == stat.st_size
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SalesDataset:
+    """
+    Immutable snapshot of the loaded sales data.
+
+    A snapshot is never mutated after it has been published, so a request
+    holding a reference keeps a consistent view even if a reload swaps in a
+    newer snapshot meanwhile.
+    """
+
+    version: DatasetVersion
+    frame: pd.DataFrame
+    categories: CategoryIndex
+    dates: DateIndex
+    products: ProductIndex
+    cube: SalesCube
+    sketches: QuantileSketches
+    # when the data was loaded, kept when only the file stat changed
+    loaded_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_frame(
+        cls,
+        version: DatasetVersion,
+        frame: pd.DataFrame,
+        arrays: Optional[dict[str, np.ndarray]] = None,
+    ) -> "SalesDataset":
+        """
+        Build a snapshot and its indexes from freshly loaded data.
+
+        The product index, cube and sketch arrays persisted with the frame, see
+        `to_arrays`, can be passed in, otherwise they are built from the frame.
+        """
+
+        # rows are kept in date order so date ranges are contiguous slices,
+        # sidecar frames are stored sorted already and are not copied again
+        if not DateIndex.is_sorted(frame["date"].to_numpy()):
+            frame = frame.sort_values(
+                "date", kind="stable", na_position="last", ignore_index=True
+            )
+            arrays = None
+
+        # the frame is owned by the snapshot from here on, so it is encoded in
+        # place rather than copied, which keeps memory-mapped columns mapped
+        categories = CategoryIndex.from_values(frame["category"])
+        frame["category"] = categories.encode(frame["category"])
+
+        if arrays is None:
+            products = ProductIndex.from_values(
+                *_product_id_values(frame["product_id"])
+            )
+            cube = SalesCube.from_frame(frame, MEASURE_COLUMNS)
+            sketches = QuantileSketches.from_frame(
+                frame, MEASURE_COLUMNS, QUANTILE_SKETCH_SIZE
+            )
+        else:
+            products = ProductIndex.from_arrays(arrays)
+            cube = SalesCube.from_arrays(arrays, MEASURE_COLUMNS)
+            sketches = QuantileSketches.from_arrays(arrays, MEASURE_COLUMNS)
+
+        return cls(
+            version=version,
+            frame=frame,
+            categories=categories,
+            dates=DateIndex(frame["date"].to_numpy()),
+            products=products,
+            cube=cube,
+            sketches=sketches,
+        )
+
+    def append(
+        self, version: DatasetVersion, rows: pd.DataFrame
+    ) -> "SalesDataset":
+        """
+        Return the snapshot of a version made of this one and appended rows.
+
+        Rows of known categories dated from the last row on, in date order,
+        are appended to the columns, and the indexes and summaries are only
+        updated for them. Any other rows are merged into a snapshot built
+        from scratch, which still saves parsing the rows loaded already.
+        """
+
+        if rows.empty:
+            return replace(self, version=version)
+
+        dates = rows["date"].to_numpy()
+        last = self.dates.dates[-1:]
+        in_order = (
+            len(last) > 0
+            and not np.isnat(last[0])
+            and not dates[0] < last[0]
+            and DateIndex.is_sorted(dates)
+            and bool(
+                rows["category"].dropna().isin(self.categories.ordered).all()
+            )
+        )
+        if not in_order:
+            frame = pd.concat(
+                [
+                    self.frame.astype({"category": object}),
+                    rows.astype({"category": object}),
+                ],
+                ignore_index=True,
+            )
+            return SalesDataset.from_frame(version, frame)
+
+        rows["category"] = self.categories.encode(rows["category"])
+        frame = pd.concat([self.frame, rows], ignore_index=True)
+        start = len(self.frame)
+        return SalesDataset(
+            version=version,
+            frame=frame,
+            categories=self.categories,
+            dates=DateIndex(frame["date"].to_numpy()),
+            products=self.products.append(
+                *_product_id_values(rows["product_id"]), start
+            ),
+            cube=self.cube.rebuild_from(frame, start),
+            sketches=self.sketches.rebuild_from(
+                frame, start, QUANTILE_SKETCH_SIZE
+            ),
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Return the arrays of the indexes and summaries, for persisting them."""
+
+        return {
+            **self.products.to_arrays(),
+            **self.cube.to_arrays(),
+            **self.sketches.to_arrays(),
+        }
+
+    def __reduce__(self) -> tuple[Any, tuple[DatasetVersion]]:
+        """Pickle the snapshot as its version, see `dataset_for_version`."""
+
+        return dataset_for_version, (self.version,)
+
+
+@dataclass(frozen=True, slots=True)
+class StreamedSalesFile:
+    """
+    Sales data file summarized in bounded chunks instead of being loaded.
+
+    Only its version and category dictionary are kept in memory, see
+    `read_sales_chunks`.
+    """
+
+    version: DatasetVersion
+    categories: CategoryIndex
+    # when the file was scanned
+    loaded_at: float = field(default_factory=time.time)
+
+
+# bytes read at once when hashing a file that grew
+HASH_BLOCK_SIZE = 1 << 20
+
+# times a file changing while it is being loaded is loaded again
+LOAD_ATTEMPTS = 3
+
+# largest product id parsed as a float that is still exact
+MAX_EXACT_FLOAT_ID = 2**53
+
+# source of the summaries, depending on `settings.streaming`
+SalesSource = Union[SalesDataset, StreamedSalesFile]
+
+# currently published snapshot, replaced as a whole on reload
+_snapshot: Optional[SalesDataset] = None
+_streamed_file: Optional[StreamedSalesFile] = None
+_reload_lock = threading.Lock()
+
+# set while the file is reloaded in the background, see `watcher`
+_watched = threading.Event()
+
+
 def _validate_correct_columns(data: pd.DataFrame) -> None:
     """Validate that the sales DataFrame contains the required columns."""
 
@@ -15,27 +239,532 @@ def _validate_correct_columns(data: pd.DataFrame) -> None:
         raise ValueError(error_data)
 
 
-def load_data() -> pd.DataFrame:
-    """Load sales data from CSV file."""
+def _stat_sales_file(path: Path) -> os.stat_result:
+    """Return the stat of the sales data file."""
 
     try:
-        data = pd.read_csv(settings.sales_data)
+        return path.stat()
+    except FileNotFoundError as err:
+        raise FileNotFoundError(f"Sales data file not found at {path}") from err
+
+
+def _hash_sales_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of the sales data file contents."""
+
+    with path.open("rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def _hash_grown_file(
+    path: Path, prefix_size: int, size: int
+) -> tuple[str, str, bool]:
+    """
+    Hash the first size bytes of a file that grew past prefix_size bytes.
+
+    Return the SHA-256 hex digests of the prefix and of the whole, and
+    whether the prefix ends with a complete line. The file is read once, in
+    blocks of `HASH_BLOCK_SIZE` bytes.
+    """
+
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        while block := file.read(
+            min(HASH_BLOCK_SIZE, prefix_size - file.tell())
+        ):
+            digest.update(block)
+        prefix_sha256 = digest.hexdigest()
+        while block := file.read(min(HASH_BLOCK_SIZE, size - file.tell())):
+            digest.update(block)
+
+        ends_line = False
+        if prefix_size:
+            file.seek(prefix_size - 1)
+            ends_line = file.read(1) == b"\n"
+
+    return prefix_sha256, digest.hexdigest(), ends_line
+
+
+def _read_appended_rows(path: Path, offset: int, size: int) -> pd.DataFrame:
+    """Parse the rows of the sales data file from offset to size bytes."""
+
+    with path.open("rb") as file:
+        header = file.readline()
+        file.seek(offset)
+        appended = file.read(size - offset)
+
+    data = pd.read_csv(
+        io.BytesIO(header + appended), dtype={"category": "category"}
+    )
+    _validate_correct_columns(data)
+    return _apply_schema(data)
+
+
+class _HashingReader(io.RawIOBase):
+    """Binary file reader hashing every byte read through it."""
+
+    def __init__(self, file: io.BufferedReader) -> None:
+        """Wrap a binary file opened for reading."""
+
+        super().__init__()
+        self._file = file
+        self.digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        """Return True, the wrapped file is read."""
+
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        """Read into buffer, hashing what was read."""
+
+        count = self._file.readinto(buffer)
+        self.digest.update(memoryview(buffer)[:count])
+        return count
+
+
+def _read_sales_file(path: Path, sha256: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parse and validate the sales data CSV file.
+
+    Given the digest of the version expected, the bytes parsed are hashed
+    along and `DatasetChangedError` is raised if they are another version's.
+    """
+
+    try:
+        with path.open("rb") as file:
+            reader = _HashingReader(file)
+            buffered = io.BufferedReader(reader, HASH_BLOCK_SIZE)
+            # categories are dictionary encoded while parsing
+            data = pd.read_csv(buffered, dtype={"category": "category"})
+            # the parser may stop short of trailing blank lines
+            while buffered.read(HASH_BLOCK_SIZE):
+                pass
 
     except FileNotFoundError as err:
-        raise FileNotFoundError(
-            f"Sales data file not found at {settings.sales_data}"
-        ) from err
+        raise FileNotFoundError(f"Sales data file not found at {path}") from err
 
     except pd.errors.EmptyDataError as err:
         message = "Sales data file is empty"
         raise ValueError(message) from err
 
+    if sha256 is not None and reader.digest.hexdigest() != sha256:
+        message = f"Sales data file {path} changed while being loaded"
+        raise DatasetChangedError(message)
+
     _validate_correct_columns(data)
-    return data
+    return _apply_schema(data)
+
+
+def _apply_schema(data: pd.DataFrame) -> pd.DataFrame:
+    """Convert the parsed sales data to the dtypes of the sales schema."""
+
+    data["date"] = pd.to_datetime(
+        data["date"], format="ISO8601", errors="coerce"
+    )
+
+    # malformed numbers are coerced to NaN once here instead of per request
+    for column in ("product_id", *MEASURE_COLUMNS):
+        data[column] = pd.to_numeric(data[column], errors="coerce")
+
+    _validate_product_ids(data["product_id"])
+    return data.astype(SALES_SCHEMA)
+
+
+def _validate_product_ids(product_ids: pd.Series) -> None:
+    """Reject product ids that would not be kept exactly as Int64."""
+
+    kind = product_ids.dtype.kind
+    if kind == "u":
+        valid = not len(product_ids) or (
+            int(product_ids.max()) <= np.iinfo(np.int64).max
+        )
+    elif kind == "f":
+        # ids parsed as floats, next to missing ones, are exact up to 2**53
+        values = product_ids.dropna().to_numpy()
+        valid = bool(
+            (values == np.floor(values)).all()
+            and (np.abs(values) <= MAX_EXACT_FLOAT_ID).all()
+        )
+    else:
+        valid = kind == "i"
+
+    if not valid:
+        message = "Sales data file has product ids that are not 64-bit integers"
+        raise ValueError(message)
+
+
+def _product_id_values(product_ids: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Return the product ids as int64, 0 where missing, and where present."""
+
+    present = product_ids.notna().to_numpy()
+    return product_ids.to_numpy(dtype=np.int64, na_value=0), present
+
+
+def read_sales_chunks(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Parse and validate the sales data CSV file, chunk_rows rows at a time.
+
+    Every chunk is converted to the sales schema on its own, so at most one
+    chunk of the file is held in memory at any time.
+    """
+
+    try:
+        with pd.read_csv(
+            path, dtype={"category": "category"}, chunksize=chunk_rows
+        ) as reader:
+            for chunk in reader:
+                _validate_correct_columns(chunk)
+                yield _apply_schema(chunk)
+
+    except FileNotFoundError as err:
+        raise FileNotFoundError(f"Sales data file not found at {path}") from err
+
+    except pd.errors.EmptyDataError as err:
+        message = "Sales data file is empty"
+        raise ValueError(message) from err
+
+
+def _scan_categories(path: Path, chunk_rows: int) -> CategoryIndex:
+    """Return the category dictionary of a file, reading it in chunks."""
+
+    categories: set[str] = set()
+    with pd.read_csv(
+        path, usecols=["category"], dtype="category", chunksize=chunk_rows
+    ) as reader:
+        for chunk in reader:
+            categories.update(chunk["category"].cat.categories)
+    return CategoryIndex.from_values(pd.Series(sorted(categories)))
+
+
+def _load_sales_data(
+    version: DatasetVersion, previous: Optional[SalesDataset] = None
+) -> SalesDataset:
+    """
+    Load a dataset version from its columnar sidecar or from the CSV.
+
+    Given the snapshot of a previous version the CSV grew from, only the
+    appended rows are parsed.
+    """
+
+    if settings.columnar_cache:
+        cached = read_sidecar(version.path, version.sha256)
+        if cached is not None:
+            frame, arrays = cached
+            return SalesDataset.from_frame(version, frame, arrays)
+
+    if previous is None:
+        dataset = SalesDataset.from_frame(
+            version, _read_sales_file(version.path, version.sha256)
+        )
+    else:
+        rows = _read_appended_rows(
+            version.path, previous.version.size, version.size
+        )
+        dataset = previous.append(version, rows)
+
+    if settings.columnar_cache:
+        write_sidecar(
+            version.path,
+            version.sha256,
+            dataset.frame,
+            dataset.to_arrays(),
+        )
+    return dataset
+
+
+def _attach_sales_data(
+    version: DatasetVersion, previous: Optional[SalesDataset]
+) -> SalesDataset:
+    """
+    Return the dataset version mapped from shared memory.
+
+    The version is loaded and published first unless another worker process
+    did already; if it cannot be published the private copy is returned.
+    """
+
+    attached = attach_segment(version.path, version.sha256)
+    if attached is None:
+        with loader_lock(version.path):
+            # another worker may have published it while we were waiting
+            attached = attach_segment(version.path, version.sha256)
+            if attached is None:
+                loaded = _load_sales_data(version, previous)
+                publish_segment(
+                    version.path,
+                    version.sha256,
+                    loaded.frame,
+                    loaded.to_arrays(),
+                )
+                attached = attach_segment(version.path, version.sha256)
+                if attached is None:
+                    # publishing failed, keep the private copy
+                    return loaded
+
+    frame, arrays = attached
+    return SalesDataset.from_frame(version, frame, arrays)
+
+
+def _read_sales_data(
+    version: DatasetVersion, previous: Optional[SalesDataset] = None
+) -> SalesDataset:
+    """Return a dataset version, from shared memory if it is enabled."""
+
+    if settings.shared_memory:
+        # the data is still loaded privately when shared memory is unusable
+        with contextlib.suppress(OSError):
+            return _attach_sales_data(version, previous)
+
+    return _load_sales_data(version, previous)
+
+
+def _load_snapshot(
+    path: Path, stat: os.stat_result, previous: Optional[SalesDataset]
+) -> SalesDataset:
+    """Build the snapshot for the current file, reusing unchanged content."""
+
+    # a file that only had rows appended is not parsed again as a whole,
+    # a truncated or rewritten one is
+    if (
+        previous is not None
+        and previous.version.path == path
+        and stat.st_size > previous.version.size
+    ):
+        prefix_sha256, sha256, ends_line = _hash_grown_file(
+            path, previous.version.size, stat.st_size
+        )
+        version = DatasetVersion(
+            path=path,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            sha256=sha256,
+        )
+        if prefix_sha256 == previous.version.sha256 and ends_line:
+            return _read_sales_data(version, previous)
+        return _read_sales_data(version)
+
+    version = DatasetVersion(
+        path=path,
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        sha256=_hash_sales_file(path),
+    )
+
+    # the file was touched but its content is the same, skip parsing it again
+    if (
+        previous is not None
+        and previous.version.path == path
+        and previous.version.sha256 == version.sha256
+    ):
+        return replace(previous, version=version)
+
+    return _read_sales_data(version)
+
+
+def get_dataset() -> SalesDataset:
+    """Return the sales dataset snapshot, reloading it if the file changed."""
+
+    global _snapshot  # noqa: PLW0603
+
+    path = settings.sales_data
+    stat = _stat_sales_file(path)
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version.matches(path, stat):
+        return snapshot
+
+    with _reload_lock:
+        # another thread may have reloaded while we were waiting for the lock
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.version.matches(path, stat):
+            return snapshot
+
+        with stage_seconds.time("load"):
+            loaded = _load_changing_snapshot(path, stat, snapshot)
+        _snapshot = loaded
+
+    return loaded
+
+
+def _load_changing_snapshot(
+    path: Path, stat: os.stat_result, previous: Optional[SalesDataset]
+) -> SalesDataset:
+    """Load the snapshot of the file, again if it changes while loaded."""
+
+    for _ in range(LOAD_ATTEMPTS - 1):
+        with contextlib.suppress(DatasetChangedError):
+            return _load_snapshot(path, stat, previous)
+        # the file changed after it was hashed, load it again
+        stat = _stat_sales_file(path)
+    return _load_snapshot(path, stat, previous)
+
+
+def dataset_for_version(version: DatasetVersion) -> SalesDataset:
+    """
+    Return the snapshot of a dataset version, loading it if needed.
+
+    Snapshots sent to worker processes are unpickled through this function,
+    so the workers load the version from its memory-mapped sidecar instead of
+    receiving a copy of the data. `DatasetChangedError` is raised if the
+    file holds another version by then.
+    """
+
+    global _snapshot  # noqa: PLW0603
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _reload_lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != version:
+            with stage_seconds.time("load"):
+                snapshot = _read_sales_data(version)
+            _snapshot = snapshot
+
+    return snapshot
+
+
+def get_streamed_file() -> StreamedSalesFile:
+    """
+    Return the sales data file to stream, rescanning it if it changed.
+
+    The file is hashed and its categories collected in bounded chunks, once
+    per version of the file.
+    """
+
+    global _streamed_file  # noqa: PLW0603
+
+    path = settings.sales_data
+    stat = _stat_sales_file(path)
+
+    streamed = _streamed_file
+    if streamed is not None and streamed.version.matches(path, stat):
+        return streamed
+
+    with _reload_lock:
+        streamed = _streamed_file
+        if streamed is not None and streamed.version.matches(path, stat):
+            return streamed
+
+        try:
+            with stage_seconds.time("load"):
+                categories = _scan_categories(path, settings.stream_chunk_rows)
+        except pd.errors.EmptyDataError as err:
+            message = "Sales data file is empty"
+            raise ValueError(message) from err
+        except ValueError as err:
+            error_data = "Sales data file does not contain the required columns"
+            raise ValueError(error_data) from err
+
+        streamed = StreamedSalesFile(
+            version=DatasetVersion(
+                path=path,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                sha256=_hash_sales_file(path),
+            ),
+            categories=categories,
+        )
+        _streamed_file = streamed
+
+    return streamed
+
+
+@contextlib.contextmanager
+def watching() -> Iterator[None]:
+    """
+    Serve the published sales data without checking the file, meanwhile.
+
+    Used while a watcher publishes every change of the file, so that no
+    request waits for a reload.
+    """
+
+    _watched.set()
+    try:
+        yield
+    finally:
+        _watched.clear()
+
+
+def get_sales_source() -> SalesSource:
+    """Return the loaded dataset, or the file to stream in streaming mode."""
+
+    if settings.streaming:
+        streamed = _streamed_file
+        if (
+            _watched.is_set()
+            and streamed is not None
+            and streamed.version.path == settings.sales_data
+        ):
+            return streamed
+        return get_streamed_file()
+
+    if _watched.is_set():
+        return current_dataset()
+    return get_dataset()
+
+
+def current_dataset() -> SalesDataset:
+    """
+    Return the published snapshot without checking the file for changes.
+
+    Only the very first call, before any snapshot of the configured file has
+    been published, falls back to loading it.
+    """
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version.path == settings.sales_data:
+        return snapshot
+    return get_dataset()
+
+
+def load_data() -> pd.DataFrame:
+    """Load sales data from CSV file."""
+
+    return get_dataset().frame
+
+
+def category_index() -> CategoryIndex:
+    """Return the category dictionary of the current dataset."""
+
+    if settings.streaming:
+        return get_streamed_file().categories
+    return current_dataset().categories
 
 
 def valid_categories() -> list[str]:
     """Return list of valid categories."""
 
-    data = load_data()
-    return [str(cat) for cat in data["category"].dropna().unique().tolist()]
+    return list(category_index().ordered)
+
+
+def _snapshot_rows() -> float:
+    """Return the number of rows of the published snapshot."""
+
+    snapshot = _snapshot
+    return len(snapshot.frame) if snapshot is not None else 0
+
+
+def _snapshot_bytes() -> float:
+    """Return the bytes of the columns, indexes and summaries published."""
+
+    snapshot = _snapshot
+    if snapshot is None:
+        return 0
+    return float(
+        snapshot.frame.memory_usage(index=False).sum()
+        + sum(array.nbytes for array in snapshot.to_arrays().values())
+    )
+
+
+registry.register(
+    Gauge("sales_dataset_rows", "Rows of the sales dataset.", _snapshot_rows)
+)
+registry.register(
+    Gauge(
+        "sales_dataset_bytes",
+        "Bytes of the sales dataset columns, indexes and summaries, "
+        "memory-mapped ones included.",
+        _snapshot_bytes,
+    )
+)
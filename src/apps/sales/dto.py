@@ -1,12 +1,18 @@
 """Contains sales app Data Transfer Object logic."""
 
+from contextvars import ContextVar
 from datetime import date
-from typing import Optional
+from typing import Any, Literal, Optional, Union
 
-from pydantic import model_validator, Field, ConfigDict
+from pydantic import model_validator, Field, ConfigDict, RootModel
+from pydantic.functional_validators import ModelWrapValidatorHandler
 
-from src.apps.sales.data_utils import valid_categories
+from src.apps.sales.const import APPROXIMATE_STATISTICS, STATISTICS
+from src.apps.sales.data_utils import category_index
+from src.apps.sales.indexes import CategoryIndex
 from src.core.common_types import BaseDTO
+from src.core.metrics import stage_seconds
+from src.core.settings import settings
 
 
 class DateRange(BaseDTO):
@@ -54,6 +60,22 @@ class Filters(BaseDTO):
     # TODO Matija: validator for category
 
 
+Statistic = Literal[
+    "mean",
+    "median",
+    "mode",
+    "std_dev",
+    "percentile_25",
+    "percentile_75",
+]
+
+
+# category index the requests of the batch being validated are checked against
+_batch_categories: ContextVar[Optional[CategoryIndex]] = ContextVar(
+    "batch_categories", default=None
+)
+
+
 class SummaryRequest(BaseDTO):
     """DTO for the summary request."""
 
@@ -62,6 +84,25 @@ class SummaryRequest(BaseDTO):
         description="List of columns to compute statistics for.",
         examples=[["quantity_sold", "price_per_unit"]],
     )
+    statistics: Optional[list[Statistic]] = Field(
+        default=None,
+        description=(
+            "Statistics to compute for every column, all of them by default. "
+            "Requests for the mean and standard deviation only are answered "
+            "from pre-aggregated data."
+        ),
+        examples=[["mean", "std_dev"]],
+    )
+    approximate: bool = Field(
+        default=False,
+        description=(
+            "Read the median and percentiles of the sales measures from "
+            "quantile sketches instead of sorting every value. Each column "
+            "then reports the bound of its rank error. The mode is not "
+            "available, it is left out of the statistics by default."
+        ),
+        examples=[True],
+    )
     filters: Optional[Filters] = Field(
         None,
         description="Filters to apply to the sales data.",
@@ -93,6 +134,22 @@ class SummaryRequest(BaseDTO):
         }
     )
 
+    def requested_statistics(self) -> list[str]:
+        """Return the statistics to compute, once each, in request order."""
+
+        if self.statistics:
+            return list(dict.fromkeys(self.statistics))
+        return list(APPROXIMATE_STATISTICS if self.approximate else STATISTICS)
+
+    @model_validator(mode="after")
+    def validate_approximate_statistics(self) -> "SummaryRequest":
+        """Validate an approximate request does not ask for the mode."""
+
+        if self.approximate and self.statistics and "mode" in self.statistics:
+            error_msg = "The mode is not available in approximate summaries."
+            raise ValueError(error_msg)
+        return self
+
     @model_validator(mode="after")
     def validate_category(self) -> "SummaryRequest":
         """Validate the given category filter."""
@@ -101,13 +158,16 @@ class SummaryRequest(BaseDTO):
         if not (self.filters and self.filters.category):
             return self
 
-        # check for possible invalid categories
-        valid_categories_list = valid_categories()
-        invalid_categories = [
-            category
-            for category in self.filters.category
-            if category not in valid_categories_list
-        ]
+        # check for possible invalid categories, the index is kept in memory
+        # so this does not touch the sales data file; a batch checks all its
+        # requests against the index it looked up once
+        with stage_seconds.time("validate_categories"):
+            categories = _batch_categories.get() or category_index()
+            invalid_categories = [
+                category
+                for category in self.filters.category
+                if category not in categories
+            ]
 
         if invalid_categories:
             error_msg = (
@@ -118,23 +178,115 @@ class SummaryRequest(BaseDTO):
         return self
 
 
+# columns or time buckets of the date a summary can be grouped by
+GroupKey = Literal["category", "product_id", "day", "month", "year"]
+
+
+class GroupedSummaryRequest(SummaryRequest):
+    """DTO for a summary request computed per group."""
+
+    group_by: list[GroupKey] = Field(
+        ...,
+        min_length=1,
+        description=(
+            "Keys to group the sales data by, outermost first. The date can "
+            "be grouped by day, month or year."
+        ),
+        examples=[["category", "month"]],
+    )
+    approximate: Literal[False] = Field(
+        default=False,
+        description="Grouped summaries are always exact.",
+    )
+
+    @model_validator(mode="after")
+    def validate_group_by(self) -> "GroupedSummaryRequest":
+        """Validate no group key is given twice."""
+
+        if len(set(self.group_by)) != len(self.group_by):
+            error_msg = "Group keys must be unique."
+            raise ValueError(error_msg)
+
+        return self
+
+
+class SummaryBatchRequest(BaseDTO):
+    """DTO for a batch of summary requests over the same sales data."""
+
+    requests: list[SummaryRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.summary_batch_max,
+        description=(
+            "Summary requests to compute, answered in order, at most "
+            f"{settings.summary_batch_max}."
+        ),
+        examples=[
+            [
+                {"columns": ["quantity_sold"]},
+                {
+                    "columns": ["price_per_unit"],
+                    "filters": {"category": ["Electronics"]},
+                },
+            ]
+        ],
+    )
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def validate_categories_once(
+        cls,
+        data: Any,
+        handler: ModelWrapValidatorHandler["SummaryBatchRequest"],
+    ) -> "SummaryBatchRequest":
+        """Validate the categories of every request against one index."""
+
+        token = _batch_categories.set(category_index())
+        try:
+            return handler(data)
+        finally:
+            _batch_categories.reset(token)
+
+
 class ColumnStatistics(BaseDTO):
-    """DTO for statistics of a single column."""
+    """
+    DTO for statistics of a single column.
+
+    Every statistic is given, as null when it is not a finite number, such
+    as the standard deviation of a single value.
+    """
 
-    mean: float = Field(..., description="Mean of the column", examples=[125.5])
-    median: float = Field(
+    mean: Optional[float] = Field(
+        ..., description="Mean of the column", examples=[125.5]
+    )
+    median: Optional[float] = Field(
         ..., description="Median of the column", examples=[120.0]
     )
-    mode: float = Field(..., description="Mode of the column", examples=[115.0])
-    std_dev: float = Field(
-        ..., description="Standard deviation of the column", examples=[10.0]
+    mode: Optional[float] = Field(
+        ..., description="Mode of the column", examples=[115.0]
     )
-    percentile_25: float = Field(
+    std_dev: Optional[float] = Field(
+        ...,
+        description=(
+            "Standard deviation of the column, null for a single value"
+        ),
+        examples=[10.0],
+    )
+    percentile_25: Optional[float] = Field(
         ..., description="25th percentile of the column", examples=[110.0]
     )
-    percentile_75: float = Field(
+    percentile_75: Optional[float] = Field(
         ..., description="75th percentile of the column", examples=[130.0]
     )
+    rank_error: Optional[float] = Field(
+        default=None,
+        description=(
+            "Bound of the rank error of the approximate median and "
+            "percentiles, as a share of the number of values, only given "
+            "for approximate summaries"
+        ),
+        examples=[0.002],
+    )
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -148,3 +300,81 @@ class ColumnStatistics(BaseDTO):
             }
         }
     )
+
+
+class PartialColumnStatistics(BaseDTO):
+    """
+    DTO for statistics of a single column, when only some are requested.
+
+    A requested statistic that is not a finite number is given as null.
+    """
+
+    mean: Optional[float] = Field(
+        None, description="Mean of the column, if requested", examples=[125.5]
+    )
+    median: Optional[float] = Field(
+        None,
+        description="Median of the column, if requested",
+        examples=[120.0],
+    )
+    mode: Optional[float] = Field(
+        None, description="Mode of the column, if requested", examples=[115.0]
+    )
+    std_dev: Optional[float] = Field(
+        None,
+        description="Standard deviation of the column, if requested",
+        examples=[10.0],
+    )
+    percentile_25: Optional[float] = Field(
+        None,
+        description="25th percentile of the column, if requested",
+        examples=[110.0],
+    )
+    percentile_75: Optional[float] = Field(
+        None,
+        description="75th percentile of the column, if requested",
+        examples=[130.0],
+    )
+    rank_error: Optional[float] = Field(
+        default=None,
+        description=(
+            "Bound of the rank error of the approximate median and "
+            "percentiles, as a share of the number of values, only given "
+            "for approximate summaries"
+        ),
+        examples=[0.002],
+    )
+
+    model_config = ConfigDict(
+        json_schema_extra={"example": {"mean": 125.5, "std_dev": 10.0}}
+    )
+
+
+# statistics of every column of a summary, all of them unless `statistics`
+# of the request selects some
+SummaryStatistics = dict[str, Union[ColumnStatistics, PartialColumnStatistics]]
+
+
+class GroupedSummaryStatistics(
+    RootModel[dict[str, Union["GroupedSummaryStatistics", SummaryStatistics]]]
+):
+    """
+    DTO for the statistics of a grouped summary.
+
+    One mapping per group key, outermost first, down to the statistics of
+    every column.
+    """
+
+
+class SummaryBatchItem(BaseDTO):
+    """DTO for the outcome of one request of a batch."""
+
+    statistics: Optional[SummaryStatistics] = Field(
+        default=None,
+        description="Statistics per column, if any could be computed.",
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Why no statistics could be computed for the request.",
+        examples=["No statistics found for the given filters and columns."],
+    )
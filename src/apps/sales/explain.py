@@ -0,0 +1,90 @@
+"""
+Traces of how a summary was computed, for explaining slow summaries.
+
+A trace records every stage a summary went through in order: which filter
+used which index or scan, how many rows went in and came out, and how long
+it took. Traces are only recorded for summaries asked to be explained and
+are plain data, so they come back from worker processes too.
+"""
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(slots=True)
+class PlanStep:
+    """One stage of a summary and how it accessed the data."""
+
+    stage: str
+    access: str
+    rows_in: Optional[int]
+    rows_out: Optional[int] = None
+    seconds: float = 0.0
+
+
+@dataclass(slots=True)
+class SummaryTrace:
+    """Stages a summary went through, and whether it would have been cached."""
+
+    cache: str = "miss"
+    path: str = ""
+    steps: list[PlanStep] = field(default_factory=list)
+
+    def server_timing(self) -> str:
+        """Return the stages as a Server-Timing header value."""
+
+        return ", ".join(
+            f'{step.stage};desc="{step.access}";dur={step.seconds * 1000:.3f}'
+            for step in self.steps
+        )
+
+    def to_dict(self) -> dict[str, object]:
+        """Return the trace with the stage durations in milliseconds."""
+
+        return {
+            "cache": self.cache,
+            "path": self.path,
+            "filter_order": [
+                step.stage for step in self.steps if step.stage in FILTERS
+            ],
+            "steps": [
+                {
+                    "stage": step.stage,
+                    "access": step.access,
+                    "rows_in": step.rows_in,
+                    "rows_out": step.rows_out,
+                    "ms": step.seconds * 1000,
+                }
+                for step in self.steps
+            ],
+        }
+
+
+# stages applying one of the summary filters
+FILTERS = frozenset({"date_range", "product_ids", "category"})
+
+
+@contextmanager
+def traced(
+    trace: Optional[SummaryTrace],
+    stage: str,
+    access: str,
+    rows_in: Optional[int],
+) -> Iterator[PlanStep]:
+    """
+    Time a stage of a summary and add it to the trace, if any.
+
+    The block sets `rows_out` on the step it is given.
+    """
+
+    step = PlanStep(stage=stage, access=access, rows_in=rows_in)
+    start = time.perf_counter()
+    try:
+        yield step
+    finally:
+        if trace is not None:
+            step.seconds = time.perf_counter() - start
+            trace.steps.append(step)
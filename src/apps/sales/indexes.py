@@ -0,0 +1,222 @@
+"""Lookup indexes built once per sales dataset version."""
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Optional, cast
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryIndex:
+    """
+    Dictionary of the categories present in a dataset version.
+
+    The position of a category in `ordered` is its code in the dictionary
+    encoded category column of the dataset.
+    """
+
+    ordered: tuple[str, ...]
+    members: frozenset[str] = field(init=False)
+    codes: dict[str, int] = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Derive the lookup structures from the ordered categories."""
+
+        # frozen dataclass, hence the object.__setattr__ calls
+        object.__setattr__(self, "members", frozenset(self.ordered))
+        object.__setattr__(
+            self,
+            "codes",
+            {category: code for code, category in enumerate(self.ordered)},
+        )
+
+    @classmethod
+    def from_values(cls, values: pd.Series) -> "CategoryIndex":
+        """Build the index from the raw values of a category column."""
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = {str(cat) for cat in values.cat.categories}
+        else:
+            categories = {str(value) for value in values.dropna().unique()}
+        return cls(ordered=tuple(sorted(categories)))
+
+    def __contains__(self, category: object) -> bool:
+        """Return True if the category is present in the dataset."""
+
+        return category in self.members
+
+    def __len__(self) -> int:
+        """Return the number of distinct categories."""
+
+        return len(self.ordered)
+
+    def encode(self, values: pd.Series) -> pd.Categorical:
+        """Return the category column dictionary encoded with this index."""
+
+        # columns that are already encoded only have their codes remapped,
+        # and are reused as they are when loaded from the sidecar
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            if tuple(values.cat.categories) != self.ordered:
+                values = values.cat.set_categories(self.ordered)
+            return cast(pd.Categorical, values.array)
+
+        return pd.Categorical(values.astype("string"), categories=self.ordered)
+
+    def mask(self, codes: np.ndarray, categories: Iterable[str]) -> np.ndarray:
+        """Return a boolean mask of the category codes for the categories."""
+
+        # the extra trailing slot is hit by the -1 code of missing values
+        lookup = np.zeros(len(self.ordered) + 1, dtype=bool)
+        lookup[[self.codes[cat] for cat in categories if cat in self]] = True
+        return lookup[codes]
+
+
+@dataclass(frozen=True, slots=True)
+class DateIndex:
+    """
+    Sorted dates of a dataset version.
+
+    The dataset rows are kept in the order of this index, rows without a date
+    last, so a date range maps to a contiguous slice of rows.
+    """
+
+    dates: np.ndarray
+
+    @staticmethod
+    def is_sorted(dates: np.ndarray) -> bool:
+        """Return True if the dates are ascending with missing dates last."""
+
+        present = ~np.isnat(dates)
+        count = int(present.sum())
+        return bool(
+            present[:count].all()
+            and not present[count:].any()
+            and (dates[1:count] >= dates[: max(count - 1, 0)]).all()
+        )
+
+    def rows_between(self, start: date, end: date) -> slice:
+        """Return the slice of rows dated from start to end, both inclusive."""
+
+        lower = self.dates.searchsorted(np.datetime64(start.isoformat(), "D"))
+        upper = self.dates.searchsorted(
+            np.datetime64(end.isoformat(), "D"), side="right"
+        )
+        return slice(int(lower), int(upper))
+
+
+@dataclass(frozen=True, slots=True)
+class ProductIndex:
+    """
+    Inverted index from product id to the dataset rows of that product.
+
+    The rows of `product_ids[i]` are `positions[offsets[i]:offsets[i + 1]]`,
+    in ascending order, so they keep the date order of the dataset. Rows
+    without a product id are not indexed.
+    """
+
+    product_ids: np.ndarray
+    offsets: np.ndarray
+    positions: np.ndarray
+
+    @classmethod
+    def from_values(
+        cls, values: np.ndarray, present: Optional[np.ndarray] = None
+    ) -> "ProductIndex":
+        """Build the index from the product ids of the rows where present."""
+
+        rows = (
+            np.arange(len(values))
+            if present is None
+            else np.flatnonzero(present)
+        )
+        # a stable sort keeps the rows of each product in ascending order
+        positions = rows[np.argsort(values[rows], kind="stable")]
+        product_ids, starts = np.unique(values[positions], return_index=True)
+        return cls(
+            product_ids=product_ids,
+            offsets=np.append(starts, len(positions)),
+            positions=positions,
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "ProductIndex":
+        """Rebuild the index from the arrays returned by `to_arrays`."""
+
+        return cls(
+            product_ids=arrays["product_ids"],
+            offsets=arrays["product_offsets"],
+            positions=arrays["product_positions"],
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Return the arrays the index is made of, for persisting it."""
+
+        return {
+            "product_ids": self.product_ids,
+            "product_offsets": self.offsets,
+            "product_positions": self.positions,
+        }
+
+    def append(
+        self, values: np.ndarray, present: np.ndarray, start: int
+    ) -> "ProductIndex":
+        """
+        Return the index with the product ids of appended rows added.
+
+        The rows are numbered from start on, only the ones where present are
+        indexed. The rows of every product stay in ascending order without
+        sorting the rows indexed already.
+        """
+
+        added = ProductIndex.from_values(values, present)
+        product_ids = np.union1d(self.product_ids, added.product_ids)
+
+        old_slots = product_ids.searchsorted(self.product_ids)
+        old_counts = np.zeros(len(product_ids), dtype=np.int64)
+        old_counts[old_slots] = np.diff(self.offsets)
+        added_slots = product_ids.searchsorted(added.product_ids)
+        added_counts = np.zeros(len(product_ids), dtype=np.int64)
+        added_counts[added_slots] = np.diff(added.offsets)
+        offsets = np.append(0, np.cumsum(old_counts + added_counts))
+
+        # every product keeps its previous rows first, then the appended ones
+        positions = np.empty(offsets[-1], dtype=self.positions.dtype)
+        positions[
+            np.repeat(
+                offsets[old_slots] - self.offsets[:-1], np.diff(self.offsets)
+            )
+            + np.arange(len(self.positions))
+        ] = self.positions
+        positions[
+            np.repeat(
+                offsets[added_slots]
+                + old_counts[added_slots]
+                - added.offsets[:-1],
+                np.diff(added.offsets),
+            )
+            + np.arange(len(added.positions))
+        ] = added.positions + start
+
+        return ProductIndex(
+            product_ids=product_ids, offsets=offsets, positions=positions
+        )
+
+    def rows_for(self, product_ids: Iterable[int]) -> np.ndarray:
+        """Return the ascending dataset rows of the given products."""
+
+        wanted = np.unique(np.fromiter(product_ids, dtype=np.int64))
+        if not len(self.product_ids) or not len(wanted):
+            return self.positions[:0]
+
+        slots = self.product_ids.searchsorted(wanted)
+        slots = slots[slots < len(self.product_ids)]
+        slots = slots[np.isin(self.product_ids[slots], wanted)]
+
+        rows = [
+            self.positions[self.offsets[slot] : self.offsets[slot + 1]]
+            for slot in slots
+        ]
+        return np.sort(np.concatenate(rows)) if rows else self.positions[:0]
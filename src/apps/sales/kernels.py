@@ -0,0 +1,195 @@
+"""
+Vectorized statistics kernels of the sales app.
+
+The kernels work on a 2-D float64 matrix holding one column per requested
+measure, missing values as NaN. Each column is sorted once; the median,
+quartiles and mode are read from the sorted data and the mean and standard
+deviation come from a single reduction over all columns. Grouped values are
+summarized the same way, sorted once by group and value.
+"""
+
+from collections.abc import Collection
+
+import numpy as np
+
+from src.apps.sales.const import ORDER_STATISTICS, STATISTICS
+
+# weight past which numpy interpolates down from the upper value
+INTERPOLATION_MIDPOINT = 0.5
+
+
+def lerp(
+    lower: np.ndarray, upper: np.ndarray, weight: np.ndarray
+) -> np.ndarray:
+    """Interpolate linearly between values, the way numpy's quantile does."""
+
+    difference = upper - lower
+    result = lower + difference * weight
+    np.subtract(
+        upper,
+        difference * (1 - weight),
+        out=result,
+        where=weight >= INTERPOLATION_MIDPOINT,
+    )
+    return result
+
+
+def _quantile(
+    sorted_matrix: np.ndarray, counts: np.ndarray, quantile: float
+) -> np.ndarray:
+    """Return the linear-interpolated quantile of every sorted column."""
+
+    position = quantile * (counts - 1)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, counts - 1)
+
+    lower_values = np.take_along_axis(sorted_matrix, lower[None, :], axis=0)[0]
+    upper_values = np.take_along_axis(sorted_matrix, upper[None, :], axis=0)[0]
+    return lerp(lower_values, upper_values, position - lower)
+
+
+def _median(sorted_matrix: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Return the median of every sorted column."""
+
+    lower = ((counts - 1) // 2)[None, :]
+    upper = (counts // 2)[None, :]
+    lower_values = np.take_along_axis(sorted_matrix, lower, axis=0)[0]
+    upper_values = np.take_along_axis(sorted_matrix, upper, axis=0)[0]
+    return (lower_values + upper_values) / 2
+
+
+def _segment_mode(
+    values: np.ndarray, segments: np.ndarray, segment_count: int
+) -> np.ndarray:
+    """
+    Return the smallest of the most frequent values of every segment.
+
+    The values are sorted within each segment and the segments follow one
+    another; segments without any value get NaN.
+    """
+
+    # runs of equal values, NaN never equals anything so it is always a run
+    run_starts = np.flatnonzero(
+        np.concatenate(
+            (
+                [True],
+                (values[1:] != values[:-1]) | (segments[1:] != segments[:-1]),
+            )
+        )
+    )
+    run_lengths = np.diff(np.append(run_starts, len(values)))
+
+    present = ~np.isnan(values[run_starts])
+    run_starts = run_starts[present]
+    run_lengths = run_lengths[present]
+    run_segments = segments[run_starts]
+
+    # per segment, the longest run first and the smallest value among ties
+    order = np.lexsort((run_starts, -run_lengths, run_segments))
+    first = np.concatenate(([True], np.diff(run_segments[order]) != 0))
+
+    modes = np.full(segment_count, np.nan)
+    modes[run_segments[order[first]]] = values[run_starts[order[first]]]
+    return modes
+
+
+def _mode(sorted_matrix: np.ndarray) -> np.ndarray:
+    """Return the smallest of the most frequent values of every sorted column."""
+
+    rows, columns = sorted_matrix.shape
+    # the columns of a Fortran ordered matrix are laid out one after another
+    return _segment_mode(
+        sorted_matrix.ravel(order="F"),
+        np.repeat(np.arange(columns), rows),
+        columns,
+    )
+
+
+def summarize_matrix(
+    matrix: np.ndarray, statistics: Collection[str] = STATISTICS
+) -> dict[str, np.ndarray]:
+    """
+    Return the requested statistics of every column of the matrix.
+
+    Each column must hold at least one value that is not NaN. The columns
+    are only sorted when an order statistic is requested.
+    """
+
+    matrix = np.asfortranarray(matrix, dtype=np.float64)
+    missing = np.isnan(matrix)
+    counts = len(matrix) - missing.sum(axis=0)
+
+    # the same two pass reduction pandas uses for its mean and variance
+    values = np.where(missing, 0.0, matrix)
+    mean = values.sum(axis=0) / counts
+    squares = np.where(missing, 0.0, (mean - values) ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std_dev = np.sqrt(squares.sum(axis=0) / (counts - 1))
+
+    results = {"mean": mean, "std_dev": std_dev}
+    if ORDER_STATISTICS.intersection(statistics):
+        # a single sort per column, NaN is sorted after every value
+        sorted_matrix = np.sort(matrix, axis=0)
+        results.update(
+            median=_median(sorted_matrix, counts),
+            mode=_mode(sorted_matrix),
+            percentile_25=_quantile(sorted_matrix, counts, 0.25),
+            percentile_75=_quantile(sorted_matrix, counts, 0.75),
+        )
+
+    return {statistic: results[statistic] for statistic in statistics}
+
+
+def summarize_groups(
+    values: np.ndarray,
+    groups: np.ndarray,
+    group_count: int,
+    statistics: Collection[str] = STATISTICS,
+) -> dict[str, np.ndarray]:
+    """
+    Return the requested statistics of the values of every group.
+
+    `groups` holds the group of every value, from 0 to `group_count - 1`.
+    All groups are summarized together with a single sort of the values by
+    group; groups without any value that is not NaN get NaN statistics.
+    """
+
+    present = ~np.isnan(values)
+    values, groups = values[present], groups[present]
+    counts = np.bincount(groups, minlength=group_count)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.bincount(groups, weights=values, minlength=group_count) / (
+            counts
+        )
+        squares = np.bincount(
+            groups, weights=(values - mean[groups]) ** 2, minlength=group_count
+        )
+        std_dev = np.where(counts > 0, np.sqrt(squares / (counts - 1)), np.nan)
+
+    results = {"mean": mean, "std_dev": std_dev}
+    if ORDER_STATISTICS.intersection(statistics):
+        order = np.lexsort((values, groups))
+        values, groups = values[order], groups[order]
+        starts = np.cumsum(counts) - counts
+        # empty groups read any value, their statistics are NaN anyway
+        last = np.maximum(counts - 1, 0)
+        stored = np.append(values, np.nan)
+
+        def quantile(fraction: float) -> np.ndarray:
+            position = fraction * last
+            lower = np.floor(position).astype(np.intp)
+            upper = np.minimum(lower + 1, last)
+            return lerp(
+                stored[starts + lower], stored[starts + upper], position - lower
+            )
+
+        median = (stored[starts + last // 2] + stored[starts + counts // 2]) / 2
+        results.update(
+            median=np.where(counts > 0, median, np.nan),
+            mode=_segment_mode(values, groups, group_count),
+            percentile_25=np.where(counts > 0, quantile(0.25), np.nan),
+            percentile_75=np.where(counts > 0, quantile(0.75), np.nan),
+        )
+
+    return {statistic: results[statistic] for statistic in statistics}
@@ -1,33 +1,108 @@
 """Contains the routes and url for the sales app."""
 
-from http.client import OK, NOT_FOUND
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.client import GATEWAY_TIMEOUT, NOT_FOUND, NOT_IMPLEMENTED, OK
+from http.client import SERVICE_UNAVAILABLE
 
-import pandas as pd
-
-from typing import Optional, Annotated
-from fastapi import APIRouter, HTTPException, Depends
+from time import perf_counter
+from typing import Annotated, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import Response
 
+from src.apps.sales.conditional import (
+    NOT_MODIFIED_RESPONSE,
+    cache_headers,
+    not_modified,
+)
 from src.apps.sales.dto import (
+    GroupedSummaryRequest,
+    GroupedSummaryStatistics,
+    SummaryBatchItem,
+    SummaryBatchRequest,
     SummaryRequest,
-    ColumnStatistics,
+    SummaryStatistics,
+)
+from src.apps.sales.explain import SummaryTrace, traced
+from src.apps.sales.serialization import (
+    batch_json,
+    explained_json,
+    grouped_json,
+    json_response,
+    statistics_json,
+)
+from src.apps.sales.services import (
+    summarize,
+    summarize_batch,
+    summarize_grouped,
 )
-from src.apps.sales.services import filter_data, compute_statistics
-from src.apps.sales.data_utils import load_data
+from src.apps.sales.data_utils import DatasetChangedError, SalesSource
+from src.apps.sales.data_utils import StreamedSalesFile
+from src.apps.sales.data_utils import get_sales_source
+from src.core.executor import ComputeOverloadedError
+from src.core.metrics import stage_seconds
 
 __all__ = ("router",)
 router = APIRouter()
 
+NO_STATISTICS = "No statistics found for the given filters and columns."
+
+IfNoneMatch = Annotated[
+    Optional[str],
+    Header(
+        description=(
+            "ETag of a summary received before, answered with a 304 and "
+            "without computing anything while it is unchanged."
+        ),
+    ),
+]
+
+
+@contextmanager
+def _compute_errors() -> Iterator[None]:
+    """Turn the failures of the compute executor into HTTP errors."""
+
+    try:
+        yield
+    except ComputeOverloadedError as err:
+        raise HTTPException(
+            status_code=SERVICE_UNAVAILABLE,
+            detail="Too many summaries are being computed, retry later.",
+            headers={"Retry-After": "1"},
+        ) from err
+    except DatasetChangedError as err:
+        raise HTTPException(
+            status_code=SERVICE_UNAVAILABLE,
+            detail="The sales data changed while being summarized, retry.",
+            headers={"Retry-After": "1"},
+        ) from err
+    except TimeoutError as err:
+        raise HTTPException(
+            status_code=GATEWAY_TIMEOUT,
+            detail="Computing the summary took too long.",
+        ) from err
+
 
 @router.post(
     "/summary",
-    response_model=dict[str, ColumnStatistics],
+    response_model=SummaryStatistics,
+    response_model_exclude_unset=True,
     summary="Generate sales summary",
     description=(
         "Generates a summary of sales data based on the provided filters and columns. "
         "The response includes statistics like mean, median, mode, standard deviation, "
-        "and percentiles."
+        "and percentiles. With `statistics`, only the requested ones are "
+        "returned, as PartialColumnStatistics. With `explain`, the "
+        "statistics are returned under `statistics` along with the "
+        "`explain` trace of how they were computed, and the stage durations in a `Server-Timing` header. "
+        "In streaming mode, the median and percentiles come with their "
+        "`rank_error`, and the mode is approximate for columns with more "
+        "distinct values than the `stream_mode_values` setting."
+    ),
+    response_description=(
+        "A dictionary where keys are column names and values are "
+        "ColumnStatistics, or PartialColumnStatistics for a subset."
     ),
-    response_description="A dictionary where keys are column names and values are ColumnStatistics.",
     responses={
         OK: {
             "description": "Successfully computed statistics.",
@@ -71,30 +146,188 @@ router = APIRouter()
                 }
             },
         },
+        **NOT_MODIFIED_RESPONSE,
     },
 )
 async def generate_sales_summary_router(
     summary_request: SummaryRequest,
-    sales_data: Annotated[pd.DataFrame, Depends(load_data)],
-) -> Optional[dict[str, ColumnStatistics]]:
+    sales_data: Annotated[SalesSource, Depends(get_sales_source)],
+    if_none_match: IfNoneMatch = None,
+    *,
+    explain: Annotated[
+        bool,
+        Query(
+            description=(
+                "Also return the filter order, the index or scan used by "
+                "every filter, the rows in and out and the duration of every "
+                "stage, and whether the summary was cached. An explained "
+                "summary is always computed, even if cached."
+            ),
+        ),
+    ] = False,
+) -> Response:
     """Generate a summary of sales data based on the provided filters and columns."""
 
-    # apply provided filters if any
-    filtered_data = filter_data(sales_data, summary_request.filters)
+    if explain:
+        return await _explain_summary(sales_data, summary_request)
 
-    # compute statistics for the specified columns
-    statistics = compute_statistics(
-        filtered_data, summary_request.columns or []
-    )
+    # the ETag is known before computing anything
+    headers = cache_headers([summary_request], sales_data)
+    unchanged = not_modified(if_none_match, headers)
+    if unchanged is not None:
+        return unchanged
+
+    # filter and compute statistics, unless the result is cached already
+    with _compute_errors():
+        statistics = await summarize(sales_data, summary_request)
 
     if statistics:
-        # convert the statistics dict into ColumnStatistics DTOs
-        return {
-            column: ColumnStatistics(**stats_dict)  # type: ignore[arg-type]
-            for column, stats_dict in statistics.items()
-        }
+        # the statistics are trusted, they are encoded as the response model
+        # would be without building and validating ColumnStatistics DTOs
+        with stage_seconds.time("serialize"):
+            return json_response(statistics_json(statistics), headers)
     else:
+        raise HTTPException(status_code=404, detail=NO_STATISTICS)
+
+
+async def _explain_summary(
+    sales_data: SalesSource, summary_request: SummaryRequest
+) -> Response:
+    """Return a summary with the trace of how it was computed."""
+
+    start = perf_counter()
+    trace = SummaryTrace()
+    with _compute_errors():
+        statistics = await summarize(sales_data, summary_request, trace)
+    if not statistics:
+        raise HTTPException(status_code=NOT_FOUND, detail=NO_STATISTICS)
+
+    with traced(trace, "serialize", "json encoding", None):
+        serialized = statistics_json(statistics)
+
+    total = f"total;dur={(perf_counter() - start) * 1000:.3f}"
+    return json_response(
+        explained_json(serialized, trace.to_dict()),
+        headers={
+            "Server-Timing": ", ".join(
+                timing for timing in (trace.server_timing(), total) if timing
+            )
+        },
+    )
+
+
+@router.post(
+    "/summary/grouped",
+    response_model=GroupedSummaryStatistics,
+    response_model_exclude_unset=True,
+    summary="Generate sales summary per group",
+    description=(
+        "Generates the summary of every group of the sales data, grouped by "
+        "category, product id or a time bucket of the date, in a single pass. "
+        "The statistics are always exact, `approximate` cannot be set."
+    ),
+    response_description=(
+        "A mapping per group key, outermost first, down to a dictionary "
+        "where keys are column names and values are ColumnStatistics, or "
+        "PartialColumnStatistics for a subset."
+    ),
+    responses={
+        OK: {
+            "description": "Successfully computed statistics.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "Electronics": {
+                            "2023-01": {
+                                "quantity_sold": {
+                                    "mean": 125.5,
+                                    "median": 120.0,
+                                    "mode": 115.0,
+                                    "std_dev": 10.0,
+                                    "percentile_25": 110.0,
+                                    "percentile_75": 130.0,
+                                },
+                            }
+                        }
+                    }
+                }
+            },
+        },
+        **NOT_MODIFIED_RESPONSE,
+    },
+)
+async def generate_grouped_sales_summary_router(
+    summary_request: GroupedSummaryRequest,
+    sales_data: Annotated[SalesSource, Depends(get_sales_source)],
+    if_none_match: IfNoneMatch = None,
+) -> Response:
+    """Generate a summary of every group of the sales data."""
+
+    if isinstance(sales_data, StreamedSalesFile):
         raise HTTPException(
-            status_code=404,
-            detail="No statistics found for the given filters and columns.",
+            status_code=NOT_IMPLEMENTED,
+            detail="Grouped summaries are not available in streaming mode.",
+        )
+
+    headers = cache_headers([summary_request], sales_data)
+    unchanged = not_modified(if_none_match, headers)
+    if unchanged is not None:
+        return unchanged
+
+    with _compute_errors():
+        statistics = await summarize_grouped(sales_data, summary_request)
+
+    if not statistics:
+        raise HTTPException(status_code=NOT_FOUND, detail=NO_STATISTICS)
+    with stage_seconds.time("serialize"):
+        return json_response(
+            grouped_json(statistics, len(summary_request.group_by)), headers
         )
+
+
+@router.post(
+    "/summary/batch",
+    response_model=list[SummaryBatchItem],
+    response_model_exclude_unset=True,
+    summary="Generate several sales summaries",
+    description=(
+        "Generates the summaries of several requests over the same sales data "
+        "at once, sharing the work between requests selecting the same rows. "
+        "A request without statistics gets an error in its item instead of "
+        "failing the whole batch."
+    ),
+    response_description="The outcome of every request, in request order.",
+    responses=NOT_MODIFIED_RESPONSE,
+)
+async def generate_sales_summary_batch_router(
+    batch_request: SummaryBatchRequest,
+    sales_data: Annotated[SalesSource, Depends(get_sales_source)],
+    if_none_match: IfNoneMatch = None,
+) -> Response:
+    """Generate the summaries of a batch of requests."""
+
+    headers = cache_headers(batch_request.requests, sales_data)
+    unchanged = not_modified(if_none_match, headers)
+    if unchanged is not None:
+        return unchanged
+
+    with _compute_errors():
+        summaries = await summarize_batch(sales_data, batch_request.requests)
+
+    with stage_seconds.time("serialize"):
+        return json_response(batch_json(summaries, NO_STATISTICS), headers)
+
+
+@router.get(
+    "/categories",
+    response_model=list[str],
+    summary="List sales categories",
+    description="Lists the categories that can be used in summary filters.",
+    response_description="Alphabetically ordered list of categories.",
+)
+async def list_categories_router(
+    sales_data: Annotated[SalesSource, Depends(get_sales_source)],
+) -> list[str]:
+    """List the categories present in the sales data."""
+
+    return list(sales_data.categories.ordered)
@@ -0,0 +1,143 @@
+"""
+JSON encoding of the summary responses, straight from the statistics.
+
+The statistics are computed by the application itself, so they are trusted:
+instead of building `ColumnStatistics` models, validating them again against
+the response model and encoding them with the standard library, the JSON
+bytes are written directly from the floats. The output is the one of the
+response models, compact, with the computed statistics in model order,
+values that are not finite, such as the standard deviation of a single
+value, being null as the models allow. The routes keep their response
+models, which only document them.
+"""
+
+import json
+import math
+from collections.abc import Mapping, Sequence
+from typing import Any, Optional
+
+from fastapi.responses import Response
+
+from src.apps.sales.dto import ColumnStatistics
+
+__all__ = (
+    "JSON_MEDIA_TYPE",
+    "batch_json",
+    "explained_json",
+    "grouped_json",
+    "json_response",
+    "statistics_json",
+)
+
+JSON_MEDIA_TYPE = "application/json"
+
+StatisticsByColumn = Mapping[str, Mapping[str, Optional[float]]]
+
+
+def _string(value: str) -> str:
+    """Return a string as JSON, non-ASCII characters as they are."""
+
+    return json.dumps(value, ensure_ascii=False)
+
+
+# fields of the column statistics, with their encoded key, in model order
+_FIELDS = tuple(
+    (name, f"{_string(name)}:") for name in ColumnStatistics.model_fields
+)
+
+
+def _number(value: Optional[float]) -> str:
+    """Return a float as JSON, null when missing or not finite."""
+
+    if value is None or not math.isfinite(value):
+        return "null"
+    return repr(float(value))
+
+
+def _columns(statistics: StatisticsByColumn) -> str:
+    """Return the statistics of every column as a JSON object."""
+
+    return (
+        "{"
+        + ",".join(
+            f"{_string(column)}:{{"
+            + ",".join(
+                key + _number(column_statistics[name])
+                for name, key in _FIELDS
+                if name in column_statistics
+            )
+            + "}"
+            for column, column_statistics in statistics.items()
+        )
+        + "}"
+    )
+
+
+def statistics_json(statistics: StatisticsByColumn) -> bytes:
+    """Encode statistics per column, as `SummaryStatistics`."""
+
+    return _columns(statistics).encode()
+
+
+def batch_json(summaries: Sequence[StatisticsByColumn], error: str) -> bytes:
+    """Encode summaries as `list[SummaryBatchItem]`, error when empty."""
+
+    encoded_error = f'{{"error":{_string(error)}}}'
+    return (
+        "["
+        + ",".join(
+            f'{{"statistics":{_columns(statistics)}}}'
+            if statistics
+            else encoded_error
+            for statistics in summaries
+        )
+        + "]"
+    ).encode()
+
+
+def _grouped(statistics: Mapping[str, Any], depth: int) -> str:
+    """Return nested groups as JSON, their statistics in computed order."""
+
+    if not depth:
+        return (
+            "{"
+            + ",".join(
+                f"{_string(column)}:{{"
+                + ",".join(
+                    f"{_string(name)}:{_number(value)}"
+                    for name, value in column_statistics.items()
+                )
+                + "}"
+                for column, column_statistics in statistics.items()
+            )
+            + "}"
+        )
+    return (
+        "{"
+        + ",".join(
+            f"{_string(key)}:{_grouped(groups, depth - 1)}"
+            for key, groups in statistics.items()
+        )
+        + "}"
+    )
+
+
+def grouped_json(statistics: Mapping[str, Any], depth: int) -> bytes:
+    """Encode the statistics of a summary grouped by depth group keys."""
+
+    return _grouped(statistics, depth).encode()
+
+
+def explained_json(statistics: bytes, explain: Mapping[str, Any]) -> bytes:
+    """Encode statistics encoded already along with their explain trace."""
+
+    trace = json.dumps(explain, ensure_ascii=False, separators=(",", ":"))
+    return b'{"statistics":%b,"explain":%b}' % (statistics, trace.encode())
+
+
+def json_response(
+    content: bytes, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    """Return a response of JSON bytes encoded already."""
+
+    return Response(content, media_type=JSON_MEDIA_TYPE, headers=headers)
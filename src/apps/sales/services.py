@@ -1,62 +1,720 @@
 """File containing business logic for sales app."""
 
+import numpy as np
 import pandas as pd
 
-from typing import Optional, Union
+from collections.abc import Sequence
+from typing import Any, Optional, Union
 
-from src.apps.sales.dto import Filters
+from src.apps.sales.cache import summary_cache, summary_cache_key
+from src.apps.sales.const import (
+    MEASURE_COLUMNS,
+    MOMENT_STATISTICS,
+    ORDER_STATISTICS,
+    STATISTICS,
+)
+from src.apps.sales.data_utils import (
+    SalesDataset,
+    SalesSource,
+    StreamedSalesFile,
+    read_sales_chunks,
+)
+from src.apps.sales.dto import Filters, GroupedSummaryRequest, SummaryRequest
+from src.apps.sales.explain import SummaryTrace, traced
+from src.apps.sales.indexes import DateIndex
+from src.apps.sales.kernels import summarize_groups, summarize_matrix
+from src.apps.sales.sketches import SKETCH_QUANTILES
+from src.apps.sales.streaming import ColumnAccumulator
+from src.core.executor import compute_executor
+from src.core.metrics import stage_seconds
+from src.core.settings import settings
 
 
-def filter_data(data: pd.DataFrame, filters: Optional[Filters]) -> pd.DataFrame:
-    """Apply filters to the sales data using a dynamic mapping approach."""
+# rows selected from the data, a contiguous slice as long as only the date
+# index was used, ascending row positions or a boolean mask otherwise
+RowSelection = Union[slice, np.ndarray]
+
+
+def _selected_count(rows: RowSelection, total: int) -> int:
+    """Return the number of rows of a selection out of total rows."""
+
+    if isinstance(rows, slice):
+        return len(range(total)[rows])
+    return len(rows)
+
+
+def _select_rows(
+    dataset: SalesDataset,
+    filters: Filters,
+    trace: Optional[SummaryTrace] = None,
+) -> RowSelection:
+    """Return the dataset rows matching all filters, using the indexes."""
+
+    dated = slice(0, len(dataset.frame))
+    if filters.date_range:
+        with traced(
+            trace, "date_range", "date index search", len(dataset.frame)
+        ) as step:
+            dated = dataset.dates.rows_between(
+                filters.date_range.start_date, filters.date_range.end_date
+            )
+            step.rows_out = dated.stop - dated.start
+
+    rows: RowSelection = dated
+    if filters.product_ids:
+        with traced(
+            trace, "product_ids", "product index", dated.stop - dated.start
+        ) as step:
+            # product rows are ascending, so the date slice bounds are searched
+            positions = dataset.products.rows_for(filters.product_ids)
+            rows = positions[
+                positions.searchsorted(dated.start) : positions.searchsorted(
+                    dated.stop
+                )
+            ]
+            step.rows_out = len(rows)
+
+    if filters.category:
+        with traced(
+            trace,
+            "category",
+            "category code scan",
+            _selected_count(rows, len(dataset.frame)),
+        ) as step:
+            # only the codes of the rows selected so far are looked at
+            codes = dataset.frame["category"].cat.codes.to_numpy()[rows]
+            matches = dataset.categories.mask(codes, filters.category)
+            if isinstance(rows, slice):
+                rows = dated.start + np.flatnonzero(matches)
+            else:
+                rows = rows[matches]
+            step.rows_out = int(matches.sum())
+
+    return rows
+
+
+def _select_groups(
+    dataset: SalesDataset,
+    days: DateIndex,
+    category_codes: np.ndarray,
+    products: Optional[tuple[np.ndarray, np.ndarray]],
+    filters: Optional[Filters],
+) -> RowSelection:
+    """
+    Return the pre-aggregated groups matching all filters.
+
+    The products are the product id of every group and whether it has one,
+    groups without products only match the date and category filters.
+    """
 
     if not filters:
-        return data
+        return slice(None)
+
+    dated = slice(0, len(category_codes))
+    if filters.date_range:
+        dated = days.rows_between(
+            filters.date_range.start_date, filters.date_range.end_date
+        )
+
+    matches = np.ones(dated.stop - dated.start, dtype=bool)
+    if filters.category:
+        matches &= dataset.categories.mask(
+            category_codes[dated], filters.category
+        )
+    if filters.product_ids and products is not None:
+        product_ids, has_product = products
+        matches &= has_product[dated] & np.isin(
+            product_ids[dated], filters.product_ids
+        )
+
+    return dated.start + np.flatnonzero(matches)
+
+
+def _select_cells(
+    dataset: SalesDataset, filters: Optional[Filters]
+) -> RowSelection:
+    """Return the cube cells matching all filters."""
+
+    cube = dataset.cube
+    return _select_groups(
+        dataset,
+        cube.days,
+        cube.category_codes,
+        (cube.product_ids, cube.has_product),
+        filters,
+    )
+
+
+def _select_partitions(
+    dataset: SalesDataset, filters: Optional[Filters]
+) -> RowSelection:
+    """Return the sketch partitions matching the date and category filters."""
+
+    sketches = dataset.sketches
+    return _select_groups(
+        dataset, sketches.days, sketches.category_codes, None, filters
+    )
+
+
+def _take_rows(
+    data_frame: pd.DataFrame,
+    rows: RowSelection,
+    columns: Optional[list[str]],
+) -> pd.DataFrame:
+    """Materialize the selected rows of only the requested columns, once."""
+
+    names = data_frame.columns if columns is None else columns
+    return pd.DataFrame(
+        {
+            name: data_frame[name].iloc[rows]
+            for name in dict.fromkeys(names)
+            if name in data_frame.columns
+        },
+        copy=False,
+    )
+
+
+@stage_seconds.timed("filter_data")
+def filter_data(
+    data: Union[pd.DataFrame, SalesDataset],
+    filters: Optional[Filters],
+    columns: Optional[list[str]] = None,
+    trace: Optional[SummaryTrace] = None,
+) -> pd.DataFrame:
+    """
+    Apply filters to the sales data, through the indexes of a dataset.
+
+    All filters are combined into a single row selection before any data is
+    copied, and only the given columns, all of them by default, are copied.
+    A plain data frame is filtered with boolean masks instead. The stages
+    filtering a dataset are added to the trace, if any.
+    """
+
+    if isinstance(data, SalesDataset):
+        if not filters and columns is None:
+            return data.frame
+
+        rows = _select_rows(data, filters, trace) if filters else slice(None)
+        with traced(
+            trace,
+            "take_rows",
+            "slice" if isinstance(rows, slice) else "gather",
+            _selected_count(rows, len(data.frame)),
+        ) as step:
+            taken = _take_rows(data.frame, rows, columns)
+            step.rows_out = len(taken)
+        return taken
+
+    data_frame = data
+    if not filters:
+        return data_frame
 
     filter_map = {
-        "date_range": lambda data_frame, value: data_frame[
+        "date_range": lambda data_frame, value: (
             (data_frame["date"] >= value.start_date.isoformat())
             & (data_frame["date"] <= value.end_date.isoformat())
-        ],
-        "category": lambda data_frame, value: data_frame[
-            data_frame["category"].isin(value)
-        ],
-        "product_ids": lambda data_frame, value: data_frame[
-            data_frame["product_id"].isin(value)
-        ],
+        ),
+        "category": lambda data_frame, value: data_frame["category"].isin(
+            value
+        ),
+        "product_ids": lambda data_frame, value: data_frame["product_id"].isin(
+            value
+        ),
     }
 
-    for filter_field, apply_filter in filter_map.items():
+    mask = None
+    for filter_field, filter_mask in filter_map.items():
         filter_value = getattr(filters, filter_field, None)
         if filter_value:
-            data = apply_filter(data, filter_value)
+            field_mask = filter_mask(data_frame, filter_value)
+            mask = field_mask if mask is None else mask & field_mask
+
+    if mask is None:
+        return data_frame
+    return _take_rows(data_frame, mask.to_numpy(dtype=bool), columns)
+
+
+def _numeric_column(column: pd.Series) -> Optional[np.ndarray]:
+    """Return the values of a column as float64, NaN where missing."""
+
+    # dates are not a measure even though they convert to numbers
+    if column.dtype.kind in "mM":
+        return None
+
+    # columns loaded through the sales schema are already numeric, only
+    # untyped data still needs non-numeric values coerced to NaN
+    if column.dtype.kind not in "iuf":
+        column = pd.to_numeric(column, errors="coerce")
 
-    return data
+    # statistics are computed in float64 whatever the storage dtype is
+    return column.to_numpy(dtype=np.float64, na_value=np.nan)
 
 
+@stage_seconds.timed("compute_statistics")
 def compute_statistics(
-    data: pd.DataFrame, columns: list[str]
+    data: pd.DataFrame,
+    columns: list[str],
+    statistics: Sequence[str] = STATISTICS,
 ) -> dict[str, dict[str, Union[float, None]]]:
     """Compute summary statistics for the specified columns in the data."""
 
-    statistics = {}
+    numeric_columns = {}
 
-    for column in columns:
+    for column in dict.fromkeys(columns):
         # skip columns not present in the DataFrame
         if column not in data.columns:
             continue
 
-        # drop NaN values to avoid errors and crashes, coerce non-numeric to NaN
-        column_data = pd.to_numeric(data[column], errors="coerce").dropna()
-
-        if not column_data.empty:
-            statistics[column] = {
-                "mean": column_data.mean(),
-                "median": column_data.median(),
-                "mode": column_data.mode()[0],
-                "std_dev": column_data.std(),
-                "percentile_25": column_data.quantile(0.25),
-                "percentile_75": column_data.quantile(0.75),
+        # skip columns without a single numeric value
+        values = _numeric_column(data[column])
+        if values is not None and not np.isnan(values).all():
+            numeric_columns[column] = values
+
+    if not numeric_columns:
+        return {}
+
+    # all columns are summarized together, in a single vectorized pass
+    matrix = np.empty((len(data), len(numeric_columns)), order="F")
+    for position, values in enumerate(numeric_columns.values()):
+        matrix[:, position] = values
+
+    summary = summarize_matrix(matrix, statistics)
+    return {
+        column: {
+            statistic: float(values[position])
+            for statistic, values in summary.items()
+        }
+        for position, column in enumerate(numeric_columns)
+    }
+
+
+def _approximate_summary(
+    dataset: SalesDataset,
+    filters: Optional[Filters],
+    columns: list[str],
+    statistics: list[str],
+    trace: Optional[SummaryTrace] = None,
+) -> dict[str, dict[str, Union[float, None]]]:
+    """
+    Summarize measure columns without sorting the selected values.
+
+    The mean and standard deviation are merged from the cube, the median and
+    percentiles from the quantile sketches; the mode, which would need every
+    selected value, is not available.
+    """
+
+    with traced(trace, "cube", "cube cells", len(dataset.cube)) as step:
+        cells = _select_cells(dataset, filters)
+        step.rows_out = _selected_count(cells, len(dataset.cube))
+        summaries = [
+            dataset.cube.summarize(
+                cells,
+                columns,
+                [stat for stat in statistics if stat in MOMENT_STATISTICS],
+            )
+        ]
+    with traced(
+        trace, "sketches", "sketch partitions", len(dataset.sketches)
+    ) as step:
+        partitions = _select_partitions(dataset, filters)
+        step.rows_out = _selected_count(partitions, len(dataset.sketches))
+        summaries.append(
+            dataset.sketches.summarize(
+                partitions,
+                columns,
+                [stat for stat in statistics if stat in SKETCH_QUANTILES],
+            )
+        )
+    summary: dict[str, dict[str, Union[float, None]]] = {}
+    for column in summaries[0]:
+        merged = {
+            key: value
+            for part in summaries
+            for key, value in part[column].items()
+        }
+        summary[column] = {stat: merged[stat] for stat in statistics}
+        if "rank_error" in merged and SKETCH_QUANTILES.keys() & set(statistics):
+            summary[column]["rank_error"] = merged["rank_error"]
+    return summary
+
+
+# numpy unit of the date time buckets summaries can be grouped by
+TIME_BUCKETS = {"day": "D", "month": "M", "year": "Y"}
+
+# nested statistics of a grouped summary, one level per group key
+GroupedStatistics = dict[str, Any]
+
+
+def _group_codes(
+    data: pd.DataFrame, group_key: str
+) -> tuple[np.ndarray, list[str]]:
+    """Return the code of every row for a group key, -1 if missing, and labels."""
+
+    if group_key == "category":
+        categories = data["category"].astype("category")
+        return (
+            categories.cat.codes.to_numpy(np.int64),
+            [str(category) for category in categories.cat.categories],
+        )
+
+    if group_key in TIME_BUCKETS:
+        values = (
+            data["date"]
+            .to_numpy()
+            .astype(f"datetime64[{TIME_BUCKETS[group_key]}]")
+        )
+        present = ~np.isnat(values)
+    elif data[group_key].dtype.kind in "iu":
+        # integer ids are kept exact, whatever their size
+        present = data[group_key].notna().to_numpy()
+        values = data[group_key].to_numpy(dtype=np.int64, na_value=0)
+    else:
+        values = pd.to_numeric(data[group_key], errors="coerce").to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+        present = ~np.isnan(values)
+
+    labels, codes = np.unique(values[present], return_inverse=True)
+    row_codes = np.full(len(values), -1, dtype=np.int64)
+    row_codes[present] = codes
+    if group_key in TIME_BUCKETS:
+        return row_codes, [str(label) for label in labels]
+    return row_codes, [str(int(label)) for label in labels]
+
+
+def compute_grouped_statistics(
+    data: pd.DataFrame,
+    columns: list[str],
+    group_by: Sequence[str],
+    statistics: Sequence[str] = STATISTICS,
+) -> GroupedStatistics:
+    """
+    Compute summary statistics of the columns for every group of the data.
+
+    The result nests one mapping per group key, in `group_by` order, down to
+    the statistics of every column. Rows missing a group key are left out,
+    as are groups without a single numeric value.
+    """
+
+    keys = [_group_codes(data, group_key) for group_key in group_by]
+    grouped = np.logical_and.reduce([row_codes >= 0 for row_codes, _ in keys])
+
+    # every combination of keys is numbered in key order, then compacted
+    combined = np.zeros(int(grouped.sum()), dtype=np.int64)
+    for row_codes, labels in keys:
+        combined = combined * len(labels) + row_codes[grouped]
+    group_ids, groups = np.unique(combined, return_inverse=True)
+
+    summaries, counts = {}, {}
+    for column in dict.fromkeys(columns):
+        if column not in data.columns:
+            continue
+        numeric_values = _numeric_column(data[column])
+        if numeric_values is not None:
+            values = numeric_values[grouped]
+            summaries[column] = summarize_groups(
+                values, groups, len(group_ids), statistics
+            )
+            counts[column] = np.bincount(
+                groups[~np.isnan(values)], minlength=len(group_ids)
+            )
+
+    result: GroupedStatistics = {}
+    for group in range(len(group_ids)):
+        column_statistics = {
+            column: {
+                statistic: float(values[group])
+                for statistic, values in summary.items()
             }
+            for column, summary in summaries.items()
+            if counts[column][group]
+        }
+        if not column_statistics:
+            continue
+
+        # the labels of the group, from the innermost key outwards
+        labels = []
+        group_id = int(group_ids[group])
+        for _, key_labels in reversed(keys):
+            group_id, code = divmod(group_id, len(key_labels))
+            labels.append(key_labels[code])
+
+        level = result
+        for label in reversed(labels[1:]):
+            level = level.setdefault(label, {})
+        level[labels[0]] = column_statistics
+
+    return result
+
+
+def compute_grouped_summary(
+    dataset: SalesDataset, summary_request: GroupedSummaryRequest
+) -> GroupedStatistics:
+    """Filter the dataset and compute the statistics of every group."""
+
+    columns = summary_request.columns or []
+    statistics = summary_request.requested_statistics()
+    sources = [
+        "date" if group_key in TIME_BUCKETS else group_key
+        for group_key in summary_request.group_by
+    ]
+
+    filtered_data = filter_data(
+        dataset, summary_request.filters, [*columns, *sources]
+    )
+    return compute_grouped_statistics(
+        filtered_data, columns, summary_request.group_by, statistics
+    )
+
+
+def compute_summary(
+    dataset: SalesDataset,
+    summary_request: SummaryRequest,
+    trace: Optional[SummaryTrace] = None,
+) -> dict[str, dict[str, Union[float, None]]]:
+    """
+    Filter the dataset and compute the statistics of a summary request.
+
+    The stages the summary goes through are added to the trace, if any.
+    """
+
+    columns = summary_request.columns or []
+    statistics = summary_request.requested_statistics()
+
+    filters = summary_request.filters
+    measures_only = all(
+        column in dataset.cube.measures
+        for column in columns
+        if column in dataset.frame.columns
+    )
+
+    # moment statistics of measures merge from the cube, without any scan
+    if MOMENT_STATISTICS.issuperset(statistics) and measures_only:
+        if trace is not None:
+            trace.path = "cube"
+        with traced(trace, "cube", "cube cells", len(dataset.cube)) as step:
+            cells = _select_cells(dataset, filters)
+            step.rows_out = _selected_count(cells, len(dataset.cube))
+            return dataset.cube.summarize(cells, columns, statistics)
+
+    # sketches are partitioned by day and category, product filters are
+    # selective enough to be summarized exactly
+    if (
+        summary_request.approximate
+        and measures_only
+        and not (filters and filters.product_ids)
+    ):
+        if trace is not None:
+            trace.path = "approximate"
+        return _approximate_summary(
+            dataset, filters, columns, statistics, trace
+        )
+
+    if trace is not None:
+        trace.path = "rows"
+
+    # apply provided filters if any, keeping only the requested columns
+    filtered_data = filter_data(dataset, filters, columns, trace)
+
+    # compute statistics for the specified columns
+    with traced(
+        trace,
+        "compute_statistics",
+        "sort" if ORDER_STATISTICS.intersection(statistics) else "moments",
+        len(filtered_data),
+    ):
+        return compute_statistics(filtered_data, columns, statistics)
+
+
+def explain_summary(
+    dataset: SalesDataset, summary_request: SummaryRequest
+) -> tuple[dict[str, dict[str, Union[float, None]]], SummaryTrace]:
+    """Compute a summary request along with the trace of its stages."""
+
+    trace = SummaryTrace()
+    return compute_summary(dataset, summary_request, trace), trace
+
+
+def compute_batch(
+    dataset: SalesDataset, summary_requests: list[SummaryRequest]
+) -> list[dict[str, dict[str, Union[float, None]]]]:
+    """
+    Compute several summary requests, sharing the work between them.
+
+    Requests differing only by their columns select the same rows, so they
+    are merged into one request over all their columns and computed once.
+    """
+
+    keys = []
+    merged: dict[tuple[str, bool], SummaryRequest] = {}
+    for summary_request in summary_requests:
+        columns = summary_request.columns or []
+        # measure columns may be summarized from the cube, others may not
+        key = (
+            summary_cache_key(
+                summary_request.model_copy(update={"columns": []}),
+                dataset.version,
+            ),
+            set(columns).issubset(MEASURE_COLUMNS),
+        )
+        keys.append(key)
+
+        previous = merged.get(key)
+        merged_columns = (previous.columns or []) if previous else []
+        merged[key] = summary_request.model_copy(
+            update={"columns": list(dict.fromkeys([*merged_columns, *columns]))}
+        )
+
+    summaries = {
+        key: compute_summary(dataset, merged_request)
+        for key, merged_request in merged.items()
+    }
+    return [
+        {
+            column: summaries[key][column]
+            for column in dict.fromkeys(summary_request.columns or [])
+            if column in summaries[key]
+        }
+        for key, summary_request in zip(keys, summary_requests)
+    ]
+
+
+def stream_summaries(
+    streamed_file: StreamedSalesFile, summary_requests: list[SummaryRequest]
+) -> list[dict[str, dict[str, Union[float, None]]]]:
+    """
+    Compute summary requests in a single pass over the sales data file.
+
+    The file is read in chunks of bounded size and the filtered rows of every
+    chunk are folded into mergeable accumulators, one per request and column,
+    so the file is never held in memory as a whole. The median and
+    percentiles are approximate, with their rank error bound.
+    """
+
+    accumulators = [
+        {
+            column: ColumnAccumulator()
+            for column in dict.fromkeys(summary_request.columns or [])
+        }
+        for summary_request in summary_requests
+    ]
+
+    for chunk in read_sales_chunks(
+        streamed_file.version.path, settings.stream_chunk_rows
+    ):
+        for summary_request, columns in zip(summary_requests, accumulators):
+            filtered_data = filter_data(
+                chunk, summary_request.filters, list(columns)
+            )
+            for column, accumulator in columns.items():
+                if column not in filtered_data.columns:
+                    continue
+                values = _numeric_column(filtered_data[column])
+                if values is not None:
+                    accumulator.merge(ColumnAccumulator.from_values(values))
+
+    return [
+        {
+            column: accumulator.summarize(
+                summary_request.requested_statistics()
+            )
+            for column, accumulator in columns.items()
+            if accumulator.count
+        }
+        for summary_request, columns in zip(summary_requests, accumulators)
+    ]
+
+
+async def summarize(
+    source: SalesSource,
+    summary_request: SummaryRequest,
+    trace: Optional[SummaryTrace] = None,
+) -> dict[str, dict[str, Union[float, None]]]:
+    """
+    Return the statistics of a summary request, cached per dataset version.
+
+    Cache misses are computed on the compute executor, off the event loop,
+    from the loaded dataset or by streaming the sales data file. A traced
+    summary is always computed, so that its stages are added to the trace,
+    which records whether the cache would have answered it instead.
+    """
+
+    key = summary_cache_key(summary_request, source.version)
+    if trace is not None:
+        trace.cache = "hit" if key in summary_cache else "miss"
+    else:
+        cached_statistics = summary_cache.get(key)
+        if cached_statistics is not None:
+            return cached_statistics
+
+    if isinstance(source, StreamedSalesFile):
+        if trace is not None:
+            trace.path = "stream"
+        with traced(trace, "stream", "chunked file scan", None):
+            [statistics] = await compute_executor.run(
+                stream_summaries, source, [summary_request]
+            )
+    elif trace is not None:
+        # the trace is returned, since the summary may run in another process
+        statistics, computed = await compute_executor.run(
+            explain_summary, source, summary_request
+        )
+        trace.path = computed.path
+        trace.steps.extend(computed.steps)
+    else:
+        statistics = await compute_executor.run(
+            compute_summary, source, summary_request
+        )
+    summary_cache.put(key, statistics)
+    return statistics
+
+
+async def summarize_batch(
+    source: SalesSource, summary_requests: list[SummaryRequest]
+) -> list[dict[str, dict[str, Union[float, None]]]]:
+    """
+    Return the statistics of several summary requests, in order.
+
+    Cached results are reused and all the others are computed together, in a
+    single call to the compute executor.
+    """
+
+    keys = [
+        summary_cache_key(summary_request, source.version)
+        for summary_request in summary_requests
+    ]
+    results = [summary_cache.get(key) for key in keys]
+    missing = [
+        position for position, result in enumerate(results) if result is None
+    ]
+
+    if missing:
+        computed = await compute_executor.run(
+            stream_summaries
+            if isinstance(source, StreamedSalesFile)
+            else compute_batch,
+            source,
+            [summary_requests[position] for position in missing],
+        )
+        for position, statistics in zip(missing, computed):
+            summary_cache.put(keys[position], statistics)
+            results[position] = statistics
+
+    return [result or {} for result in results]
+
+
+async def summarize_grouped(
+    dataset: SalesDataset, summary_request: GroupedSummaryRequest
+) -> GroupedStatistics:
+    """Return the statistics of every group, cached per dataset version."""
+
+    key = summary_cache_key(summary_request, dataset.version)
+    cached_statistics = summary_cache.get(key)
+    if cached_statistics is not None:
+        return cached_statistics
 
+    statistics = await compute_executor.run(
+        compute_grouped_summary, dataset, summary_request
+    )
+    summary_cache.put(key, statistics)
     return statistics
@@ -0,0 +1,68 @@
+"""
+Sales data published once in shared memory for every worker process.
+
+The typed columns and index arrays of a dataset version are stored in the
+columnar sidecar layout, see `columnar_cache`, in a directory of a memory
+backed file system, `/dev/shm` by default. One segment is kept per version
+of the CSV, named after its SHA-256. The first worker process needing a
+version loads and publishes it while holding a file lock; the others wait
+for the lock and map the published segment read-only, so the data is held
+in memory once whatever the number of workers. Publishing a new version
+removes the segments of the previous ones, workers still mapping them keep
+a valid view until they switch to the new version.
+"""
+
+import fcntl
+import hashlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.apps.sales.columnar_cache import read_sidecar, write_sidecar
+from src.core.settings import settings
+
+LOCK_FILE = ".lock"
+
+
+def segment_root(path: Path) -> Path:
+    """Return the shared memory directory of the segments of a CSV file."""
+
+    digest = hashlib.sha256(str(path.resolve()).encode()).hexdigest()
+    return settings.shared_memory_dir / f"sales-{digest[:16]}"
+
+
+def attach_segment(
+    path: Path, sha256: str
+) -> Optional[tuple[pd.DataFrame, dict[str, np.ndarray]]]:
+    """Map the published frame and index arrays of the CSV version."""
+
+    return read_sidecar(path, sha256, root=segment_root(path))
+
+
+def publish_segment(
+    path: Path,
+    sha256: str,
+    frame: pd.DataFrame,
+    arrays: dict[str, np.ndarray],
+) -> None:
+    """Publish the frame and index arrays of the CSV version."""
+
+    write_sidecar(path, sha256, frame, arrays, root=segment_root(path))
+
+
+@contextmanager
+def loader_lock(path: Path) -> Iterator[None]:
+    """Hold the lock electing the worker loading a version of the CSV."""
+
+    root = segment_root(path)
+    root.mkdir(parents=True, exist_ok=True)
+    with (root / LOCK_FILE).open("a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,319 @@
+"""
+Mergeable quantile sketches of the sales measures.
+
+The values of every measure are split in partitions, one per (day,
+category), and each partition is summarized by at most `sketch_size` of its
+sorted values. A partition of more than twice that many values keeps evenly
+spaced samples, each weighing for the `n / sketch_size` values around it, so
+the rank of any value is known to within that weight. Sketches of the
+partitions matching a request are merged by sorting their weighted samples,
+which bounds the rank error of a quantile by the sum of the weights of the
+compressed partitions merged.
+"""
+
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from src.apps.sales.indexes import DateIndex
+from src.apps.sales.kernels import lerp
+
+# quantile of the statistics read from the sketches
+SKETCH_QUANTILES = {"median": 0.5, "percentile_25": 0.25, "percentile_75": 0.75}
+
+
+def _gather(offsets: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Return the positions of the ranges offsets[i]:offsets[i + 1]."""
+
+    lengths = offsets[starts + 1] - offsets[starts]
+    ends = np.cumsum(lengths)
+    return np.repeat(offsets[starts] - (ends - lengths), lengths) + np.arange(
+        ends[-1] if len(ends) else 0
+    )
+
+
+def sample_sorted(
+    values: np.ndarray, sketch_size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the samples of sorted values a sketch keeps, with their weights.
+
+    Values are kept whole up to twice the sketch size, see the module.
+    """
+
+    count = len(values)
+    if count <= 2 * sketch_size:
+        return values, np.ones(count)
+    ranks = ((np.arange(sketch_size) + 0.5) * count / sketch_size).astype(
+        np.int64
+    )
+    return values[ranks], np.full(sketch_size, count / sketch_size)
+
+
+def compact_weighted(
+    values: np.ndarray, weights: np.ndarray, sketch_size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return sketch_size samples standing for weighted samples, with weights.
+
+    The samples kept are the ones at evenly spaced ranks of the values the
+    weighted samples stand for, each weighing for as many of them, which
+    adds that weight to the rank error of the quantiles.
+    """
+
+    order = np.argsort(values)
+    covered = np.cumsum(weights[order])
+    total = covered[-1]
+    # the sample covering a rank is the first one weighing past it
+    ranks = (np.arange(sketch_size) + 0.5) * total / sketch_size
+    kept = np.minimum(covered.searchsorted(ranks, side="right"), len(order) - 1)
+    return values[order[kept]], np.full(sketch_size, total / sketch_size)
+
+
+def weighted_quantiles(
+    values: np.ndarray,
+    weights: np.ndarray,
+    count: int,
+    fractions: Sequence[float],
+) -> np.ndarray:
+    """Return quantiles of count values from their merged weighted samples."""
+
+    # samples of equal values are interchangeable, an unstable sort will do
+    # and is several times faster than a stable one on floats
+    order = np.argsort(values)
+    values = values[order]
+    covered = np.cumsum(weights[order])
+
+    # the sample covering a rank is the first one weighing past it
+    rank = np.asarray(fractions, dtype=np.float64) * (count - 1)
+    lower = np.floor(rank)
+    last = len(values) - 1
+    lower_values = values[
+        np.minimum(covered.searchsorted(lower, side="right"), last)
+    ]
+    upper_values = values[
+        np.minimum(covered.searchsorted(lower + 1, side="right"), last)
+    ]
+    return lerp(lower_values, upper_values, rank - lower)
+
+
+@dataclass(frozen=True, slots=True)
+class QuantileSketches:
+    """
+    Weighted samples of every measure per partition, ordered by day.
+
+    The samples of measure `m` in partition `p` are
+    `values[offsets[p, m]:offsets[p + 1, m]]`, sorted, along with their
+    `weights`, and `counts[p, m]` is the number of values they stand for.
+    """
+
+    measures: tuple[str, ...]
+    days: DateIndex
+    category_codes: np.ndarray
+    counts: np.ndarray
+    offsets: np.ndarray
+    values: np.ndarray
+    weights: np.ndarray
+
+    @classmethod
+    def from_frame(
+        cls, frame: pd.DataFrame, measures: tuple[str, ...], sketch_size: int
+    ) -> "QuantileSketches":
+        """Sketch the measures of a typed sales DataFrame."""
+
+        grouped = pd.DataFrame(
+            {
+                "day": frame["date"].to_numpy().astype("datetime64[D]"),
+                "code": frame["category"].cat.codes.to_numpy(),
+            }
+        ).groupby(["day", "code"], sort=True, dropna=False)
+        partitions = grouped.ngroup().to_numpy()
+        keys = grouped.size().index
+        partition_count = len(keys)
+
+        counts = np.zeros((partition_count, len(measures)), dtype=np.int64)
+        offsets = np.zeros((partition_count + 1, len(measures)), dtype=np.int64)
+        values, weights = [], []
+        sampled = 0
+        for position, measure in enumerate(measures):
+            column = frame[measure].to_numpy(dtype=np.float64, na_value=np.nan)
+            present = ~np.isnan(column)
+            column, owners = column[present], partitions[present]
+
+            # values sorted within their partition, partitions in order
+            order = np.lexsort((column, owners))
+            column = column[order]
+            sizes = np.bincount(owners, minlength=partition_count)
+            starts = np.cumsum(sizes) - sizes
+
+            samples = np.where(sizes > 2 * sketch_size, sketch_size, sizes)
+            sample_owners = np.repeat(np.arange(partition_count), samples)
+            ranks = np.arange(samples.sum()) - np.repeat(
+                np.cumsum(samples) - samples, samples
+            )
+            owner_sizes = sizes[sample_owners]
+            # evenly spaced ranks, the middle of the values each one stands for
+            ranks = np.where(
+                owner_sizes > 2 * sketch_size,
+                ((ranks + 0.5) * owner_sizes / sketch_size).astype(np.int64),
+                ranks,
+            )
+
+            values.append(column[starts[sample_owners] + ranks])
+            weights.append(owner_sizes / samples[sample_owners])
+            counts[:, position] = sizes
+            offsets[:, position] = sampled + np.append(0, np.cumsum(samples))
+            sampled += len(ranks)
+
+        return cls(
+            measures=measures,
+            days=DateIndex(keys.get_level_values(0).to_numpy("datetime64[s]")),
+            category_codes=keys.get_level_values(1).to_numpy(),
+            counts=counts,
+            offsets=offsets,
+            values=np.concatenate(values),
+            weights=np.concatenate(weights),
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: dict[str, np.ndarray], measures: tuple[str, ...]
+    ) -> "QuantileSketches":
+        """Rebuild the sketches from the arrays returned by `to_arrays`."""
+
+        return cls(
+            measures=measures,
+            days=DateIndex(arrays["sketch_days"]),
+            category_codes=arrays["sketch_category_codes"],
+            counts=arrays["sketch_counts"],
+            offsets=arrays["sketch_offsets"],
+            values=arrays["sketch_values"],
+            weights=arrays["sketch_weights"],
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Return the arrays the sketches are made of, for persisting them."""
+
+        return {
+            "sketch_days": self.days.dates,
+            "sketch_category_codes": self.category_codes,
+            "sketch_counts": self.counts,
+            "sketch_offsets": self.offsets,
+            "sketch_values": self.values,
+            "sketch_weights": self.weights,
+        }
+
+    def rebuild_from(
+        self, frame: pd.DataFrame, start: int, sketch_size: int
+    ) -> "QuantileSketches":
+        """
+        Return the sketches of frame, sketching only its rows from start on.
+
+        The rows before start must be the ones these sketches were built
+        from, with the same categories, and the rows from start on must be
+        dated on or after the day of the last of them. Only the partitions of
+        the days from the row at start on are sketched again.
+        """
+
+        day = frame["date"].to_numpy()[start].astype("datetime64[D]")
+        row = int(frame["date"].to_numpy().searchsorted(day))
+        kept = int(self.days.dates.searchsorted(day))
+        rebuilt = QuantileSketches.from_frame(
+            frame.iloc[row:], self.measures, sketch_size
+        )
+
+        # the samples of every measure are stored one measure after another
+        offsets = np.zeros(
+            (kept + len(rebuilt) + 1, len(self.measures)), np.int64
+        )
+        values, weights = [], []
+        stored = 0
+        for position in range(len(self.measures)):
+            old = self.offsets[: kept + 1, position]
+            new = rebuilt.offsets[:, position]
+            old_samples = slice(old[0], old[-1])
+            new_samples = slice(new[0], new[-1])
+            values += [self.values[old_samples], rebuilt.values[new_samples]]
+            weights += [self.weights[old_samples], rebuilt.weights[new_samples]]
+
+            offsets[: kept + 1, position] = stored + old - old[0]
+            stored += old[-1] - old[0]
+            offsets[kept + 1 :, position] = stored + new[1:] - new[0]
+            stored += new[-1] - new[0]
+
+        return QuantileSketches(
+            measures=self.measures,
+            days=DateIndex(
+                np.concatenate((self.days.dates[:kept], rebuilt.days.dates))
+            ),
+            category_codes=np.concatenate(
+                (self.category_codes[:kept], rebuilt.category_codes)
+            ),
+            counts=np.concatenate((self.counts[:kept], rebuilt.counts)),
+            offsets=offsets,
+            values=np.concatenate(values),
+            weights=np.concatenate(weights),
+        )
+
+    def __len__(self) -> int:
+        """Return the number of partitions."""
+
+        return len(self.category_codes)
+
+    def summarize(
+        self,
+        partitions: Union[slice, np.ndarray],
+        columns: Collection[str],
+        statistics: Collection[str],
+    ) -> dict[str, dict[str, Union[float, None]]]:
+        """
+        Merge the selected partitions into approximate quantiles of columns.
+
+        Every summarized column also gets the `rank_error` bound of its
+        quantiles, as a share of the number of values summarized.
+        """
+
+        selected = np.arange(len(self))[partitions]
+        # the samples of a range of partitions are contiguous
+        contiguous = isinstance(partitions, slice) and (
+            partitions.step in (None, 1)
+        )
+        summary: dict[str, dict[str, Union[float, None]]] = {}
+        for position, measure in enumerate(self.measures):
+            counts = self.counts[selected, position]
+            count = int(counts.sum())
+            if measure not in columns or not count:
+                continue
+
+            offsets = self.offsets[:, position]
+            samples: Union[slice, np.ndarray] = (
+                slice(offsets[selected[0]], offsets[selected[-1] + 1])
+                if contiguous
+                else _gather(offsets, selected)
+            )
+            quantiles = weighted_quantiles(
+                self.values[samples],
+                self.weights[samples],
+                count,
+                [SKETCH_QUANTILES[stat] for stat in statistics],
+            )
+
+            sample_counts = np.diff(self.offsets[:, position])[selected]
+            compressed = sample_counts < counts
+            summary[measure] = {
+                **{
+                    stat: float(value)
+                    for stat, value in zip(statistics, quantiles)
+                },
+                "rank_error": float(
+                    (counts[compressed] / sample_counts[compressed]).sum()
+                    / count
+                ),
+            }
+
+        return {
+            column: summary[column] for column in columns if column in summary
+        }
@@ -0,0 +1,168 @@
+"""
+Mergeable accumulators of the statistics of streamed sales data.
+
+A sales data file summarized in streaming mode is read one chunk at a time
+and every chunk is folded into one accumulator per summarized column. The
+mean and standard deviation come from the count, mean and sum of squared
+deviations, merged exactly; the mode from a histogram of the distinct
+values; the median and percentiles from a quantile sketch of every chunk,
+see `sketches`, compacted into a sketch of `QUANTILE_SKETCH_SIZE` samples
+once more than twice that many are merged. Memory depends on neither the
+number of rows nor the number of chunks.
+
+The histogram keeps at most `stream_mode_values` values: beyond that, it is
+a Misra-Gries heavy hitters summary, merged as in Agarwal et al., which
+keeps every value more frequent than a share 1 / (stream_mode_values + 1)
+of the rows. The mode is then the most frequent value kept, approximate
+when no value is that frequent.
+"""
+
+from collections.abc import Collection
+from dataclasses import dataclass, field
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from src.apps.sales.const import QUANTILE_SKETCH_SIZE
+from src.apps.sales.sketches import (
+    SKETCH_QUANTILES,
+    compact_weighted,
+    sample_sorted,
+    weighted_quantiles,
+)
+from src.core.settings import settings
+
+
+def _heavy_hitters(histogram: pd.Series) -> pd.Series:
+    """Return the histogram, bounded to the stream_mode_values most frequent."""
+
+    capacity = settings.stream_mode_values
+    if len(histogram) <= capacity:
+        return histogram
+
+    # every count is lowered by the first one left out, as in Misra-Gries
+    largest = histogram.nlargest(capacity + 1)
+    kept = largest.iloc[:capacity] - largest.iloc[capacity]
+    return kept[kept > 0]
+
+
+@dataclass(slots=True)
+class ColumnAccumulator:
+    """Mergeable summary of the values of a column folded in so far."""
+
+    count: int = 0
+    mean: float = 0.0
+    squared_deviations: float = 0.0
+    histogram: pd.Series = field(
+        default_factory=lambda: pd.Series(dtype=np.int64)
+    )
+    samples: list[np.ndarray] = field(default_factory=list)
+    weights: list[np.ndarray] = field(default_factory=list)
+    compressed_weight: float = 0.0
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "ColumnAccumulator":
+        """Summarize float64 values, NaN being missing."""
+
+        values = np.sort(values[~np.isnan(values)])
+        if not len(values):
+            return cls()
+
+        mean = float(values.mean())
+        samples, weights = sample_sorted(values, QUANTILE_SKETCH_SIZE)
+        return cls(
+            count=len(values),
+            mean=mean,
+            squared_deviations=float(((values - mean) ** 2).sum()),
+            histogram=_heavy_hitters(
+                pd.Series(values).value_counts(sort=False)
+            ),
+            samples=[samples],
+            weights=[weights],
+            compressed_weight=(
+                float(weights[0]) if len(samples) < len(values) else 0.0
+            ),
+        )
+
+    def merge(self, other: "ColumnAccumulator") -> None:
+        """Fold the values summarized by another accumulator into this one."""
+
+        if not other.count:
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        # Chan et al. merge of the sums of squared deviations
+        self.squared_deviations += (
+            other.squared_deviations
+            + delta**2 * self.count * other.count / count
+        )
+        self.mean += delta * other.count / count
+        self.count = count
+
+        self.histogram = _heavy_hitters(
+            self.histogram.add(other.histogram, fill_value=0)
+        )
+        self.samples.extend(other.samples)
+        self.weights.extend(other.weights)
+        self.compressed_weight += other.compressed_weight
+        if sum(map(len, self.samples)) > 2 * QUANTILE_SKETCH_SIZE:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Compact the quantile samples into a sketch of fixed size."""
+
+        samples, weights = compact_weighted(
+            np.concatenate(self.samples),
+            np.concatenate(self.weights),
+            QUANTILE_SKETCH_SIZE,
+        )
+        self.samples = [samples]
+        self.weights = [weights]
+        # every sample now stands for that many values around its rank
+        self.compressed_weight += float(weights[0])
+
+    def summarize(
+        self, statistics: Collection[str]
+    ) -> dict[str, Union[float, None]]:
+        """
+        Return the requested statistics of the values folded in.
+
+        Requests of the median or percentiles also get the `rank_error` bound
+        of those, as a share of the number of values.
+        """
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            results = {
+                "mean": self.mean,
+                "std_dev": float(
+                    np.sqrt(
+                        np.float64(self.squared_deviations) / (self.count - 1)
+                    )
+                ),
+            }
+
+        if "mode" in statistics:
+            top = self.histogram.max()
+            results["mode"] = float(
+                self.histogram.index[self.histogram == top].min()
+            )
+
+        sketched = [stat for stat in statistics if stat in SKETCH_QUANTILES]
+        if sketched:
+            quantiles = weighted_quantiles(
+                np.concatenate(self.samples),
+                np.concatenate(self.weights),
+                self.count,
+                [SKETCH_QUANTILES[stat] for stat in sketched],
+            )
+            for stat, value in zip(sketched, quantiles):
+                results[stat] = float(value)
+
+        summary: dict[str, Union[float, None]] = {
+            statistic: results[statistic] for statistic in statistics
+        }
+        if sketched:
+            summary["rank_error"] = self.compressed_weight / self.count
+        return summary
@@ -0,0 +1,78 @@
+"""
+Warm-up of the sales app before it takes traffic.
+
+Loading and indexing the sales data, the first run of the pandas and NumPy
+code paths, the compute executor threads and the JSON encoding all cost
+something the first time. Running a few summaries at startup pays for them
+before any request does, and leaves their results in the summary cache.
+"""
+
+import asyncio
+import logging
+
+import numpy as np
+
+from src.apps.sales.data_utils import SalesDataset, get_sales_source
+from src.apps.sales.dto import SummaryRequest
+from src.apps.sales.serialization import statistics_json
+from src.apps.sales.services import summarize
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_up_requests(dataset: SalesDataset) -> list[SummaryRequest]:
+    """Return summary requests going through every stage of a summary."""
+
+    requests = [
+        SummaryRequest.model_validate({}),
+        SummaryRequest.model_validate({"approximate": True}),
+    ]
+    dates = dataset.dates.dates
+    if len(dates) and not np.isnat(dates[0]):
+        first_day = dates[0].astype("datetime64[D]").item()
+        requests.append(
+            SummaryRequest.model_validate(
+                {
+                    "filters": {
+                        "date_range": {
+                            "start_date": first_day,
+                            "end_date": first_day,
+                        },
+                        "category": list(dataset.categories.ordered[:1]),
+                        "product_ids": [
+                            int(product_id)
+                            for product_id in dataset.products.product_ids[:1]
+                        ],
+                    }
+                }
+            )
+        )
+    return requests
+
+
+async def warm_up() -> bool:
+    """
+    Load the sales data and compute a few summaries of it.
+
+    Return whether the sales data could be loaded; a file that cannot be is
+    reported. The summaries are best-effort, any of them failing, e.g. on a
+    timeout or the file changing meanwhile, is logged and ends the warm-up,
+    the data being loaded already. In streaming mode only the categories
+    are scanned, since a summary would read the whole file.
+    """
+
+    try:
+        source = await asyncio.to_thread(get_sales_source)
+    except (OSError, ValueError):
+        logger.exception("Warming up failed")
+        return False
+
+    if isinstance(source, SalesDataset):
+        try:
+            for summary_request in _warm_up_requests(source):
+                statistics = await summarize(source, summary_request)
+                statistics_json(statistics)
+        # nothing a summary raises may keep the app from getting ready
+        except Exception:
+            logger.exception("Warm-up summaries did not complete")
+    return True
@@ -0,0 +1,127 @@
+"""
+Background reloading of the sales data when its file changes.
+
+The watcher runs on the event loop for the lifetime of the application and
+builds the next snapshot in a thread, off the request path, before it is
+published; requests keep being served the snapshot published last. On Linux
+the directory of the file is watched with inotify, so files written in place
+or renamed over the watched one are picked up right away; elsewhere, and as
+a safety net for writers that never close the file, its stat is polled.
+"""
+
+import asyncio
+import contextlib
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Optional
+
+from src.apps.sales.data_utils import get_streamed_file, watching
+from src.apps.sales.data_utils import get_dataset
+from src.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# inotify flags and events, see inotify(7)
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+WATCHED_EVENTS = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# wd, mask, cookie and name length heading every inotify event
+EVENT_HEADER = struct.Struct("iIII")
+EVENTS_BUFFER_SIZE = 64 * 1024
+
+
+def _open_inotify(directory: Path) -> Optional[int]:
+    """Return an inotify descriptor watching a directory, if available."""
+
+    library = ctypes.util.find_library("c")
+    if library is None:
+        return None
+    libc = ctypes.CDLL(library, use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        return None
+
+    fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), WATCHED_EVENTS) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _read_names(fd: int) -> set[str]:
+    """Return the names of the files of the pending inotify events."""
+
+    names = set()
+    with contextlib.suppress(BlockingIOError):
+        while buffer := os.read(fd, EVENTS_BUFFER_SIZE):
+            offset = 0
+            while offset < len(buffer):
+                _wd, _mask, _cookie, length = EVENT_HEADER.unpack_from(
+                    buffer, offset
+                )
+                offset += EVENT_HEADER.size
+                name = buffer[offset : offset + length].rstrip(b"\0")
+                names.add(os.fsdecode(name))
+                offset += length
+    return names
+
+
+def reload_sales_data() -> None:
+    """
+    Publish the snapshot of the current file, if it changed.
+
+    A file that cannot be loaded is reported and the snapshot published
+    last is kept.
+    """
+
+    try:
+        if settings.streaming:
+            get_streamed_file()
+        else:
+            get_dataset()
+    except (OSError, ValueError):
+        logger.exception("Reloading %s failed", settings.sales_data)
+
+
+async def watch_sales_data(interval: float) -> None:
+    """
+    Reload the sales data whenever its file changes, until cancelled.
+
+    The file is also checked every interval seconds, without inotify or when
+    no event arrives.
+    """
+
+    path = settings.sales_data
+    fd = _open_inotify(path.parent)
+    changed = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    if fd is not None:
+
+        def on_events() -> None:
+            if path.name in _read_names(fd):
+                changed.set()
+
+        loop.add_reader(fd, on_events)
+
+    try:
+        with watching():
+            while True:
+                await asyncio.to_thread(reload_sales_data)
+                # unlike wait_for, timeout never swallows a cancellation
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(interval):
+                        await changed.wait()
+                changed.clear()
+    finally:
+        if fd is not None:
+            loop.remove_reader(fd)
+            os.close(fd)
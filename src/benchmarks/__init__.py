@@ -0,0 +1 @@
+"""Benchmarks of the sales app and their synthetic data."""
@@ -0,0 +1,136 @@
+"""
+Deterministic generator of synthetic sales data files.
+
+The same rows, seed and chunk size always give the same file, so benchmark
+runs on different machines or commits measure the same data. Rows are in
+date order, over `DAYS` days. Products each belong to one category and
+their popularity follows a Zipf-like law, with a product cardinality growing
+with the number of rows, the way a catalogue does. A few measures are
+missing, like in real exports.
+"""
+
+import argparse
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = (
+    "Automotive",
+    "Baby",
+    "Beauty",
+    "Books",
+    "Clothing",
+    "Electronics",
+    "Garden",
+    "Grocery",
+    "Health",
+    "Home",
+    "Jewelry",
+    "Kitchen",
+    "Music",
+    "Office",
+    "Outdoors",
+    "Pet Supplies",
+    "Shoes",
+    "Software",
+    "Sports",
+    "Toys",
+)
+
+FIRST_DAY = np.datetime64("2021-01-01")
+DAYS = 3 * 365
+FIRST_PRODUCT_ID = 1000
+
+# rows generated and written at once, bounding the memory used
+CHUNK_ROWS = 1_000_000
+
+# share of the rows missing their quantity or price
+MISSING_SHARE = 0.001
+
+
+def product_count(rows: int) -> int:
+    """Return the number of products of a file of the given rows."""
+
+    return int(np.clip(rows // 200, 100, 50_000))
+
+
+def _catalogue(
+    products: int, seed: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the category, base price and popularity of every product."""
+
+    rng = np.random.default_rng([seed, 0])
+    categories = rng.integers(0, len(CATEGORIES), products)
+    prices = np.round(rng.lognormal(mean=3.0, sigma=1.0, size=products), 2)
+    popularity = 1.0 / np.arange(1, products + 1) ** 1.1
+    return categories, prices, popularity / popularity.sum()
+
+
+def generate_chunk(rows: int, start: int, stop: int, seed: int) -> pd.DataFrame:
+    """Return the rows start to stop of a file of the given rows."""
+
+    products = product_count(rows)
+    categories, prices, popularity = _catalogue(products, seed)
+    rng = np.random.default_rng([seed, 1, start])
+    count = stop - start
+
+    product = rng.choice(products, size=count, p=popularity)
+    # rows spread evenly over the days, in date order
+    days = np.arange(start, stop, dtype=np.int64) * DAYS // rows
+    quantity = rng.poisson(lam=rng.gamma(2.0, 5.0, count)) + 1
+    price = np.round(prices[product] * rng.normal(1.0, 0.05, count), 2)
+
+    frame = pd.DataFrame(
+        {
+            "date": (FIRST_DAY + days).astype("datetime64[D]"),
+            "product_id": FIRST_PRODUCT_ID + product,
+            "category": np.asarray(CATEGORIES)[categories[product]],
+            "quantity_sold": pd.Series(quantity, dtype="Int64"),
+            "price_per_unit": price,
+        }
+    )
+    for column in ("quantity_sold", "price_per_unit"):
+        frame.loc[rng.random(count) < MISSING_SHARE, column] = np.nan
+    return frame
+
+
+def generate_sales_data(
+    path: Path, rows: int, seed: int = 0, chunk_rows: int = CHUNK_ROWS
+) -> Path:
+    """Write a synthetic sales data file of the given rows, in chunks."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.partial")
+    with partial.open("w", encoding="utf-8", newline="") as file:
+        for start in range(0, rows, chunk_rows):
+            generate_chunk(
+                rows, start, min(start + chunk_rows, rows), seed
+            ).to_csv(
+                file,
+                header=start == 0,
+                index=False,
+                date_format="%Y-%m-%d",
+            )
+    # readers never see a file half written
+    partial.replace(path)
+    return path
+
+
+def main(argv: Sequence[str] = ()) -> int:
+    """Write the synthetic sales data file given on the command line."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate_sales_data(args.path, args.rows, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
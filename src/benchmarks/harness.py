@@ -0,0 +1,249 @@
+"""
+Benchmarks of the sales summary stages, compared against stored baselines.
+
+Every benchmark times one stage on a synthetic sales data file, see
+`generator`: loading it, filtering it, computing statistics, and serving a
+summary through the API with the summary cache turned off. The median of a
+few runs is compared with the baseline stored for the same number of rows,
+and a run slower than the baseline by more than the threshold is reported
+as a regression. Baselines are only comparable on the machine they were
+recorded on, record them again with `--update` after changing it.
+
+Run with `invoke bench`, or `python -m src.benchmarks.harness --help`.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from datetime import date
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+from src.apps.sales import data_utils
+from src.apps.sales.cache import summary_cache
+from src.apps.sales.const import MEASURE_COLUMNS, MOMENT_STATISTICS
+from src.apps.sales.data_utils import get_dataset, load_data
+from src.apps.sales.dto import DateRange, Filters
+from src.apps.sales.services import compute_statistics, filter_data
+from src.benchmarks.generator import (
+    CATEGORIES,
+    FIRST_DAY,
+    FIRST_PRODUCT_ID,
+    generate_sales_data,
+)
+from src.core.settings import settings
+
+BENCH_DIR = Path(__file__).parent
+BASELINES = BENCH_DIR / "baselines.json"
+DATA_DIR = settings.root_dir / "bench_data"
+
+# slowdowns smaller than this many seconds are noise, whatever the ratio
+NOISE_FLOOR = 0.001
+
+Benchmark = Callable[[], Any]
+
+
+def _filters() -> dict[str, Filters]:
+    """Return the filters benchmarked, from least to most selective."""
+
+    first_day = FIRST_DAY.astype(date)
+    month = DateRange(start_date=first_day, end_date=first_day.replace(day=28))
+    products = list(range(FIRST_PRODUCT_ID, FIRST_PRODUCT_ID + 100))
+    return {
+        name: Filters.model_validate(filters)
+        for name, filters in {
+            "none": {},
+            "date_range": {"date_range": month},
+            "category": {"category": [CATEGORIES[0]]},
+            "product_ids": {"product_ids": products[:10]},
+            "all": {
+                "date_range": month,
+                "category": list(CATEGORIES[:5]),
+                "product_ids": products,
+            },
+        }.items()
+    }
+
+
+def _forget_snapshot() -> None:
+    """Forget the loaded dataset, so that the next access loads it again."""
+
+    data_utils._snapshot = None  # noqa: SLF001
+
+
+def _load(columnar_cache: bool) -> Benchmark:  # noqa: FBT001
+    """Return a benchmark loading the sales data, from CSV or sidecar."""
+
+    def benchmark() -> Any:
+        _forget_snapshot()
+        enabled, settings.columnar_cache = (
+            settings.columnar_cache,
+            columnar_cache,
+        )
+        try:
+            return load_data()
+        finally:
+            settings.columnar_cache = enabled
+
+    return benchmark
+
+
+def benchmarks(client: TestClient) -> dict[str, Benchmark]:
+    """Return every benchmark, by name, for the configured sales data."""
+
+    dataset = get_dataset()
+    measures = list(MEASURE_COLUMNS)
+    frame = filter_data(dataset, None, measures)
+
+    cases: dict[str, Benchmark] = {
+        "load_data[csv]": _load(columnar_cache=False),
+        "load_data[sidecar]": _load(columnar_cache=True),
+        "compute_statistics[all]": lambda: compute_statistics(frame, measures),
+        "compute_statistics[moments]": lambda: compute_statistics(
+            frame, measures, sorted(MOMENT_STATISTICS)
+        ),
+    }
+    for name, filters in _filters().items():
+        cases[f"filter_data[{name}]"] = partial(
+            filter_data, dataset, filters, measures
+        )
+    for name, payload in {
+        "default": {},
+        "filtered": {
+            "filters": _filters()["all"].model_dump(mode="json"),
+        },
+        "approximate": {"approximate": True},
+        "moments": {"statistics": sorted(MOMENT_STATISTICS)},
+    }.items():
+        cases[f"summary[{name}]"] = partial(
+            client.post, "/summary", json=payload
+        )
+    return cases
+
+
+def time_benchmark(benchmark: Benchmark, repeat: int) -> float:
+    """Return the median seconds of repeat runs, after a warm-up run."""
+
+    benchmark()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def regressions(
+    results: dict[str, float], baselines: dict[str, float], threshold: float
+) -> list[str]:
+    """Return the benchmarks slower than their baseline past the threshold."""
+
+    return [
+        name
+        for name, seconds in results.items()
+        if name in baselines
+        and seconds > baselines[name] * (1 + threshold)
+        and seconds - baselines[name] > NOISE_FLOOR
+    ]
+
+
+def data_file(rows: int, seed: int) -> Path:
+    """Return the synthetic sales data file of rows, generating it once."""
+
+    path = DATA_DIR / f"sales_data_{rows}_{seed}.csv"
+    if not path.exists():
+        generate_sales_data(path, rows, seed)
+    return path
+
+
+@contextmanager
+def _benchmarked(path: Path) -> Iterator[TestClient]:
+    """Serve the given sales data without caching summaries, meanwhile."""
+
+    sales_data, cache_size = settings.sales_data, summary_cache.max_size
+    settings.sales_data = path
+    summary_cache.max_size = 0
+    try:
+        yield TestClient(app)
+    finally:
+        settings.sales_data = sales_data
+        summary_cache.max_size = cache_size
+        _forget_snapshot()
+
+
+def run(rows: int, seed: int, repeat: int, only: str = "") -> dict[str, float]:
+    """Run the benchmarks whose names contain only, on a file of rows."""
+
+    with _benchmarked(data_file(rows, seed)) as client:
+        return {
+            name: time_benchmark(benchmark, repeat)
+            for name, benchmark in benchmarks(client).items()
+            if only in name
+        }
+
+
+def _report(
+    results: dict[str, float], baselines: dict[str, float], slow: list[str]
+) -> str:
+    """Return a table of the results next to their baselines."""
+
+    lines = [f"{'benchmark':<32}{'median ms':>12}{'baseline ms':>14}{'':>6}"]
+    for name, seconds in results.items():
+        baseline = baselines.get(name)
+        lines.append(
+            f"{name:<32}{seconds * 1000:>12.3f}"
+            + (f"{baseline * 1000:>14.3f}" if baseline else f"{'-':>14}")
+            + (f"{'SLOW':>6}" if name in slow else "")
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Sequence[str] = ()) -> int:
+    """Run the benchmarks, return 1 if any regressed past the threshold."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="slowdown over the baseline reported as a regression",
+    )
+    parser.add_argument(
+        "--only", default="", help="run the benchmarks containing this"
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="store the results as the baselines",
+    )
+    args = parser.parse_args(argv)
+
+    stored = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    baselines = stored.get(str(args.rows), {})
+    results = run(args.rows, args.seed, args.repeat, args.only)
+    slow = regressions(results, baselines, args.threshold)
+    sys.stdout.write(_report(results, baselines, slow))
+
+    if args.update:
+        stored[str(args.rows)] = {**baselines, **results}
+        BASELINES.write_text(
+            json.dumps(stored, indent=2, sort_keys=True) + "\n"
+        )
+        return 0
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,377 @@
+"""
+Load test of the summary endpoint.
+
+A weighted mix of summary requests is replayed against the application,
+either by a fixed number of concurrent clients each sending its next request
+as soon as the previous one is answered, or at a fixed rate of requests per
+second whatever the response times. The application is started locally
+with uvicorn on a synthetic sales data file, see `generator`, unless the
+URL of a running one is given.
+
+The report has the throughput, a histogram and percentiles of the response
+times, the errors by status and the server time spent in every stage, read
+from the difference of the `/metrics` before and after the run.
+
+Run with `invoke loadtest`, or `python -m src.benchmarks.loadtest --help`.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+
+from src.benchmarks.generator import CATEGORIES, FIRST_PRODUCT_ID
+from src.benchmarks.harness import data_file
+
+# summary requests replayed by default, with their weight in the mix
+DEFAULT_MIX: list[dict[str, Any]] = [
+    {"weight": 4, "request": {}},
+    {
+        "weight": 3,
+        "request": {
+            "filters": {
+                "date_range": {
+                    "start_date": "2021-03-01",
+                    "end_date": "2021-03-31",
+                },
+                "category": [CATEGORIES[4]],
+            }
+        },
+    },
+    {
+        "weight": 2,
+        "request": {
+            "columns": ["price_per_unit"],
+            "filters": {
+                "product_ids": list(
+                    range(FIRST_PRODUCT_ID, FIRST_PRODUCT_ID + 20)
+                )
+            },
+        },
+    },
+    {"weight": 2, "request": {"statistics": ["mean", "std_dev"]}},
+    {"weight": 1, "request": {"approximate": True}},
+]
+
+# upper bounds in milliseconds of the response time histogram
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+STAGE_SAMPLE = re.compile(
+    r'^sales_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$', re.MULTILINE
+)
+
+
+@dataclass(frozen=True, slots=True)
+class LoadProfile:
+    """How long and how hard the application is loaded."""
+
+    duration: float
+    concurrency: int
+    # requests per second, as fast as the clients go when 0
+    rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass(slots=True)
+class LoadTestResult:
+    """Outcome of every request sent during a load test."""
+
+    seconds: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    errors: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def requests(self) -> int:
+        """Return the number of requests answered or failed."""
+
+        return len(self.latencies) + sum(self.errors.values())
+
+
+def load_mix(path: Optional[Path]) -> list[dict[str, Any]]:
+    """Return the request mix of a JSON file, the default one without."""
+
+    if path is None:
+        return DEFAULT_MIX
+    return json.loads(path.read_text())
+
+
+def _requests(mix: list[dict[str, Any]], seed: int) -> Iterator[Any]:
+    """Yield requests of the mix, at random with their weights, forever."""
+
+    rng = random.Random(seed)  # noqa: S311
+    payloads = [entry["request"] for entry in mix]
+    weights = [entry.get("weight", 1) for entry in mix]
+    while True:
+        yield from rng.choices(payloads, weights, k=1024)
+
+
+async def _send(
+    client: httpx.AsyncClient, payload: Any, result: LoadTestResult
+) -> None:
+    """Send a summary request, recording its response time or error."""
+
+    start = time.perf_counter()
+    try:
+        response = await client.post("/summary", json=payload)
+    except httpx.HTTPError as err:
+        result.errors[type(err).__name__] += 1
+        return
+    if response.is_success:
+        result.latencies.append(time.perf_counter() - start)
+    else:
+        result.errors[str(response.status_code)] += 1
+
+
+async def run_load(
+    client: httpx.AsyncClient, mix: list[dict[str, Any]], profile: LoadProfile
+) -> LoadTestResult:
+    """
+    Replay the mix for the duration of the profile and return the outcome.
+
+    Without a rate, concurrency clients send requests back to back; with a
+    rate, requests are sent on schedule with at most concurrency in flight,
+    and the ones that would exceed it are counted as `dropped`.
+    """
+
+    result = LoadTestResult()
+    requests = _requests(mix, profile.seed)
+    concurrency, rate = profile.concurrency, profile.rate
+    start = time.perf_counter()
+    deadline = start + profile.duration
+
+    if not rate:
+
+        async def closed_loop() -> None:
+            while time.perf_counter() < deadline:
+                await _send(client, next(requests), result)
+
+        await asyncio.gather(*(closed_loop() for _ in range(concurrency)))
+
+    else:
+        in_flight: set[asyncio.Task[None]] = set()
+        for sent in range(math.ceil(profile.duration * rate)):
+            await asyncio.sleep(
+                max(start + sent / rate - time.perf_counter(), 0)
+            )
+            if len(in_flight) >= concurrency:
+                result.errors["dropped"] += 1
+                continue
+            task = asyncio.create_task(_send(client, next(requests), result))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        await asyncio.gather(*in_flight)
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of values."""
+
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def stage_timings(before: str, after: str) -> dict[str, tuple[int, float]]:
+    """
+    Return the count and mean seconds of every stage between two scrapes.
+
+    Both are `/metrics` texts of the same server process.
+    """
+
+    samples: dict[tuple[str, str], float] = {}
+    for sign, text in ((-1, before), (1, after)):
+        for kind, stage, value in STAGE_SAMPLE.findall(text):
+            samples[kind, stage] = samples.get(
+                (kind, stage), 0.0
+            ) + sign * float(value)
+
+    timings = {}
+    for (kind, stage), count in sorted(samples.items()):
+        if kind == "count" and count > 0:
+            timings[stage] = (int(count), samples["sum", stage] / count)
+    return timings
+
+
+def report(result: LoadTestResult, stages: dict[str, tuple[int, float]]) -> str:
+    """Return the load test report."""
+
+    lines = [
+        f"requests     {result.requests} in {result.seconds:.1f} s",
+        f"throughput   {len(result.latencies) / result.seconds:.1f} req/s",
+        f"errors       {sum(result.errors.values())}"
+        + "".join(
+            f"  {error}: {count}"
+            for error, count in sorted(result.errors.items())
+        ),
+    ]
+
+    latencies = [latency * 1000 for latency in result.latencies]
+    if latencies:
+        lines.append(
+            "latency ms   "
+            + "  ".join(
+                f"p{round(fraction * 100)} {percentile(latencies, fraction):.1f}"
+                for fraction in (0.5, 0.9, 0.99)
+            )
+            + f"  max {max(latencies):.1f}"
+        )
+        lines.append("")
+        counts = Counter(
+            next(
+                (bound for bound in HISTOGRAM_BOUNDS if latency <= bound),
+                math.inf,
+            )
+            for latency in latencies
+        )
+        widest = max(counts.values())
+        for bound in (*HISTOGRAM_BOUNDS, math.inf):
+            if counts[bound]:
+                label = f"<= {bound:g} ms" if bound != math.inf else "> 5000 ms"
+                bar = "#" * max(round(40 * counts[bound] / widest), 1)
+                lines.append(f"{label:>12} {counts[bound]:>8} {bar}")
+
+    if stages:
+        lines.append("")
+        lines.append(f"{'server stage':<24}{'count':>10}{'mean ms':>12}")
+        lines.extend(
+            f"{stage:<24}{count:>10}{mean * 1000:>12.3f}"
+            for stage, (count, mean) in stages.items()
+        )
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def local_server(
+    sales_data: Path,
+    port: int,
+    summary_cache: bool,  # noqa: FBT001
+) -> Iterator[str]:
+    """Run the application with uvicorn meanwhile, return its URL once ready."""
+
+    env = {
+        **os.environ,
+        "SALES_DATA": str(sales_data),
+        "SUMMARY_CACHE_SIZE": os.environ.get("SUMMARY_CACHE_SIZE", "1024")
+        if summary_cache
+        else "0",
+    }
+    server = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            if server.poll() is not None:
+                message = "The application exited while starting"
+                raise RuntimeError(message)
+            try:
+                if httpx.get(f"{url}/healthz/ready").is_success:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                message = "The application did not get ready in time"
+                raise RuntimeError(message)
+            time.sleep(0.1)
+        yield url
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def load_test(
+    url: str, mix: list[dict[str, Any]], profile: LoadProfile
+) -> tuple[LoadTestResult, dict[str, tuple[int, float]]]:
+    """Run a load test against the application at url, with stage timings."""
+
+    limits = httpx.Limits(max_connections=profile.concurrency)
+    async with httpx.AsyncClient(
+        base_url=url, limits=limits, timeout=60
+    ) as client:
+        before = (await client.get("/metrics")).text
+        result = await run_load(client, mix, profile)
+        after = (await client.get("/metrics")).text
+    return result, stage_timings(before, after)
+
+
+def main(argv: Sequence[str] = ()) -> int:
+    """Run a load test, return 1 if any request failed."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--url", default="", help="application to test, started locally without"
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument(
+        "--mix",
+        type=Path,
+        help='JSON list of {"weight": ..., "request": {...}} summary requests',
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help="requests per second, as fast as the clients go without",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="turn the summary cache of the local application off",
+    )
+    args = parser.parse_args(argv)
+
+    mix = load_mix(args.mix)
+    server = (
+        nullcontext(args.url)
+        if args.url
+        else local_server(
+            data_file(args.rows, args.seed), args.port, not args.no_cache
+        )
+    )
+    with server as url:
+        result, stages = asyncio.run(
+            load_test(
+                url,
+                mix,
+                LoadProfile(
+                    args.duration, args.concurrency, args.rate, args.seed
+                ),
+            )
+        )
+    sys.stdout.write(report(result, stages))
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
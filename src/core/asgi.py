@@ -1,5 +1,8 @@
 """Project configuration file."""
 
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -7,7 +10,48 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 
 from src.core.common_types import SingletonMeta
+from src.core.executor import compute_executor
+from src.core.health import ready
+from src.core.health import router as health_router
+from src.core.metrics import MetricsMiddleware
+from src.core.metrics import router as metrics_router
+from src.core.settings import settings
 from src.apps.sales.routers import router
+from src.apps.sales.warmup import warm_up
+from src.apps.sales.watcher import watch_sales_data
+
+
+async def _serve_sales_data() -> None:
+    """Warm the sales app up, then keep its data current."""
+
+    if settings.warm_up:
+        # a file that cannot be loaded yet is retried until it can
+        while not await warm_up():
+            await asyncio.sleep(settings.watch_interval)
+    ready.set()
+
+    if settings.watch_sales_data:
+        await watch_sales_data(settings.watch_interval)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    """
+    Serve the sales data while the application is up.
+
+    The warm-up runs in the background so that the liveness probe answers
+    meanwhile; the readiness probe only does once it is done.
+    """
+
+    server = asyncio.create_task(_serve_sales_data())
+
+    yield
+
+    ready.clear()
+    server.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await server
+    compute_executor.shutdown()
 
 
 class ApplicationConfig(metaclass=SingletonMeta):
@@ -22,8 +66,12 @@ class ApplicationConfig(metaclass=SingletonMeta):
         self._asgi_app = FastAPI(
             title="Compstak Sales App",
             description="Sales Compstack - API Documentation",
+            lifespan=lifespan,
         )
         self._asgi_app.include_router(router)
+        self._asgi_app.include_router(health_router)
+        self._asgi_app.include_router(metrics_router)
+        self._asgi_app.add_middleware(MetricsMiddleware)
 
         # Mount the static files
         static_dir = Path(__file__).parent.parent / "static"
@@ -0,0 +1,158 @@
+"""Bounded executor running CPU-bound work off the event loop."""
+
+import asyncio
+import pickle
+import threading
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Literal, Optional, TypeVar
+
+from src.core.metrics import Gauge, registry, stage_seconds
+from src.core.settings import settings
+
+T = TypeVar("T")
+
+
+class ComputeOverloadedError(RuntimeError):
+    """Raised when the executor queue is full."""
+
+
+def _observed(call: bytes) -> tuple[Any, list[tuple[str, float]]]:
+    """
+    Return the result of a pickled call and the stage durations it observed.
+
+    The call is unpickled while observing too, since unpickling a dataset
+    snapshot loads it in the worker, see `dataset_for_version`.
+    """
+
+    with stage_seconds.collected() as observations:
+        func, args = pickle.loads(call)  # noqa: S301
+        result = func(*args)
+    return result, observations
+
+
+class ComputeExecutor:
+    """
+    Thread or process pool with a bounded queue and a per call timeout.
+
+    At most `workers` calls run at once and at most `queue_depth` more wait
+    for a worker; further calls are rejected right away instead of piling up.
+    A call that times out is no longer awaited, but keeps its slot until the
+    worker is done with it. The stage durations observed by a call in a
+    worker process are recorded by this process once it returns.
+    """
+
+    __slots__ = (
+        "_in_flight",
+        "_lock",
+        "_pool",
+        "kind",
+        "max_queue_depth",
+        "timeout",
+        "workers",
+    )
+
+    def __init__(
+        self,
+        kind: Literal["thread", "process"],
+        workers: int,
+        queue_depth: int,
+        timeout: float,
+    ) -> None:
+        """Initialize the executor, the pool is started on first use."""
+
+        self.kind = kind
+        self.workers = workers
+        self.max_queue_depth = queue_depth
+        self.timeout = timeout
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._pool: Optional[Executor] = None
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of calls running or waiting for a worker."""
+
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of calls waiting for a worker."""
+
+        return max(self._in_flight - self.workers, 0)
+
+    def _get_pool(self) -> Executor:
+        """Return the pool, starting it if needed."""
+
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="compute"
+                )
+        return self._pool
+
+    def _release(self, _future: Future) -> None:
+        """Free the slot of a finished call."""
+
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Run func(*args) in the pool and return its result."""
+
+        if self.kind != "process":
+            return await self._submit(func, *args)
+
+        result, observations = await self._submit(
+            _observed, pickle.dumps((func, args))
+        )
+        for label_value, seconds in observations:
+            stage_seconds.observe(label_value, seconds)
+        return result
+
+    async def _submit(self, func: Callable[..., T], *args: Any) -> T:
+        """Run func(*args) in a slot of the pool and return its result."""
+
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue_depth:
+                error_msg = "Compute queue is full"
+                raise ComputeOverloadedError(error_msg)
+            self._in_flight += 1
+
+        try:
+            future = self._get_pool().submit(partial(func, *args))
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+        future.add_done_callback(self._release)
+        return await asyncio.wait_for(
+            asyncio.wrap_future(future), timeout=self.timeout
+        )
+
+    def shutdown(self) -> None:
+        """Stop the pool, without waiting for running calls."""
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+compute_executor = ComputeExecutor(
+    kind=settings.compute_executor,
+    workers=settings.compute_workers,
+    queue_depth=settings.compute_queue_depth,
+    timeout=settings.compute_timeout,
+)
+registry.register(
+    Gauge(
+        "compute_executor_queue_depth",
+        "Calls waiting for a compute executor worker.",
+        lambda: compute_executor.queue_depth,
+    )
+)
@@ -0,0 +1,43 @@
+"""Liveness and readiness probes of the application."""
+
+import threading
+from http.client import SERVICE_UNAVAILABLE
+
+from fastapi import APIRouter, HTTPException
+
+__all__ = ("ready", "router")
+router = APIRouter(prefix="/healthz", tags=["health"])
+
+# set once the application is warmed up and can take traffic
+ready = threading.Event()
+
+
+@router.get(
+    "/live",
+    summary="Liveness probe",
+    description="Answers as long as the application is serving requests.",
+)
+async def live_router() -> dict[str, str]:
+    """Report the application is up."""
+
+    return {"status": "live"}
+
+
+@router.get(
+    "/ready",
+    summary="Readiness probe",
+    description=(
+        "Answers once the sales data is loaded and indexed and a summary "
+        "has been computed, and with 503 until then."
+    ),
+    responses={SERVICE_UNAVAILABLE: {"description": "Still warming up."}},
+)
+async def ready_router() -> dict[str, str]:
+    """Report whether the application can take traffic."""
+
+    if not ready.is_set():
+        raise HTTPException(
+            status_code=SERVICE_UNAVAILABLE,
+            detail="The application is warming up.",
+        )
+    return {"status": "ready"}
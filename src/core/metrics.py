@@ -0,0 +1,377 @@
+"""
+Prometheus metrics of the application, in the text exposition format.
+
+Only what the application needs is implemented, without depending on the
+Prometheus client: histograms and counters with a single label, and gauges
+read when the metrics are scraped. Recording a value only takes a lock and
+a bisection, a microsecond or so on the request path.
+"""
+
+import bisect
+import os
+import resource
+import threading
+import time
+from pathlib import Path
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional, ParamSpec, Protocol, TypeVar
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+__all__ = (
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsMiddleware",
+    "registry",
+    "responses_total",
+    "router",
+    "stage_seconds",
+)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# upper bounds in seconds of the buckets of the stage durations
+STAGE_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _format_value(value: float) -> str:
+    """Return a sample value the way Prometheus writes it."""
+
+    if value == float("inf"):
+        return "+Inf"
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _escape(label_value: str) -> str:
+    """Escape a label value for the text exposition format."""
+
+    return (
+        label_value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+class Metric(Protocol):
+    """Metric the registry can render."""
+
+    name: str
+
+    def render(self) -> list[str]:
+        """Return the lines of the metric in the text exposition format."""
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Histogram:
+    """Histogram of observed values, one series per value of its label."""
+
+    __slots__ = (
+        "_collected",
+        "_lock",
+        "_series",
+        "buckets",
+        "description",
+        "label",
+        "name",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label: str,
+        buckets: tuple[float, ...] = STAGE_BUCKETS,
+    ) -> None:
+        """Initialize the histogram, without any series."""
+
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        # per label value, the count of every bucket, +Inf last, and the sum
+        self._series: dict[str, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+        self._collected: Optional[list[tuple[str, float]]] = None
+
+    def observe(self, label_value: str, value: float) -> None:
+        """Record a value in the series of a label value."""
+
+        collected = self._collected
+        if collected is not None:
+            collected.append((label_value, value))
+            return
+
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[label_value] = series
+            series[0][bucket] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, label_value: str) -> Iterator[None]:
+        """Record the seconds the block takes, even when it raises."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label_value, time.perf_counter() - start)
+
+    @contextmanager
+    def collected(self) -> Iterator[list[tuple[str, float]]]:
+        """
+        Collect the values observed by the block instead of recording them.
+
+        Worker processes have their own histograms, so the values observed
+        there are collected and sent back to be recorded by the parent. Only
+        for a process running one call at a time.
+        """
+
+        collected: list[tuple[str, float]] = []
+        self._collected = collected
+        try:
+            yield collected
+        finally:
+            self._collected = None
+
+    def timed(
+        self, label_value: str
+    ) -> Callable[[Callable[P, T]], Callable[P, T]]:
+        """Decorate a function to record the seconds every call takes."""
+
+        def decorator(func: Callable[P, T]) -> Callable[P, T]:
+            @wraps(func)
+            def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(label_value, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def render(self) -> list[str]:
+        """Return the lines of the histogram in the text exposition format."""
+
+        with self._lock:
+            series = {
+                label_value: (list(counts), total[0])
+                for label_value, (counts, total) in self._series.items()
+            }
+
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for label_value, (counts, total) in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label},le="{_format_value(bound)}"}}'
+                    f" {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{{{label}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one series per value of its label."""
+
+    __slots__ = ("_lock", "_values", "description", "label", "name")
+
+    def __init__(self, name: str, description: str, label: str) -> None:
+        """Initialize the counter, without any series."""
+
+        self.name = name
+        self.description = description
+        self.label = label
+        self._values: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: int = 1) -> None:
+        """Add to the series of a label value."""
+
+        with self._lock:
+            self._values[label_value] = (
+                self._values.get(label_value, 0) + amount
+            )
+
+    def render(self) -> list[str]:
+        """Return the lines of the counter in the text exposition format."""
+
+        with self._lock:
+            values = dict(self._values)
+
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+            *(
+                f'{self.name}{{{self.label}="{_escape(label_value)}"}} {value}'
+                for label_value, value in sorted(values.items())
+            ),
+        ]
+
+
+class Gauge:
+    """Value read from the application whenever the metrics are scraped."""
+
+    __slots__ = ("description", "name", "read")
+
+    def __init__(
+        self, name: str, description: str, read: Callable[[], float]
+    ) -> None:
+        """Initialize the gauge with the function reading its value."""
+
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def render(self) -> list[str]:
+        """Return the lines of the gauge in the text exposition format."""
+
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.read())}",
+        ]
+
+
+class MetricsRegistry:
+    """Metrics exposed by the application, by name."""
+
+    __slots__ = ("_metrics",)
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        """Add a metric, replacing any of the same name, and return it."""
+
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Return every metric in the text exposition format."""
+
+        return "".join(
+            f"{line}\n"
+            for _name, metric in sorted(self._metrics.items())
+            for line in metric.render()
+        )
+
+
+def _resident_bytes() -> float:
+    """Return the resident memory of the process, its peak if unknown."""
+
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.register(
+    Histogram(
+        "sales_stage_seconds",
+        "Seconds spent in every stage of serving the sales summaries.",
+        "stage",
+    )
+)
+responses_total = registry.register(
+    Counter(
+        "http_responses_total", "HTTP responses sent, by status code.", "code"
+    )
+)
+registry.register(
+    Gauge(
+        "process_resident_memory_bytes",
+        "Resident memory of the process in bytes.",
+        _resident_bytes,
+    )
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting the HTTP responses by status code."""
+
+    __slots__ = ("app",)
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Wrap an ASGI application."""
+
+        self.app = app
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Serve a request, counting the status of its response."""
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_counted(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                responses_total.inc(str(message["status"]))
+            await send(message)
+
+        await self.app(scope, receive, send_counted)
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Prometheus metrics",
+    description=(
+        "Stage durations, response counts and gauges of the application, in "
+        "the Prometheus text exposition format."
+    ),
+)
+async def metrics_router() -> PlainTextResponse:
+    """Return the metrics of the application."""
+
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -1,6 +1,7 @@
 """Project settings."""
 
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,6 +11,51 @@ class Settings(BaseSettings):
     root_dir: Path = Path(__file__).parent.parent.parent.resolve()
     sales_data: Path = root_dir / "sales_data.csv"
 
+    # memory-mapped columnar copy of the sales data, kept next to the CSV
+    columnar_cache: bool = True
+
+    # publish the loaded sales data once in shared memory, every worker
+    # process maps it read-only instead of holding its own copy
+    shared_memory: bool = False
+    shared_memory_dir: Path = Path("/dev/shm")
+
+    # summarize the sales data file in bounded chunks instead of loading it,
+    # for files larger than the memory available; reading the whole file per
+    # summary may need a longer compute_timeout. The mode counts at most
+    # stream_mode_values distinct values per column, it is approximate for
+    # columns with more, where no value is frequent
+    streaming: bool = False
+    stream_chunk_rows: int = 1_000_000
+    stream_mode_values: int = 100_000
+
+    # load the sales data and compute a few summaries at startup, the
+    # readiness probe only answers once done
+    warm_up: bool = True
+
+    # reload the sales data in the background when its file changes instead
+    # of on the request path, checking the file every watch_interval seconds
+    # besides the inotify events
+    watch_sales_data: bool = True
+    watch_interval: float = 1.0
+
+    # summary results cached per request and dataset version, ttl in seconds
+    summary_cache_size: int = 1024
+    summary_cache_ttl: float = 300.0
+
+    # most summary requests a batch may carry, a batch runs as a single
+    # executor call under one compute_timeout
+    summary_batch_max: int = 100
+
+    # Cache-Control of the summaries, which carry an ETag of the request and
+    # dataset version, so that caches can revalidate them for a 304
+    summary_cache_control: str = "no-cache"
+
+    # pool running the pandas work off the event loop, timeout in seconds
+    compute_executor: Literal["thread", "process"] = "thread"
+    compute_workers: int = 4
+    compute_queue_depth: int = 64
+    compute_timeout: float = 30.0
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
@@ -0,0 +1,116 @@
+"""Tests for the summary result cache."""
+
+from pathlib import Path
+
+from src.apps.sales.cache import SummaryCache, summary_cache_key
+from src.apps.sales.data_utils import DatasetVersion
+from src.apps.sales.dto import DateRange, Filters, SummaryRequest
+from src.tests.const import Some
+
+VERSION = DatasetVersion(
+    path=Path("sales_data.csv"), mtime_ns=0, size=0, sha256="a" * 64
+)
+OTHER_VERSION = DatasetVersion(
+    path=Path("sales_data.csv"), mtime_ns=0, size=0, sha256="b" * 64
+)
+
+
+class FakeClock:
+    """Clock advanced by hand."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+def test_summary_cache_key_normalizes_filters() -> None:
+    """Test requests selecting the same data share the cache key."""
+
+    request = SummaryRequest(
+        filters=Filters(  # type: ignore[call-arg]
+            date_range=DateRange(
+                start_date="2023-01-01",  # type: ignore[arg-type]
+                end_date=Some.END_DATE,
+            ),
+            product_ids=[1002, 1001, 1002],
+        )
+    )
+    same_request = SummaryRequest(
+        filters=Filters(  # type: ignore[call-arg]
+            date_range=Some.DATE_RANGE,
+            category=[],
+            product_ids=[1001, 1002],
+        )
+    )
+    other_request = SummaryRequest(
+        filters=Filters(product_ids=[1001, 1002]),  # type: ignore[call-arg]
+    )
+
+    key = summary_cache_key(request, VERSION)
+
+    assert key == summary_cache_key(same_request, VERSION)
+    assert key != summary_cache_key(other_request, VERSION)
+    assert key != summary_cache_key(request, OTHER_VERSION)
+
+
+def test_summary_cache_evicts_least_recently_used() -> None:
+    """Test the cache keeps at most max_size recently used entries."""
+
+    cache = SummaryCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3  # noqa: PLR2004
+
+
+def test_summary_cache_expires_entries() -> None:
+    """Test entries are dropped once their time to live has passed."""
+
+    clock = FakeClock()
+    cache = SummaryCache(max_size=2, ttl=60, clock=clock)
+    cache.put("a", 1)
+
+    clock.now = 59
+    assert cache.get("a") == 1
+
+    clock.now = 60
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_summary_cache_contains_without_lookup() -> None:
+    """Test membership ignores expired entries and is not counted."""
+
+    clock = FakeClock()
+    cache = SummaryCache(max_size=2, ttl=60, clock=clock)
+    cache.put("a", 1)
+
+    assert "a" in cache
+    assert "b" not in cache
+    clock.now = 60
+    assert "a" not in cache
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_summary_cache_counts_hits_and_misses() -> None:
+    """Test the hit and miss counters and the hit ratio."""
+
+    cache = SummaryCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+
+    expected_hits = 2
+    expected_misses = 1
+    assert cache.hits == expected_hits
+    assert cache.misses == expected_misses
+    assert cache.hit_ratio == expected_hits / (expected_hits + expected_misses)
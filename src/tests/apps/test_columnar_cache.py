@@ -0,0 +1,103 @@
+"""Tests for the columnar sidecar cache of the sales data."""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.apps.sales.columnar_cache import (
+    MANIFEST_FILE,
+    read_sidecar,
+    sidecar_root,
+    write_sidecar,
+)
+
+SHA256 = "a" * 64
+INDEX_ARRAYS = {"product_ids": np.array([1001, 1002], dtype=np.int32)}
+OTHER_SHA256 = "b" * 64
+
+
+@pytest.fixture
+def sales_frame() -> pd.DataFrame:
+    """Fixture providing a typed sales DataFrame."""
+
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2023-01-01", "2023-01-15"]),
+            "product_id": [1001, 1002],
+            "category": pd.Categorical(["Electronics", "Clothing"]),
+            "quantity_sold": [10, 20],
+            "price_per_unit": [5.0, 15.0],
+        }
+    )
+
+
+def test_sidecar_round_trip(tmp_path: Path, sales_frame: pd.DataFrame) -> None:
+    """Test a written sidecar is read back memory-mapped and unchanged."""
+
+    csv_path = tmp_path / "sales_data.csv"
+    write_sidecar(csv_path, SHA256, sales_frame, INDEX_ARRAYS)
+
+    cached = read_sidecar(csv_path, SHA256)
+
+    assert cached is not None
+    frame, arrays = cached
+    pd.testing.assert_frame_equal(frame, sales_frame)
+    np.testing.assert_array_equal(
+        arrays["product_ids"], INDEX_ARRAYS["product_ids"]
+    )
+    # read-only columns are the memory-mapped sidecar files
+    assert not frame["price_per_unit"].to_numpy().flags.writeable
+
+
+def test_sidecar_round_trip_missing_product_ids(
+    tmp_path: Path, sales_frame: pd.DataFrame
+) -> None:
+    """Test nullable product ids are read back with their missing values."""
+
+    csv_path = tmp_path / "sales_data.csv"
+    sales_frame["product_id"] = pd.array([3_000_000_000, None], dtype="Int64")
+    write_sidecar(csv_path, SHA256, sales_frame, INDEX_ARRAYS)
+
+    cached = read_sidecar(csv_path, SHA256)
+
+    assert cached is not None
+    pd.testing.assert_frame_equal(cached[0], sales_frame)
+
+
+def test_sidecar_other_version_is_a_miss(
+    tmp_path: Path, sales_frame: pd.DataFrame
+) -> None:
+    """Test a sidecar is only used for the CSV version it was built from."""
+
+    csv_path = tmp_path / "sales_data.csv"
+    write_sidecar(csv_path, SHA256, sales_frame, INDEX_ARRAYS)
+
+    assert read_sidecar(csv_path, OTHER_SHA256) is None
+
+
+def test_sidecar_replaces_stale_versions(
+    tmp_path: Path, sales_frame: pd.DataFrame
+) -> None:
+    """Test writing a new version removes the sidecar of the old one."""
+
+    csv_path = tmp_path / "sales_data.csv"
+    write_sidecar(csv_path, SHA256, sales_frame, INDEX_ARRAYS)
+    write_sidecar(csv_path, OTHER_SHA256, sales_frame, INDEX_ARRAYS)
+
+    assert [path.name for path in sidecar_root(csv_path).iterdir()] == [
+        OTHER_SHA256
+    ]
+
+
+def test_sidecar_corrupt_manifest_is_a_miss(
+    tmp_path: Path, sales_frame: pd.DataFrame
+) -> None:
+    """Test a corrupt sidecar is ignored instead of failing the load."""
+
+    csv_path = tmp_path / "sales_data.csv"
+    write_sidecar(csv_path, SHA256, sales_frame, INDEX_ARRAYS)
+    (sidecar_root(csv_path) / SHA256 / MANIFEST_FILE).write_text("{")
+
+    assert read_sidecar(csv_path, SHA256) is None
@@ -0,0 +1,76 @@
+"""Tests for the conditional requests of the summaries."""
+
+from http.client import NOT_MODIFIED
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from src.apps.sales.conditional import cache_headers, entity_tag, not_modified
+from src.apps.sales.data_utils import DatasetVersion, StreamedSalesFile
+from src.apps.sales.dto import SummaryRequest
+from src.apps.sales.indexes import CategoryIndex
+
+ETAG = '"abc"'
+
+
+@pytest.fixture
+def source() -> StreamedSalesFile:
+    """Fixture of a sales data file loaded at the epoch."""
+
+    return StreamedSalesFile(
+        version=DatasetVersion(
+            path=Path("sales_data.csv"), mtime_ns=0, size=0, sha256="0" * 64
+        ),
+        categories=CategoryIndex(("Books",)),
+        loaded_at=0.0,
+    )
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "expected"),
+    [
+        (None, False),
+        ('"abd"', False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"abd", "abc"', True),
+        ("*", True),
+    ],
+)
+def test_not_modified(if_none_match: Optional[str], expected: bool) -> None:  # noqa: FBT001
+    """Test If-None-Match is compared weakly to the ETag, with lists."""
+
+    response = not_modified(if_none_match, {"ETag": ETAG})
+
+    assert (response is not None) == expected
+    if response is not None:
+        assert response.status_code == NOT_MODIFIED
+        assert response.headers["ETag"] == ETAG
+
+
+def test_cache_headers(source: StreamedSalesFile) -> None:
+    """Test the headers of a summary, Last-Modified being the load time."""
+
+    headers = cache_headers([SummaryRequest.model_validate({})], source)
+
+    assert headers["Last-Modified"] == "Thu, 01 Jan 1970 00:00:00 GMT"
+    assert headers["Cache-Control"] == "no-cache"
+
+
+def test_entity_tag(source: StreamedSalesFile) -> None:
+    """Test equivalent requests share an ETag, batches one of all requests."""
+
+    books = SummaryRequest.model_validate(
+        {"filters": {"product_ids": [2, 1, 2]}}
+    )
+    same_books = SummaryRequest.model_validate(
+        {"filters": {"product_ids": [1, 2]}}
+    )
+    default = SummaryRequest.model_validate({})
+
+    assert entity_tag([books], source) == entity_tag([same_books], source)
+    assert entity_tag([books], source) != entity_tag([default], source)
+    assert entity_tag([books, default], source) != entity_tag(
+        [default, books], source
+    )
@@ -0,0 +1,124 @@
+"""Tests for the sufficient-statistics cube."""
+
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.apps.sales.const import MEASURE_COLUMNS, SALES_SCHEMA
+from src.apps.sales.cube import SalesCube
+from src.apps.sales.data_utils import DatasetVersion, SalesDataset
+from src.apps.sales import dto
+from src.apps.sales.dto import DateRange, Filters, SummaryRequest
+from src.apps.sales.services import compute_summary
+
+MISSING_RATIO = 0.05
+
+
+@pytest.fixture
+def dataset() -> SalesDataset:
+    """Fixture to provide random sales data with repeated cells."""
+
+    rng = np.random.default_rng(7)
+    rows = 2000
+    frame = pd.DataFrame(
+        {
+            "date": pd.Timestamp("2023-01-01")
+            + pd.to_timedelta(rng.integers(0, 60, rows), unit="D"),
+            "product_id": rng.integers(1, 20, rows),
+            "category": rng.choice(["Books", "Clothing", "Toys"], rows),
+            "quantity_sold": rng.integers(1, 50, rows).astype(np.float64),
+            "price_per_unit": np.round(rng.normal(40, 12, rows), 2),
+        }
+    )
+    frame.loc[rng.random(rows) < MISSING_RATIO, "quantity_sold"] = np.nan
+    frame.loc[rng.random(rows) < MISSING_RATIO, "category"] = None
+
+    version = DatasetVersion(
+        path=Path("sales_data.csv"), mtime_ns=0, size=0, sha256=""
+    )
+    return SalesDataset.from_frame(version, frame.astype(SALES_SCHEMA))
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        None,
+        Filters(
+            date_range=DateRange(
+                start_date=date(2023, 1, 10), end_date=date(2023, 2, 5)
+            ),
+            category=None,
+            product_ids=None,
+        ),
+        Filters(
+            date_range=None,
+            category=["Books", "Toys"],
+            product_ids=[2, 3, 5, 7],
+        ),
+        Filters(
+            date_range=DateRange(
+                start_date=date(2023, 2, 1), end_date=date(2023, 2, 28)
+            ),
+            category=["Clothing"],
+            product_ids=None,
+        ),
+    ],
+)
+def test_cube_matches_row_scan(
+    monkeypatch: pytest.MonkeyPatch,
+    dataset: SalesDataset,
+    filters: Optional[Filters],
+) -> None:
+    """Test moment statistics from the cube match a scan of the rows."""
+
+    # categories are validated against the dataset under test
+    monkeypatch.setattr(dto, "category_index", lambda: dataset.categories)
+
+    request = SummaryRequest(
+        columns=list(MEASURE_COLUMNS),
+        statistics=["mean", "std_dev"],
+        filters=filters,
+    )
+    full_request = request.model_copy(update={"statistics": None})
+
+    from_cube = compute_summary(dataset, request)
+    from_rows = compute_summary(dataset, full_request)
+
+    assert list(from_cube) == list(from_rows)
+    for column, statistics in from_cube.items():
+        assert statistics == {
+            "mean": pytest.approx(from_rows[column]["mean"]),
+            "std_dev": pytest.approx(from_rows[column]["std_dev"]),
+        }
+
+
+def test_cube_skips_empty_selection(dataset: SalesDataset) -> None:
+    """Test no statistics are returned when no cell matches."""
+
+    summary = dataset.cube.summarize(
+        np.array([], dtype=np.intp), MEASURE_COLUMNS, ["mean"]
+    )
+
+    assert summary == {}
+
+
+def test_cube_round_trips_arrays(dataset: SalesDataset) -> None:
+    """Test the cube is rebuilt unchanged from its arrays."""
+
+    cube = SalesCube.from_arrays(dataset.cube.to_arrays(), MEASURE_COLUMNS)
+
+    assert len(cube) == len(dataset.cube)
+    assert cube.summarize(slice(None), MEASURE_COLUMNS, ["mean"]) == (
+        dataset.cube.summarize(slice(None), MEASURE_COLUMNS, ["mean"])
+    )
+
+
+def test_cube_is_smaller_than_the_data(dataset: SalesDataset) -> None:
+    """Test repeated (day, category, product) rows share a cell."""
+
+    assert len(dataset.cube) < len(dataset.frame)
+    assert dataset.cube.counts.sum(axis=0)[1] == len(dataset.frame)
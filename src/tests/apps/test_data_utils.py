@@ -0,0 +1,425 @@
+"""Tests for the sales data loading layer."""
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.apps.sales.const import MEASURE_COLUMNS, SALES_SCHEMA
+from src.apps.sales.data_utils import (
+    DatasetChangedError,
+    SalesDataset,
+    StreamedSalesFile,
+    category_index,
+    get_dataset,
+    get_sales_source,
+    read_sales_chunks,
+)
+from src.apps.sales.data_utils import _hash_grown_file, _read_sales_file
+from src.apps.sales.dto import SummaryRequest
+from src.apps.sales.services import compute_summary
+from src.core.settings import settings
+from src.tests.conftest import CSV_HEADER
+
+
+def test_get_dataset_is_cached(sales_file: Path) -> None:
+    """Test the same snapshot is returned while the file is unchanged."""
+
+    first = get_dataset()
+    second = get_dataset()
+
+    assert first is second
+    assert first.version.path == sales_file
+
+
+def test_get_dataset_reloads_changed_file(sales_file: Path) -> None:
+    """Test a new snapshot is built once the file content changes."""
+
+    first = get_dataset()
+    sales_file.write_text(
+        CSV_HEADER + "2023-02-01,1004,Clothing,40,35.0\n",
+    )
+    second = get_dataset()
+
+    expected_data_len = 1
+    assert second is not first
+    assert second.version.sha256 != first.version.sha256
+    assert len(second.frame) == expected_data_len
+
+    # the previous snapshot is left untouched for in-flight requests
+    expected_previous_len = 2
+    assert len(first.frame) == expected_previous_len
+
+
+def test_get_dataset_touched_file_is_not_parsed(sales_file: Path) -> None:
+    """Test a file with a new mtime but the same content is not re-parsed."""
+
+    first = get_dataset()
+    stat = sales_file.stat()
+    os.utime(sales_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = get_dataset()
+
+    assert second is not first
+    assert second.frame is first.frame
+    assert second.version.mtime_ns != first.version.mtime_ns
+
+
+def test_category_index_without_file_access(sales_file: Path) -> None:
+    """Test the category dictionary is served from the loaded snapshot."""
+
+    dataset = get_dataset()
+    sales_file.unlink()
+
+    categories = category_index()
+
+    assert categories is dataset.categories
+    assert categories.ordered == ("Clothing", "Electronics")
+    assert "Electronics" in categories
+
+
+def test_get_dataset_uses_columnar_sidecar(
+    sales_file: Path,  # noqa: ARG001
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test a fresh process loads the memory-mapped sidecar, not the CSV."""
+
+    monkeypatch.setattr(settings, "columnar_cache", True)
+    parsed = get_dataset()
+
+    # simulate a new worker process without a published snapshot
+    monkeypatch.setattr("src.apps.sales.data_utils._snapshot", None)
+    monkeypatch.setattr(
+        "src.apps.sales.data_utils._read_sales_file",
+        lambda *_args: pytest.fail("the CSV should not be parsed"),
+    )
+    mapped = get_dataset()
+
+    pd.testing.assert_frame_equal(mapped.frame, parsed.frame)
+    assert mapped.categories == parsed.categories
+    assert not mapped.frame["quantity_sold"].to_numpy().flags.writeable
+
+
+def test_get_dataset_applies_schema(
+    sales_file: Path,  # noqa: ARG001
+) -> None:
+    """Test the loaded columns have the dtypes of the sales schema."""
+
+    frame = get_dataset().frame
+
+    assert {
+        column: str(dtype) for column, dtype in frame.dtypes.items()
+    } == SALES_SCHEMA
+
+
+def test_get_dataset_coerces_malformed_values(sales_file: Path) -> None:
+    """Test malformed values become missing, rows without product are kept."""
+
+    sales_file.write_text(
+        CSV_HEADER
+        + "2023-01-01,1001,Electronics,ten,5.0\n"
+        + "2023-01-15,,Clothing,20,15.0\n"
+        + "2023-01-16,abc,Clothing,30,15.0\n"
+    )
+
+    dataset = get_dataset()
+
+    assert dataset.frame["quantity_sold"].isna().tolist() == [
+        True,
+        False,
+        False,
+    ]
+    assert dataset.frame["product_id"].isna().tolist() == [False, True, True]
+    # rows without a product id are only left out of the product index
+    assert dataset.products.product_ids.tolist() == [1001]
+    mean = SummaryRequest.model_validate({"statistics": ["mean"]})
+    assert compute_summary(dataset, mean)["quantity_sold"]["mean"] == 25.0  # noqa: PLR2004
+    without_product = SummaryRequest.model_validate(
+        {"statistics": ["mean"], "filters": {"product_ids": [0]}}
+    )
+    assert compute_summary(dataset, without_product) == {}
+
+
+def test_get_dataset_keeps_fractional_quantities(sales_file: Path) -> None:
+    """Test fractional quantities give the statistics of float64 values."""
+
+    quantities = [1.1, 2.2, 2.2, 3.3, 7.7]
+    sales_file.write_text(
+        CSV_HEADER
+        + "".join(
+            f"2023-01-0{day},1001,Electronics,{quantity},5.0\n"
+            for day, quantity in enumerate(quantities, start=1)
+        )
+    )
+
+    summary = compute_summary(get_dataset(), SummaryRequest.model_validate({}))
+
+    values = np.array(quantities, dtype=np.float64)
+    assert summary["quantity_sold"] == {
+        "mean": pytest.approx(values.mean(), rel=1e-15),
+        "median": np.median(values),
+        "mode": 2.2,
+        "std_dev": pytest.approx(values.std(ddof=1), rel=1e-15),
+        "percentile_25": np.percentile(values, 25),
+        "percentile_75": np.percentile(values, 75),
+    }
+
+
+def test_get_dataset_keeps_large_product_ids(sales_file: Path) -> None:
+    """Test product ids beyond 32 bits are kept exactly, and filtered on."""
+
+    sales_file.write_text(
+        CSV_HEADER
+        + "2023-01-01,3000000000,Electronics,10,5.0\n"
+        + "2023-01-15,,Clothing,20,15.0\n"
+    )
+
+    dataset = get_dataset()
+
+    assert dataset.frame["product_id"].tolist()[0] == 3_000_000_000  # noqa: PLR2004
+    assert dataset.products.rows_for([3_000_000_000]).tolist() == [0]
+
+
+@pytest.mark.parametrize(
+    "product_id", ["1.5", "9223372036854775808", "18014398509481984.0"]
+)
+def test_get_dataset_rejects_product_ids_out_of_range(
+    sales_file: Path, product_id: str
+) -> None:
+    """Test product ids that do not fit in 64 bits are not cast blindly."""
+
+    sales_file.write_text(
+        CSV_HEADER
+        + "2023-01-01,1001,Electronics,10,5.0\n"
+        + f"2023-01-15,{product_id},Clothing,20,15.0\n"
+        + "2023-01-16,,Clothing,20,15.0\n"
+    )
+
+    with pytest.raises(ValueError, match="64-bit integers"):
+        get_dataset()
+
+
+def test_get_dataset_sorts_rows_by_date(sales_file: Path) -> None:
+    """Test the dataset rows are kept in date order."""
+
+    sales_file.write_text(
+        CSV_HEADER
+        + "2023-01-15,1002,Clothing,20,15.0\n"
+        + "2023-01-01,1001,Electronics,10,5.0\n"
+    )
+
+    frame = get_dataset().frame
+
+    assert frame["date"].is_monotonic_increasing
+    assert frame["product_id"].tolist() == [1001, 1002]
+
+
+def test_dataset_pickles_by_version(
+    sales_file: Path,  # noqa: ARG001
+) -> None:
+    """Test a pickled snapshot is restored from its version, not its data."""
+
+    dataset = get_dataset()
+    restored = pickle.loads(pickle.dumps(dataset))  # noqa: S301
+
+    assert restored is dataset
+
+
+def test_read_sales_chunks(sales_file: Path) -> None:
+    """Test the file is parsed to the sales schema one chunk at a time."""
+
+    chunks = list(read_sales_chunks(sales_file, chunk_rows=1))
+
+    expected_chunks = 2
+    assert len(chunks) == expected_chunks
+    assert all(len(chunk) == 1 for chunk in chunks)
+    assert chunks[1]["quantity_sold"].dtype == SALES_SCHEMA["quantity_sold"]
+
+
+def test_streaming_mode_never_loads_the_dataset(
+    sales_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test streaming mode scans the categories without loading the data."""
+
+    monkeypatch.setattr(settings, "streaming", True)
+    monkeypatch.setattr(
+        "src.apps.sales.data_utils._read_sales_data",
+        lambda _version: pytest.fail("the data should not be loaded"),
+    )
+
+    source = get_sales_source()
+
+    assert isinstance(source, StreamedSalesFile)
+    assert source.version.path == sales_file
+    assert list(category_index().ordered) == ["Clothing", "Electronics"]
+    assert get_sales_source() is source
+
+
+def _append(path: Path, text: str) -> None:
+    """Append text to a file and move its mtime forward."""
+
+    stat = path.stat()
+    with path.open("a") as file:
+        file.write(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def _assert_same_dataset(actual: SalesDataset, path: Path) -> None:
+    """Assert a snapshot holds what a full load of the file builds."""
+
+    expected = SalesDataset.from_frame(actual.version, _read_sales_file(path))
+    pd.testing.assert_frame_equal(actual.frame, expected.frame)
+    assert actual.categories == expected.categories
+    assert actual.products.rows_for([1001]).tolist() == (
+        expected.products.rows_for([1001]).tolist()
+    )
+    everything = slice(None)
+    assert actual.cube.summarize(
+        everything, MEASURE_COLUMNS, ("mean", "std_dev")
+    ) == expected.cube.summarize(
+        everything, MEASURE_COLUMNS, ("mean", "std_dev")
+    )
+    assert actual.sketches.summarize(
+        everything, MEASURE_COLUMNS, ("median",)
+    ) == expected.sketches.summarize(everything, MEASURE_COLUMNS, ("median",))
+
+
+def test_get_dataset_parses_appended_rows_only(
+    sales_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test rows appended to the file are ingested without parsing it again."""
+
+    first = get_dataset()
+    monkeypatch.setattr(
+        "src.apps.sales.data_utils._read_sales_file",
+        lambda _path: pytest.fail("the whole CSV should not be parsed"),
+    )
+    _append(
+        sales_file,
+        "2023-01-15,1001,Electronics,30,25.0\n"
+        + "2023-02-01,1001,Clothing,40,35.0\n",
+    )
+
+    second = get_dataset()
+
+    expected_data_len = 4
+    assert len(second.frame) == expected_data_len
+    assert second.categories is first.categories
+    monkeypatch.undo()
+    _assert_same_dataset(second, sales_file)
+
+
+@pytest.mark.parametrize(
+    "appended",
+    [
+        pytest.param("2022-12-01,1001,Clothing,40,35.0\n", id="out-of-order"),
+        pytest.param("2023-02-01,1001,Toys,40,35.0\n", id="new-category"),
+    ],
+)
+def test_get_dataset_merges_unordered_appended_rows(
+    sales_file: Path, appended: str
+) -> None:
+    """Test appended rows out of date order or of new categories are merged."""
+
+    get_dataset()
+    _append(sales_file, appended)
+
+    dataset = get_dataset()
+
+    expected_data_len = 3
+    assert len(dataset.frame) == expected_data_len
+    _assert_same_dataset(dataset, sales_file)
+
+
+def test_get_dataset_rebuilds_rewritten_file(
+    sales_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test a file grown from a rewritten prefix is parsed as a whole."""
+
+    get_dataset()
+    sales_file.write_text(
+        CSV_HEADER
+        + "2023-01-01,1001,Electronics,11,5.0\n"
+        + "2023-01-15,1002,Clothing,20,15.0\n"
+        + "2023-02-01,1003,Clothing,40,35.0\n"
+    )
+    monkeypatch.setattr(
+        "src.apps.sales.data_utils._read_appended_rows",
+        lambda *_args: pytest.fail("the prefix changed"),
+    )
+
+    dataset = get_dataset()
+
+    assert dataset.frame["quantity_sold"].tolist() == [11, 20, 40]
+
+
+def test_get_dataset_rebuilds_truncated_file(sales_file: Path) -> None:
+    """Test a file that shrank is parsed as a whole."""
+
+    get_dataset()
+    sales_file.write_text(CSV_HEADER + "2023-01-01,1001,Electronics,10,5.0\n")
+
+    dataset = get_dataset()
+
+    assert dataset.frame["product_id"].tolist() == [1001]
+
+
+@pytest.mark.parametrize(
+    ("prefix_size", "ends_line"), [(0, False), (53, False), (54, True)]
+)
+def test_hash_grown_file_in_blocks(
+    sales_file: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    prefix_size: int,
+    ends_line: bool,  # noqa: FBT001
+) -> None:
+    """Test the prefix and the whole are hashed a few bytes at a time."""
+
+    monkeypatch.setattr("src.apps.sales.data_utils.HASH_BLOCK_SIZE", 5)
+    content = sales_file.read_bytes()
+    size = len(content) - 3
+
+    assert _hash_grown_file(sales_file, prefix_size, size) == (
+        hashlib.sha256(content[:prefix_size]).hexdigest(),
+        hashlib.sha256(content[:size]).hexdigest(),
+        ends_line,
+    )
+
+
+def test_read_sales_file_checks_hash(sales_file: Path) -> None:
+    """Test bytes parsed that are not the version hashed are rejected."""
+
+    sha256 = hashlib.sha256(sales_file.read_bytes()).hexdigest()
+
+    assert len(_read_sales_file(sales_file, sha256)) == 2  # noqa: PLR2004
+    with pytest.raises(DatasetChangedError):
+        _read_sales_file(sales_file, "0" * 64)
+
+
+def test_get_dataset_reloads_file_changed_while_loaded(
+    sales_file: Path,  # noqa: ARG001
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test a file rewritten between its hash and its parse is loaded again."""
+
+    monkeypatch.setattr(settings, "columnar_cache", False)
+    read_sales_file = _read_sales_file
+    calls: list[str] = []
+
+    def _rewritten_once(path: Path, sha256: str) -> pd.DataFrame:
+        if not calls:
+            path.write_text(CSV_HEADER + "2023-02-01,1004,Clothing,40,35.0\n")
+        calls.append(sha256)
+        return read_sales_file(path, sha256)
+
+    monkeypatch.setattr(
+        "src.apps.sales.data_utils._read_sales_file", _rewritten_once
+    )
+    dataset = get_dataset()
+
+    assert len(calls) == 2  # noqa: PLR2004
+    assert dataset.frame["product_id"].tolist() == [1004]
+    assert dataset.version.sha256 == calls[-1]
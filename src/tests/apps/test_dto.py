@@ -1,7 +1,8 @@
 """Tests for models (data transfer objects)."""
 
+from pathlib import Path
+
 import pytest
-import pandas as pd
 from pydantic import ValidationError
 
 from src.apps.sales.dto import (
@@ -13,26 +14,6 @@ from src.apps.sales.dto import (
 from src.tests.const import Some
 
 
-@pytest.fixture
-def mock_load_data(monkeypatch: pytest.MonkeyPatch) -> None:
-    """Fixture to mock the load_data function."""
-
-    def _mock_load_data() -> pd.DataFrame:
-        # Return a DataFrame with the necessary columns and valid categories
-        return pd.DataFrame(
-            {
-                "category": ["Electronics", "Clothing"],
-                "date": ["2023-01-01", "2023-01-15"],
-                "product_id": [1001, 1002],
-                "quantity_sold": [10, 20],
-                "price_per_unit": [5.0, 15.0],
-            }
-        )
-
-    # Apply the monkeypatch to replace load_data with the mock
-    monkeypatch.setattr("src.apps.sales.data_utils.load_data", _mock_load_data)
-
-
 def test_date_range_converts_string() -> None:
     """Test date range returns a date."""
 
@@ -41,7 +22,7 @@ def test_date_range_converts_string() -> None:
     assert date_range.end_date == Some.END_DATE
 
 
-def test_filters_valid(mock_load_data: pytest.MonkeyPatch) -> None:  # noqa:ARG001
+def test_filters_valid(sales_file: Path) -> None:  # noqa:ARG001
     """Test valid Filters DTO."""
     filters = Filters(
         date_range=DateRange(
@@ -72,7 +53,7 @@ def test_filters_optional_fields() -> None:
 
 
 def test_summary_request_valid(
-    mock_load_data: pytest.MonkeyPatch,  # noqa:ARG001
+    sales_file: Path,  # noqa:ARG001
 ) -> None:
     """Test valid SummaryRequest DTO."""
     request = SummaryRequest(
@@ -92,6 +73,16 @@ def test_summary_request_valid(
     assert request.filters.date_range.start_date == Some.START_DATE
 
 
+def test_summary_request_invalid_category(
+    sales_file: Path,  # noqa:ARG001
+) -> None:
+    """Test SummaryRequest DTO rejects categories missing from the data."""
+    with pytest.raises(ValidationError, match="are not valid"):
+        SummaryRequest(
+            filters=Filters(category=[Some.INVALID_CATEGORY])  # type: ignore[call-arg]
+        )
+
+
 def test_summary_request_defaults() -> None:
     """Test SummaryRequest DTO with default values."""
     request = SummaryRequest()  # type: ignore[call-arg]
@@ -99,6 +90,19 @@ def test_summary_request_defaults() -> None:
     assert request.filters is None
 
 
+def test_summary_request_approximate_statistics() -> None:
+    """Test approximate requests leave the mode out, and cannot ask for it."""
+
+    approximate = SummaryRequest.model_validate({"approximate": True})
+
+    assert "mode" not in approximate.requested_statistics()
+    assert "mode" in SummaryRequest.model_validate({}).requested_statistics()
+    with pytest.raises(ValidationError, match="mode is not available"):
+        SummaryRequest.model_validate(
+            {"approximate": True, "statistics": ["mean", "mode"]}
+        )
+
+
 def test_summary_request_invalid_columns() -> None:
     """Test SummaryRequest DTO with invalid type for columns."""
     with pytest.raises(ValidationError):
@@ -0,0 +1,99 @@
+"""Tests for the sales dataset indexes."""
+
+import numpy as np
+import pandas as pd
+
+from src.apps.sales.indexes import CategoryIndex, DateIndex, ProductIndex
+from src.tests.const import Some
+
+
+def test_category_index_from_values() -> None:
+    """Test the category index holds the sorted distinct categories."""
+
+    values = pd.Series(["Electronics", "Books", None, "Electronics"])
+    index = CategoryIndex.from_values(values)
+
+    assert index.ordered == ("Books", "Electronics")
+    assert index.members == frozenset({"Books", "Electronics"})
+    assert Some.CATEGORY in index
+    assert Some.INVALID_CATEGORY not in index
+
+
+def test_category_index_mask() -> None:
+    """Test the category mask matches encoded rows, ignoring missing values."""
+
+    values = pd.Series(["Electronics", "Books", None, "Clothing"])
+    index = CategoryIndex.from_values(values)
+    codes = index.encode(values).codes
+
+    mask = index.mask(codes, [Some.CATEGORY, "Clothing", "Unknown"])
+
+    assert mask.tolist() == [True, False, False, True]
+
+
+def test_date_index_rows_between() -> None:
+    """Test a date range maps to the slice of rows in that range."""
+
+    dates = np.array(
+        ["2023-01-01", "2023-01-15", "2023-01-15", "2023-02-01", "NaT"],
+        dtype="datetime64[s]",
+    )
+    index = DateIndex(dates)
+
+    assert index.rows_between(Some.START_DATE, Some.END_DATE_2) == slice(0, 3)
+    assert index.rows_between(Some.END_DATE, Some.FUTURE_DATE) == slice(3, 4)
+
+
+def test_date_index_is_sorted() -> None:
+    """Test only ascending dates with missing dates last count as sorted."""
+
+    sorted_dates = np.array(
+        ["2023-01-01", "2023-01-02", "NaT"], "datetime64[s]"
+    )
+    unsorted_dates = np.array(["2023-01-02", "2023-01-01"], "datetime64[s]")
+    nat_first_dates = np.array(["NaT", "2023-01-01"], "datetime64[s]")
+
+    assert DateIndex.is_sorted(sorted_dates)
+    assert not DateIndex.is_sorted(unsorted_dates)
+    assert not DateIndex.is_sorted(nat_first_dates)
+
+
+def test_product_index_rows_for() -> None:
+    """Test the product index returns the ascending rows of the products."""
+
+    index = ProductIndex.from_values(
+        np.array([1002, 1001, 1002, 1003, 1001], dtype=np.int32)
+    )
+
+    assert index.rows_for([1001, 1002]).tolist() == [0, 1, 2, 4]
+    assert index.rows_for([1003, 9999]).tolist() == [3]
+    assert index.rows_for([9999]).tolist() == []
+    assert index.rows_for([]).tolist() == []
+
+
+def test_product_index_append() -> None:
+    """Test appended rows index like the rows of a single build."""
+
+    values = np.array([7, 3, 7, 9, 3, 5, 7, 0])
+    present = values > 0
+    appended = ProductIndex.from_values(values[:4], present[:4]).append(
+        values[4:], present[4:], 4
+    )
+    built = ProductIndex.from_values(values, present)
+
+    for product_id in (0, 3, 5, 7, 9):
+        assert appended.rows_for([product_id]).tolist() == (
+            built.rows_for([product_id]).tolist()
+        )
+
+
+def test_product_index_leaves_out_missing_ids() -> None:
+    """Test rows without a product id are not indexed under any id."""
+
+    index = ProductIndex.from_values(
+        np.array([1002, 0, 1002, 0]), np.array([True, False, True, False])
+    )
+
+    assert index.product_ids.tolist() == [1002]
+    assert index.rows_for([1002]).tolist() == [0, 2]
+    assert index.rows_for([0]).tolist() == []
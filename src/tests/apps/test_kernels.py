@@ -0,0 +1,88 @@
+"""Tests for the vectorized statistics kernels."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.apps.sales.kernels import summarize_groups, summarize_matrix
+
+MISSING_RATIO = 0.1
+
+
+def test_summarize_matrix_matches_pandas() -> None:
+    """Test every statistic matches pandas on columns with missing values."""
+
+    rng = np.random.default_rng(1337)
+    matrix = np.column_stack(
+        [
+            rng.integers(0, 20, 1001).astype(np.float64),
+            np.round(rng.normal(50, 10, 1001), 2),
+        ]
+    )
+    matrix[rng.random(matrix.shape) < MISSING_RATIO] = np.nan
+
+    summary = summarize_matrix(matrix)
+
+    for position in range(matrix.shape[1]):
+        column = pd.Series(matrix[:, position]).dropna()
+        assert summary["mean"][position] == pytest.approx(column.mean())
+        assert summary["std_dev"][position] == pytest.approx(column.std())
+        assert summary["median"][position] == column.median()
+        assert summary["mode"][position] == column.mode()[0]
+        assert summary["percentile_25"][position] == column.quantile(0.25)
+        assert summary["percentile_75"][position] == column.quantile(0.75)
+
+
+def test_summarize_matrix_mode_ties() -> None:
+    """Test the smallest value wins among the most frequent ones."""
+
+    matrix = np.array([[3.0, 1.0], [1.0, np.nan], [3.0, np.nan], [1.0, 2.0]])
+
+    summary = summarize_matrix(matrix)
+
+    assert summary["mode"].tolist() == [1.0, 1.0]
+
+
+def test_summarize_matrix_single_value() -> None:
+    """Test a column with one value has no standard deviation."""
+
+    summary = summarize_matrix(np.array([[4.0]]))
+
+    assert summary["mean"].tolist() == [4.0]
+    assert summary["median"].tolist() == [4.0]
+    assert summary["percentile_75"].tolist() == [4.0]
+    assert np.isnan(summary["std_dev"][0])
+
+
+def test_summarize_groups_matches_pandas() -> None:
+    """Test every statistic of every group matches a pandas groupby."""
+
+    rng = np.random.default_rng(42)
+    values = rng.integers(0, 15, 3000).astype(np.float64)
+    values[rng.random(len(values)) < MISSING_RATIO] = np.nan
+    groups = rng.integers(0, 7, len(values))
+    # the last group has no value at all
+    group_count = 8
+
+    summary = summarize_groups(values, groups, group_count)
+
+    expected = pd.Series(values).dropna().groupby(groups[~np.isnan(values)])
+    for group, column in expected:
+        assert summary["mean"][group] == pytest.approx(column.mean())
+        assert summary["std_dev"][group] == pytest.approx(column.std())
+        assert summary["median"][group] == column.median()
+        assert summary["mode"][group] == column.mode()[0]
+        assert summary["percentile_25"][group] == column.quantile(0.25)
+        assert summary["percentile_75"][group] == column.quantile(0.75)
+    assert all(np.isnan(statistic[-1]) for statistic in summary.values())
+
+
+def test_summarize_groups_selected_statistics() -> None:
+    """Test only the requested statistics are computed."""
+
+    summary = summarize_groups(
+        np.array([1.0, 2.0, 4.0]), np.array([0, 0, 1]), 2, ["mean"]
+    )
+
+    assert list(summary) == ["mean"]
+    assert summary["mean"].tolist() == [1.5, 4.0]
@@ -1,14 +1,20 @@
 """Tests for WebServices."""
 
-from http.client import OK, UNPROCESSABLE_ENTITY
+from http.client import NOT_MODIFIED, OK, SERVICE_UNAVAILABLE
+from http.client import UNPROCESSABLE_ENTITY
 from pathlib import Path
+from typing import Any
 
 import pytest
 from fastapi.testclient import TestClient
 from pydantic_core._pydantic_core import ValidationError
 
 from main import app
-from src.apps.sales.dto import SummaryRequest, Filters
+from src.apps.sales import services
+from src.apps.sales.const import STATISTICS
+from src.apps.sales.data_utils import DatasetChangedError
+from src.apps.sales.dto import ColumnStatistics, SummaryRequest, Filters
+from src.core.executor import ComputeExecutor, ComputeOverloadedError
 from src.core.settings import settings
 from src.tests.const import Some
 
@@ -73,6 +79,10 @@ def test_generate_sales_summary_no_filters(client: TestClient) -> None:
     assert price_stats["percentile_25"] == expected_price_percentile_25
     assert price_stats["percentile_75"] == expected_price_percentile_75
 
+    # every ColumnStatistics field is given, the approximate one left out
+    assert ColumnStatistics.model_validate(quantity_stats)
+    assert set(quantity_stats) == set(STATISTICS)
+
 
 def test_generate_sales_summary_with_date_filter(client: TestClient) -> None:
     """Test date filter works accordingly."""
@@ -198,3 +208,412 @@ def test_generate_sales_summary_with_invalid_date_range(
         "end_date must be greater than start_date"
         in response.json()["detail"][0]["msg"]
     )
+
+
+def test_list_categories(client: TestClient) -> None:
+    """Test the /categories endpoint lists the categories in the data."""
+
+    response = client.get("/categories")
+
+    assert response.status_code == OK
+    assert response.json() == ["Clothing", Some.CATEGORY]
+
+
+def test_generate_sales_summary_is_cached(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test a repeated summary request is answered from the result cache."""
+
+    payload = SummaryRequest().model_dump()  # type: ignore[call-arg]
+    first_response = client.post("/summary", json=payload)
+
+    def _fail(*_args: object) -> None:
+        pytest.fail("statistics should come from the cache")
+
+    monkeypatch.setattr("src.apps.sales.services.filter_data", _fail)
+    monkeypatch.setattr("src.apps.sales.services.compute_statistics", _fail)
+    second_response = client.post("/summary", json=payload)
+
+    assert second_response.status_code == OK
+    assert second_response.json() == first_response.json()
+
+
+def test_generate_sales_summary_not_modified(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test a summary whose ETag is sent back is a 304 computing nothing."""
+
+    monkeypatch.setattr(settings, "summary_cache_control", "max-age=5")
+    payload = {"columns": ["quantity_sold"]}
+    first_response = client.post("/summary", json=payload)
+    etag = first_response.headers["ETag"]
+
+    async def _fail(*_args: object) -> None:
+        pytest.fail("nothing should be computed")
+
+    monkeypatch.setattr("src.apps.sales.routers.summarize", _fail)
+    response = client.post(
+        "/summary", json=payload, headers={"If-None-Match": f"W/{etag}"}
+    )
+
+    assert first_response.headers["Cache-Control"] == "max-age=5"
+    assert first_response.headers["Last-Modified"].endswith(" GMT")
+    assert response.status_code == NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == "max-age=5"
+
+
+def test_generate_sales_summary_etag_changes(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the ETag depends on the request and the sales data version."""
+
+    etag = client.post("/summary", json={}).headers["ETag"]
+    other_request = client.post("/summary", json={"approximate": True})
+
+    settings.sales_data.write_text(
+        settings.sales_data.read_text() + "2023-02-02,1005,Clothing,50,45.0\n"
+    )
+    monkeypatch.setattr("src.apps.sales.data_utils._snapshot", None)
+    changed = client.post("/summary", json={}, headers={"If-None-Match": etag})
+
+    assert etag.startswith('"')
+    assert other_request.headers["ETag"] != etag
+    assert changed.status_code == OK
+    assert changed.headers["ETag"] != etag
+
+
+def test_generate_sales_summary_overloaded(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test a full compute queue is reported as service unavailable."""
+
+    async def _overloaded(*_args: object) -> None:
+        raise ComputeOverloadedError
+
+    monkeypatch.setattr(ComputeExecutor, "run", _overloaded)
+    payload = SummaryRequest(columns=["price_per_unit"]).model_dump()  # type: ignore[call-arg]
+    response = client.post("/summary", json=payload)
+
+    assert response.status_code == SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_generate_sales_summary_single_row_schema(client: TestClient) -> None:
+    """Test the undefined deviation of a single row is a null of the schema."""
+
+    response = client.post(
+        "/summary", json={"filters": {"product_ids": [1001]}}
+    )
+
+    assert response.status_code == OK
+    statistics = response.json()["quantity_sold"]
+    assert statistics["std_dev"] is None
+    assert ColumnStatistics.model_validate(statistics).mean == 10.0  # noqa: PLR2004
+    std_dev = app.openapi()["components"]["schemas"]["ColumnStatistics"]
+    assert "std_dev" in std_dev["required"]
+    assert {"type": "null"} in std_dev["properties"]["std_dev"]["anyOf"]
+
+
+def test_generate_sales_summary_dataset_changed(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test a dataset version gone before being summarized is retried."""
+
+    async def _changed(*_args: object) -> None:
+        raise DatasetChangedError
+
+    monkeypatch.setattr(ComputeExecutor, "run", _changed)
+    payload = SummaryRequest(columns=["price_per_unit"]).model_dump()  # type: ignore[call-arg]
+    response = client.post("/summary", json=payload)
+
+    assert response.status_code == SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_generate_sales_summary_selected_statistics(
+    client: TestClient,
+) -> None:
+    """Test only the requested statistics are returned."""
+
+    response = client.post(
+        "/summary",
+        json={"columns": ["quantity_sold"], "statistics": ["mean", "std_dev"]},
+    )
+
+    assert response.status_code == OK
+    expected_mean = 25
+    assert response.json() == {
+        "quantity_sold": {
+            "mean": expected_mean,
+            "std_dev": pytest.approx(12.909944),
+        }
+    }
+
+
+def test_generate_sales_summary_invalid_statistic(client: TestClient) -> None:
+    """Test an unknown statistic is rejected."""
+
+    response = client.post("/summary", json={"statistics": ["variance"]})
+
+    assert response.status_code == UNPROCESSABLE_ENTITY
+
+
+def test_generate_sales_summary_batch(client: TestClient) -> None:
+    """Test a batch returns every result in order, errors per item."""
+
+    response = client.post(
+        "/summary/batch",
+        json={
+            "requests": [
+                {"columns": ["quantity_sold"], "statistics": ["mean"]},
+                {"columns": ["unknown"]},
+                {
+                    "columns": ["price_per_unit"],
+                    "statistics": ["median"],
+                    "filters": {"category": ["Clothing"]},
+                },
+            ]
+        },
+    )
+
+    assert response.status_code == OK
+    expected_quantity_mean = 25
+    expected_price_median = 25
+    assert response.json() == [
+        {"statistics": {"quantity_sold": {"mean": expected_quantity_mean}}},
+        {"error": "No statistics found for the given filters and columns."},
+        {"statistics": {"price_per_unit": {"median": expected_price_median}}},
+    ]
+
+
+def test_generate_sales_summary_batch_shares_selection(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test requests selecting the same rows are computed once."""
+
+    calls = []
+    compute_summary = services.compute_summary
+
+    def counting_compute_summary(*args: Any) -> Any:
+        calls.append(args[1].columns)
+        return compute_summary(*args)
+
+    monkeypatch.setattr(services, "compute_summary", counting_compute_summary)
+
+    response = client.post(
+        "/summary/batch",
+        json={
+            "requests": [
+                {"columns": ["quantity_sold"]},
+                {"columns": ["price_per_unit", "quantity_sold"]},
+            ]
+        },
+    )
+
+    assert response.status_code == OK
+    assert calls == [["quantity_sold", "price_per_unit"]]
+    first, second = response.json()
+    assert (
+        first["statistics"]["quantity_sold"]
+        == (second["statistics"]["quantity_sold"])
+    )
+
+
+def test_generate_sales_summary_batch_invalid_category(
+    client: TestClient,
+) -> None:
+    """Test an invalid category rejects the batch."""
+
+    response = client.post(
+        "/summary/batch",
+        json={"requests": [{"filters": {"category": [Some.INVALID_CATEGORY]}}]},
+    )
+
+    assert response.status_code == UNPROCESSABLE_ENTITY
+
+
+def test_generate_sales_summary_batch_too_large(client: TestClient) -> None:
+    """Test a batch of more requests than allowed is rejected."""
+
+    response = client.post(
+        "/summary/batch",
+        json={"requests": [{}] * (settings.summary_batch_max + 1)},
+    )
+
+    assert response.status_code == UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["type"] == "too_long"
+
+
+def test_generate_grouped_sales_summary(client: TestClient) -> None:
+    """Test the statistics of every group are nested by group key."""
+
+    response = client.post(
+        "/summary/grouped",
+        json={
+            "columns": ["quantity_sold"],
+            "statistics": ["mean", "median"],
+            "group_by": ["category", "month"],
+        },
+    )
+
+    assert response.status_code == OK
+    assert response.json() == {
+        "Clothing": {
+            "2023-01": {"quantity_sold": {"mean": 20.0, "median": 20.0}},
+            "2023-02": {"quantity_sold": {"mean": 40.0, "median": 40.0}},
+        },
+        "Electronics": {
+            "2023-01": {"quantity_sold": {"mean": 20.0, "median": 20.0}},
+        },
+    }
+
+
+def test_generate_grouped_sales_summary_by_product(
+    client: TestClient,
+) -> None:
+    """Test grouping by product id keys the groups by id."""
+
+    response = client.post(
+        "/summary/grouped",
+        json={
+            "columns": ["price_per_unit"],
+            "statistics": ["mode"],
+            "group_by": ["product_id"],
+            "filters": {"category": ["Electronics"]},
+        },
+    )
+
+    assert response.status_code == OK
+    assert response.json() == {
+        "1001": {"price_per_unit": {"mode": 5.0}},
+        "1003": {"price_per_unit": {"mode": 25.0}},
+    }
+
+
+def test_generate_grouped_sales_summary_duplicate_keys(
+    client: TestClient,
+) -> None:
+    """Test a group key given twice is rejected."""
+
+    response = client.post(
+        "/summary/grouped", json={"group_by": ["category", "category"]}
+    )
+
+    assert response.status_code == UNPROCESSABLE_ENTITY
+
+
+def test_generate_grouped_sales_summary_approximate(
+    client: TestClient,
+) -> None:
+    """Test a grouped summary cannot be asked to be approximate."""
+
+    response = client.post(
+        "/summary/grouped", json={"group_by": ["category"], "approximate": True}
+    )
+
+    assert response.status_code == UNPROCESSABLE_ENTITY
+
+
+def test_generate_sales_summary_streaming(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test streaming mode summarizes the file chunk by chunk."""
+
+    payload = {
+        "statistics": ["mean", "median", "mode", "std_dev"],
+        "filters": {"category": ["Clothing"]},
+    }
+    in_memory = client.post("/summary", json=payload).json()
+
+    monkeypatch.setattr(settings, "streaming", True)
+    monkeypatch.setattr(settings, "stream_chunk_rows", 1)
+    response = client.post("/summary", json=payload)
+
+    assert response.status_code == OK
+    assert response.json() == {
+        column: {**statistics, "rank_error": 0.0}
+        for column, statistics in in_memory.items()
+    }
+
+
+def test_generate_sales_summary_single_row(client: TestClient) -> None:
+    """Test a standard deviation of a single value is returned as null."""
+
+    response = client.post(
+        "/summary",
+        json={
+            "columns": ["quantity_sold"],
+            "statistics": ["mean", "std_dev"],
+            "filters": {"product_ids": [1001]},
+        },
+    )
+
+    assert response.status_code == OK
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"quantity_sold": {"mean": 10.0, "std_dev": None}}
+
+
+def test_generate_sales_summary_explain(client: TestClient) -> None:
+    """Test the explained summary traces every filter stage it went through."""
+
+    payload = {
+        "columns": ["quantity_sold"],
+        "filters": {
+            "date_range": {
+                "start_date": "2023-01-01",
+                "end_date": "2023-01-31",
+            },
+            "product_ids": [1001, 1002, 1003],
+            "category": ["Electronics"],
+        },
+    }
+
+    response = client.post("/summary?explain=true", json=payload)
+
+    assert response.status_code == OK
+    body = response.json()
+    assert body["statistics"]["quantity_sold"]["mean"] == 20.0  # noqa: PLR2004
+    explain = body["explain"]
+    assert explain["cache"] == "miss"
+    assert explain["path"] == "rows"
+    assert explain["filter_order"] == ["date_range", "product_ids", "category"]
+    assert [
+        (step["stage"], step["rows_in"], step["rows_out"])
+        for step in explain["steps"]
+    ] == [
+        ("date_range", 4, 3),
+        ("product_ids", 3, 3),
+        ("category", 3, 2),
+        ("take_rows", 2, 2),
+        ("compute_statistics", 2, None),
+        ("serialize", None, None),
+    ]
+    assert "date_range;desc=" in response.headers["Server-Timing"]
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+    # a cached summary is computed again to explain it
+    cached = client.post("/summary?explain=true", json=payload).json()
+    assert cached["explain"]["cache"] == "hit"
+    assert cached["explain"]["path"] == "rows"
+    assert [step["stage"] for step in cached["explain"]["steps"]] == [
+        step["stage"] for step in explain["steps"]
+    ]
+    assert cached["statistics"] == body["statistics"]
+
+
+def test_generate_sales_summary_explain_cube(client: TestClient) -> None:
+    """Test a moment-only summary is explained as answered from the cube."""
+
+    response = client.post(
+        "/summary",
+        params={"explain": True},
+        json={"statistics": ["mean"], "filters": {"category": ["Clothing"]}},
+    )
+
+    explain = response.json()["explain"]
+    assert explain["path"] == "cube"
+    assert explain["steps"][0]["stage"] == "cube"
+    assert explain["steps"][0]["rows_out"] == 2  # noqa: PLR2004
+    assert "Server-Timing" not in client.post("/summary", json={}).headers
@@ -0,0 +1,122 @@
+"""Tests for the JSON encoding of the summary responses."""
+
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from src.apps.sales.dto import SummaryBatchItem, SummaryStatistics
+from src.apps.sales.serialization import (
+    batch_json,
+    explained_json,
+    grouped_json,
+    statistics_json,
+)
+
+STATISTICS = {
+    "quantity_sold": {
+        # not in model order, as an approximate summary gives them
+        "rank_error": 0.002,
+        "mean": 25.0,
+        "median": 25.0,
+        "mode": 10.0,
+        "std_dev": 12.909944487358056,
+        "percentile_25": 17.5,
+        "percentile_75": 32.5,
+    },
+    "prix_unitaire_€": {"mean": 1e16, "std_dev": 1.5e-7},
+}
+
+
+def _encoded_by_response_model(annotation: object, content: object) -> bytes:
+    """Return content encoded the way FastAPI encodes a response model."""
+
+    adapter: TypeAdapter[object] = TypeAdapter(annotation)
+    return JSONResponse(
+        jsonable_encoder(adapter.validate_python(content), exclude_unset=True)
+    ).body
+
+
+def test_statistics_json() -> None:
+    """Test statistics are encoded the way the response model encodes them."""
+
+    assert statistics_json(STATISTICS) == _encoded_by_response_model(
+        SummaryStatistics, STATISTICS
+    )
+
+
+def test_statistics_json_keeps_missing_values() -> None:
+    """Test a computed statistic without a value is null, not left out."""
+
+    statistics = {**STATISTICS["quantity_sold"], "mode": None}
+    del statistics["rank_error"]
+
+    encoded = json.loads(statistics_json({"quantity_sold": statistics}))
+
+    assert encoded == {"quantity_sold": statistics}
+
+
+def test_statistics_json_not_finite() -> None:
+    """Test values that are not finite are encoded as null."""
+
+    encoded = statistics_json(
+        {"quantity_sold": {"mean": 10.0, "std_dev": float("nan")}}
+    )
+
+    assert json.loads(encoded) == {
+        "quantity_sold": {"mean": 10.0, "std_dev": None}
+    }
+
+
+def test_batch_json() -> None:
+    """Test a batch is encoded the way the response model encodes it."""
+
+    summaries: list[dict[str, Any]] = [STATISTICS, {}, STATISTICS]
+
+    assert batch_json(summaries, "None found.") == _encoded_by_response_model(
+        list[SummaryBatchItem],
+        [
+            SummaryBatchItem.model_validate(
+                {"statistics": statistics}
+                if statistics
+                else {"error": "None found."}
+            )
+            for statistics in summaries
+        ],
+    )
+
+
+def test_grouped_json() -> None:
+    """Test groups are encoded as nested objects, statistics in order."""
+
+    grouped = {
+        "Electronics": {"2023-01": STATISTICS},
+        "Clothing": {"2023-02": {"quantity_sold": {"std_dev": float("inf")}}},
+    }
+
+    encoded = grouped_json(grouped, 2)
+
+    assert (
+        encoded
+        == JSONResponse(
+            {
+                "Electronics": {"2023-01": STATISTICS},
+                "Clothing": {"2023-02": {"quantity_sold": {"std_dev": None}}},
+            }
+        ).body
+    )
+
+
+def test_explained_json() -> None:
+    """Test the statistics are encoded next to their explain trace."""
+
+    explain = {"cache": "miss", "steps": [{"stage": "cube", "ms": 0.5}]}
+
+    encoded = explained_json(statistics_json(STATISTICS), explain)
+
+    assert json.loads(encoded) == {
+        "statistics": json.loads(statistics_json(STATISTICS)),
+        "explain": explain,
+    }
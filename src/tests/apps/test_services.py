@@ -5,9 +5,15 @@ from pathlib import Path
 import pandas as pd
 import pytest
 
+from src.apps.sales.const import SALES_SCHEMA
 from src.apps.sales.dto import Filters, DateRange
 from src.apps.sales.services import filter_data, compute_statistics
-from src.apps.sales.data_utils import load_data, valid_categories
+from src.apps.sales.data_utils import (
+    DatasetVersion,
+    SalesDataset,
+    load_data,
+    valid_categories,
+)
 from src.core.settings import settings
 from src.tests.const import Some
 
@@ -26,6 +32,16 @@ def mock_data() -> pd.DataFrame:
     )
 
 
+@pytest.fixture
+def mock_dataset(mock_data: pd.DataFrame) -> SalesDataset:
+    """Fixture to provide the mock sales data as an indexed dataset."""
+
+    version = DatasetVersion(
+        path=Path("sales_data.csv"), mtime_ns=0, size=0, sha256=""
+    )
+    return SalesDataset.from_frame(version, mock_data.astype(SALES_SCHEMA))
+
+
 def test_load_data_valid(
     monkeypatch: pytest.MonkeyPatch, tmp_path: Path
 ) -> None:
@@ -202,6 +218,56 @@ def test_filter_data_empty_dataframe() -> None:
     assert filtered_data.empty
 
 
+def test_filter_dataset_matches_data_frame(
+    mock_data: pd.DataFrame, mock_dataset: SalesDataset
+) -> None:
+    """Test the indexed dataset path filters the same rows as a DataFrame."""
+
+    filters = Filters(
+        date_range=DateRange(
+            start_date=Some.START_DATE, end_date=Some.END_DATE
+        ),
+        category=[Some.CATEGORY, "Clothing"],
+        product_ids=[1001, 1002, 1004, 9999],
+    )
+
+    filtered_dataset = filter_data(mock_dataset, filters)
+    filtered_data = filter_data(mock_data, filters)
+
+    assert filtered_dataset["product_id"].tolist() == [1001, 1002]
+    assert filtered_data["product_id"].tolist() == [1001, 1002]
+
+
+def test_filter_dataset_product_ids(mock_dataset: SalesDataset) -> None:
+    """Test the dataset product filter gathers rows from the product index."""
+
+    filters = Filters(product_ids=[1004, 1001])  # type: ignore[call-arg]
+    filtered_data = filter_data(mock_dataset, filters)
+
+    assert filtered_data["product_id"].tolist() == [1001, 1004]
+
+
+def test_filter_data_selected_columns(
+    mock_data: pd.DataFrame, mock_dataset: SalesDataset
+) -> None:
+    """Test only the requested existing columns are materialized."""
+
+    filters = Filters(category=[Some.CATEGORY])  # type: ignore[call-arg]
+    columns = ["quantity_sold", "non_existent_column"]
+
+    for data in (mock_data, mock_dataset):
+        filtered_data = filter_data(data, filters, columns)
+
+        assert filtered_data.columns.tolist() == ["quantity_sold"]
+        assert filtered_data["quantity_sold"].tolist() == [10, 30]
+
+
+def test_filter_dataset_no_filters(mock_dataset: SalesDataset) -> None:
+    """Test filter_data returns the whole dataset without filters."""
+
+    assert filter_data(mock_dataset, None) is mock_dataset.frame
+
+
 def test_compute_statistics_valid(mock_data: pd.DataFrame) -> None:
     """Test compute_statistics with valid numerical columns."""
     columns = ["quantity_sold", "price_per_unit"]
@@ -284,25 +350,36 @@ def test_compute_statistics_nan_values() -> None:
     assert result["quantity_sold"]["percentile_75"] == expected_percentile_75
 
 
-def test_valid_categories_happy_path(monkeypatch: pytest.MonkeyPatch) -> None:
-    """Test that valid_categories returns unique categories from the data."""
+def test_compute_statistics_typed_columns(mock_data: pd.DataFrame) -> None:
+    """Test compact schema dtypes give the same statistics as float64 data."""
 
-    mock_data = pd.DataFrame(
-        {
-            "category": [
-                "Electronics",
-                "Books",
-                "Electronics",
-                "Clothing",
-                "Books",
-            ]
-        }
+    typed_data = mock_data.astype(
+        {"quantity_sold": "float32", "date": "datetime64[s]"}
     )
+    columns = ["quantity_sold", "date"]
+
+    result = compute_statistics(typed_data, columns)
+
+    assert result == compute_statistics(mock_data, ["quantity_sold"])
+    assert "date" not in result
+
+
+def test_valid_categories_happy_path(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test that valid_categories returns unique categories from the data."""
 
-    def mock_load_data() -> pd.DataFrame:
-        return mock_data
+    csv_content = """date,product_id,category,quantity_sold,price_per_unit
+2023-01-01,1001,Electronics,10,5.0
+2023-01-02,1002,Books,10,5.0
+2023-01-03,1003,Electronics,10,5.0
+2023-01-04,1004,Clothing,10,5.0
+2023-01-05,1005,Books,10,5.0
+"""
+    file_path = tmp_path / "sales_data.csv"
+    file_path.write_text(csv_content)
+    monkeypatch.setattr(settings, "sales_data", file_path)
 
-    monkeypatch.setattr("src.apps.sales.data_utils.load_data", mock_load_data)
     categories = valid_categories()
 
     assert isinstance(categories, list)
@@ -310,16 +387,16 @@ def test_valid_categories_happy_path(monkeypatch: pytest.MonkeyPatch) -> None:
 
 
 def test_valid_categories_no_categories(
-    monkeypatch: pytest.MonkeyPatch,
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
 ) -> None:
     """Test that valid_categories returns an empty list if there are no categories."""
 
-    mock_data = pd.DataFrame(columns=["category"])
-
-    def mock_load_data() -> pd.DataFrame:
-        return mock_data
+    file_path = tmp_path / "sales_data.csv"
+    file_path.write_text(
+        "date,product_id,category,quantity_sold,price_per_unit\n"
+    )
+    monkeypatch.setattr(settings, "sales_data", file_path)
 
-    monkeypatch.setattr("src.apps.sales.data_utils.load_data", mock_load_data)
     categories = valid_categories()
 
     assert categories == []
@@ -0,0 +1,82 @@
+"""Tests for the sales data published in shared memory."""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.apps.sales.data_utils import get_dataset
+from src.apps.sales.shared_memory import LOCK_FILE, segment_root
+from src.core.settings import settings
+from src.tests.conftest import CSV_HEADER
+
+
+@pytest.fixture
+def sales_file(
+    sales_file: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Path:
+    """Fixture providing a sales data file published in shared memory."""
+
+    monkeypatch.setattr(settings, "shared_memory", True)
+    monkeypatch.setattr(settings, "shared_memory_dir", tmp_path / "shm")
+    return sales_file
+
+
+def test_loader_publishes_and_maps_the_segment(sales_file: Path) -> None:
+    """Test the loading worker maps the segment it published."""
+
+    dataset = get_dataset()
+
+    segments = sorted(path.name for path in segment_root(sales_file).iterdir())
+    assert segments == [LOCK_FILE, dataset.version.sha256]
+    assert not dataset.frame["quantity_sold"].to_numpy().flags.writeable
+
+
+def test_workers_attach_without_loading(
+    sales_file: Path,  # noqa: ARG001
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test another worker maps the published segment, not the CSV."""
+
+    published = get_dataset()
+
+    # simulate another worker process without a published snapshot
+    monkeypatch.setattr("src.apps.sales.data_utils._snapshot", None)
+    monkeypatch.setattr(
+        "src.apps.sales.data_utils._read_sales_file",
+        lambda _path: pytest.fail("the CSV should not be parsed"),
+    )
+    attached = get_dataset()
+
+    pd.testing.assert_frame_equal(attached.frame, published.frame)
+    assert attached.categories == published.categories
+
+
+def test_reload_publishes_a_new_version(sales_file: Path) -> None:
+    """Test a changed file gets its own segment, replacing the previous one."""
+
+    previous = get_dataset()
+    sales_file.write_text(CSV_HEADER + "2023-02-01,1004,Clothing,40,35.0\n")
+    current = get_dataset()
+
+    segments = {path.name for path in segment_root(sales_file).iterdir()}
+    assert current.version.sha256 in segments
+    assert previous.version.sha256 not in segments
+
+    # the unlinked segment stays valid for the requests still using it
+    expected_previous_len = 2
+    assert len(previous.frame) == expected_previous_len
+    assert previous.frame["quantity_sold"].sum() == 30  # noqa: PLR2004
+
+
+def test_unusable_shared_memory_loads_privately(
+    sales_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the data is still loaded when shared memory is unavailable."""
+
+    blocker = sales_file.parent / "not_a_directory"
+    blocker.write_text("")
+    monkeypatch.setattr(settings, "shared_memory_dir", blocker)
+
+    expected_data_len = 2
+    assert len(get_dataset().frame) == expected_data_len
@@ -0,0 +1,132 @@
+"""Tests for the mergeable quantile sketches."""
+
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.apps.sales import dto
+from src.apps.sales.const import MEASURE_COLUMNS, SALES_SCHEMA
+from src.apps.sales.data_utils import DatasetVersion, SalesDataset
+from src.apps.sales.dto import DateRange, Filters, SummaryRequest
+from src.apps.sales.services import compute_summary
+from src.apps.sales.sketches import SKETCH_QUANTILES, QuantileSketches
+
+SKETCH_SIZE = 16
+
+
+@pytest.fixture
+def frame() -> pd.DataFrame:
+    """Fixture to provide sales data with partitions of many values."""
+
+    rng = np.random.default_rng(11)
+    rows = 5000
+    frame = pd.DataFrame(
+        {
+            "date": pd.Timestamp("2023-03-01")
+            + pd.to_timedelta(rng.integers(0, 5, rows), unit="D"),
+            "product_id": rng.integers(1, 50, rows),
+            "category": rng.choice(["Books", "Toys"], rows),
+            "quantity_sold": rng.integers(1, 500, rows).astype(np.float64),
+            "price_per_unit": rng.lognormal(3, 1, rows),
+        }
+    ).astype(SALES_SCHEMA)
+    frame.loc[rng.random(rows) < 0.1, "price_per_unit"] = np.nan  # noqa: PLR2004
+    return frame.sort_values("date", ignore_index=True)
+
+
+def _rank_share(values: np.ndarray, value: float, quantile: float) -> float:
+    """Return how far the rank of value is from the quantile, as a share."""
+
+    below = (values < value).sum()
+    not_above = (values <= value).sum()
+    target = quantile * (len(values) - 1)
+    if below <= target <= not_above:
+        return 0.0
+    return min(abs(below - target), abs(not_above - target)) / len(values)
+
+
+def test_sketches_respect_their_rank_error(frame: pd.DataFrame) -> None:
+    """Test merged quantiles are within the declared rank error."""
+
+    sketches = QuantileSketches.from_frame(frame, MEASURE_COLUMNS, SKETCH_SIZE)
+
+    summary = sketches.summarize(
+        slice(None), MEASURE_COLUMNS, list(SKETCH_QUANTILES)
+    )
+
+    for column in MEASURE_COLUMNS:
+        values = frame[column].dropna().to_numpy(np.float64)
+        statistics = {
+            statistic: float(value or 0.0)
+            for statistic, value in summary[column].items()
+        }
+        assert 0 < statistics["rank_error"] <= 1 / SKETCH_SIZE
+        for statistic, quantile in SKETCH_QUANTILES.items():
+            assert (
+                _rank_share(values, statistics[statistic], quantile)
+                <= statistics["rank_error"]
+            )
+
+
+def test_sketches_small_partitions_are_exact(frame: pd.DataFrame) -> None:
+    """Test partitions kept whole give the exact quantiles."""
+
+    sketches = QuantileSketches.from_frame(frame, MEASURE_COLUMNS, 10_000)
+
+    summary = sketches.summarize(slice(None), ["quantity_sold"], ["median"])
+
+    assert summary == {
+        "quantity_sold": {
+            "median": frame["quantity_sold"].median(),
+            "rank_error": 0.0,
+        }
+    }
+
+
+def test_sketches_contiguous_partitions(frame: pd.DataFrame) -> None:
+    """Test a range of partitions merges like the same partitions listed."""
+
+    sketches = QuantileSketches.from_frame(frame, MEASURE_COLUMNS, SKETCH_SIZE)
+    statistics = list(SKETCH_QUANTILES)
+
+    assert sketches.summarize(
+        slice(2, 7), MEASURE_COLUMNS, statistics
+    ) == sketches.summarize(np.arange(2, 7), MEASURE_COLUMNS, statistics)
+
+
+def test_approximate_summary(
+    monkeypatch: pytest.MonkeyPatch, frame: pd.DataFrame
+) -> None:
+    """Test an approximate request matches the exact one within its bound."""
+
+    version = DatasetVersion(
+        path=Path("sales_data.csv"), mtime_ns=0, size=0, sha256=""
+    )
+    dataset = SalesDataset.from_frame(version, frame)
+    monkeypatch.setattr(dto, "category_index", lambda: dataset.categories)
+    filters = Filters(
+        date_range=DateRange(
+            start_date=date(2023, 3, 2), end_date=date(2023, 3, 4)
+        ),
+        category=["Toys"],
+        product_ids=None,
+    )
+
+    exact = compute_summary(dataset, SummaryRequest(filters=filters))
+    for statistics in exact.values():
+        del statistics["mode"]
+    approximate = compute_summary(
+        dataset, SummaryRequest(filters=filters, approximate=True)
+    )
+
+    assert list(approximate) == list(exact)
+    for column, statistics in approximate.items():
+        assert statistics.pop("rank_error") is not None
+        assert statistics["mean"] == pytest.approx(exact[column]["mean"])
+        assert statistics["median"] == pytest.approx(
+            exact[column]["median"], rel=0.05
+        )
+        assert list(statistics) == list(exact[column])
@@ -0,0 +1,102 @@
+"""Tests for the mergeable accumulators of streamed sales data."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.apps.sales.const import QUANTILE_SKETCH_SIZE
+from src.apps.sales.streaming import ColumnAccumulator
+from src.core.settings import settings
+
+CHUNK_SIZE = 500
+
+
+def test_accumulator_merges_exactly() -> None:
+    """Test chunks folded together match the statistics of all the values."""
+
+    rng = np.random.default_rng(3)
+    # few enough values for the quantile sketch to keep them all
+    values = rng.integers(0, 40, 2 * QUANTILE_SKETCH_SIZE).astype(np.float64)
+    values[rng.random(len(values)) < 0.1] = np.nan  # noqa: PLR2004
+
+    accumulator = ColumnAccumulator()
+    for start in range(0, len(values), CHUNK_SIZE // 5):
+        chunk = values[start : start + CHUNK_SIZE // 5]
+        accumulator.merge(ColumnAccumulator.from_values(chunk))
+
+    summary = accumulator.summarize(["mean", "std_dev", "mode", "median"])
+
+    expected = pd.Series(values).dropna()
+    assert summary == {
+        "mean": pytest.approx(expected.mean()),
+        "std_dev": pytest.approx(expected.std()),
+        "mode": expected.mode()[0],
+        "median": expected.median(),
+        "rank_error": 0.0,
+    }
+
+
+def test_accumulator_bounds_quantile_rank_error() -> None:
+    """Test compressed chunks report the rank error of their quantiles."""
+
+    rng = np.random.default_rng(5)
+    chunks = [rng.normal(0, 1, 4000) for _ in range(3)]
+
+    accumulator = ColumnAccumulator()
+    for chunk in chunks:
+        accumulator.merge(ColumnAccumulator.from_values(chunk))
+
+    summary = accumulator.summarize(["percentile_25"])
+
+    values = np.sort(np.concatenate(chunks))
+    rank_error = float(summary["rank_error"] or 0.0)
+    percentile_25 = float(summary["percentile_25"] or 0.0)
+    rank = values.searchsorted(percentile_25) / len(values)
+    # the error of the chunk sketches, then of compacting their samples
+    assert rank_error == pytest.approx(2 / QUANTILE_SKETCH_SIZE)
+    assert abs(rank - 0.25) <= rank_error
+
+
+def test_accumulator_compacts_quantile_samples() -> None:
+    """Test the samples kept stay bounded whatever the number of chunks."""
+
+    rng = np.random.default_rng(11)
+    chunks = [rng.normal(0, 1, CHUNK_SIZE) for _ in range(40)]
+
+    accumulator = ColumnAccumulator()
+    for chunk in chunks:
+        accumulator.merge(ColumnAccumulator.from_values(chunk))
+
+    summary = accumulator.summarize(["median"])
+
+    values = np.sort(np.concatenate(chunks))
+    rank = values.searchsorted(float(summary["median"] or 0.0)) / len(values)
+    assert sum(map(len, accumulator.samples)) <= 2 * QUANTILE_SKETCH_SIZE
+    assert abs(rank - 0.5) <= float(summary["rank_error"] or 0.0)
+
+
+def test_accumulator_bounds_mode_histogram(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test the histogram keeps the frequent values of many distinct ones."""
+
+    monkeypatch.setattr(settings, "stream_mode_values", 10)
+    rng = np.random.default_rng(7)
+    values = np.concatenate([np.arange(2000.0), np.full(500, 1234.5)])
+    rng.shuffle(values)
+
+    accumulator = ColumnAccumulator()
+    for start in range(0, len(values), CHUNK_SIZE):
+        chunk = values[start : start + CHUNK_SIZE]
+        accumulator.merge(ColumnAccumulator.from_values(chunk))
+
+    assert len(accumulator.histogram) <= 10  # noqa: PLR2004
+    assert accumulator.summarize(["mode"]) == {"mode": 1234.5}
+
+
+def test_accumulator_without_values() -> None:
+    """Test missing values are not counted."""
+
+    accumulator = ColumnAccumulator.from_values(np.array([np.nan]))
+
+    assert accumulator.count == 0
@@ -0,0 +1,62 @@
+"""Tests for the warm-up of the sales app."""
+
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+
+from src.apps.sales.cache import summary_cache
+from src.apps.sales.data_utils import DatasetChangedError
+from src.apps.sales.warmup import warm_up
+from src.core.executor import ComputeOverloadedError
+
+
+def test_warm_up_fills_the_summary_cache(
+    sales_file: Path,  # noqa: ARG001
+) -> None:
+    """Test the warm-up summaries are left in the summary cache."""
+
+    summary_cache.clear()
+
+    assert asyncio.run(warm_up())
+
+    expected_summaries = 3
+    assert len(summary_cache) == expected_summaries
+
+
+def test_warm_up_fails_without_data(
+    sales_file: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test a file that cannot be loaded fails the warm-up."""
+
+    sales_file.unlink()
+
+    assert not asyncio.run(warm_up())
+    assert "Warming up failed" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        TimeoutError,
+        ComputeOverloadedError,
+        DatasetChangedError,
+        BrokenProcessPool,
+    ],
+)
+def test_warm_up_summaries_are_best_effort(
+    sales_file: Path,  # noqa: ARG001
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+    error: type[Exception],
+) -> None:
+    """Test a summary failing to compute still warms the data up."""
+
+    async def _fail(*_args: object) -> None:
+        raise error
+
+    monkeypatch.setattr("src.apps.sales.warmup.summarize", _fail)
+
+    assert asyncio.run(warm_up())
+    assert "Warm-up summaries did not complete" in caplog.text
@@ -0,0 +1,71 @@
+"""Tests for the background reloading of the sales data."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.apps.sales import data_utils
+from src.apps.sales.data_utils import get_dataset, get_sales_source, watching
+from src.apps.sales.watcher import reload_sales_data, watch_sales_data
+from src.core.settings import settings
+from src.tests.conftest import CSV_HEADER
+
+
+def test_failed_reload_keeps_the_snapshot(
+    sales_file: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test a file that cannot be loaded leaves the snapshot published."""
+
+    dataset = get_dataset()
+    sales_file.write_text("")
+
+    reload_sales_data()
+
+    assert data_utils._snapshot is dataset  # noqa: SLF001
+    assert "Reloading" in caplog.text
+
+
+def test_requests_do_not_reload_while_watched(sales_file: Path) -> None:
+    """Test the published snapshot is served while a watcher reloads."""
+
+    dataset = get_dataset()
+    sales_file.write_text(CSV_HEADER + "2023-01-02,1002,Clothing,20,15.0\n")
+
+    with watching():
+        assert get_sales_source() is dataset
+    assert get_sales_source() is not dataset
+
+
+async def _wait_for_rows(expected_rows: int) -> None:
+    """Wait until the published snapshot has the expected number of rows."""
+
+    while True:
+        snapshot = data_utils._snapshot  # noqa: SLF001
+        if (
+            snapshot is not None
+            and snapshot.version.path == settings.sales_data
+            and len(snapshot.frame) == expected_rows
+        ):
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.parametrize("interval", [0.05, 60.0])
+def test_watcher_publishes_changes(sales_file: Path, interval: float) -> None:
+    """Test the watcher loads the file and publishes its changes."""
+
+    async def scenario() -> None:
+        watcher = asyncio.create_task(watch_sales_data(interval))
+        await asyncio.wait_for(_wait_for_rows(2), timeout=5)
+
+        # with a long interval the change is only seen through inotify
+        sales_file.write_text(CSV_HEADER + "2023-01-02,1002,Clothing,20,15.0\n")
+        await asyncio.wait_for(_wait_for_rows(1), timeout=5)
+
+        watcher.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await watcher
+
+    asyncio.run(scenario())
+    assert not data_utils._watched.is_set()  # noqa: SLF001
@@ -0,0 +1,41 @@
+"""Tests for the synthetic sales data generator."""
+
+from pathlib import Path
+
+import pandas as pd
+
+from src.apps.sales.const import EXPECTED_COLUMNS
+from src.benchmarks.generator import (
+    CATEGORIES,
+    generate_sales_data,
+    product_count,
+)
+
+
+def test_generate_sales_data_is_deterministic(tmp_path: Path) -> None:
+    """Test the same rows and seed always give the same file."""
+
+    first = generate_sales_data(tmp_path / "first.csv", 2_500, chunk_rows=1_000)
+    second = generate_sales_data(
+        tmp_path / "second.csv", 2_500, chunk_rows=1_000
+    )
+    other = generate_sales_data(tmp_path / "other.csv", 2_500, seed=1)
+
+    assert first.read_bytes() == second.read_bytes()
+    assert first.read_bytes() != other.read_bytes()
+
+
+def test_generate_sales_data_shape(tmp_path: Path) -> None:
+    """Test the file has the sales columns, in date order, one category each."""
+
+    rows = 5_000
+    path = generate_sales_data(tmp_path / "sales.csv", rows, chunk_rows=2_000)
+    frame = pd.read_csv(path, parse_dates=["date"])
+
+    assert set(frame.columns) == EXPECTED_COLUMNS
+    assert len(frame) == rows
+    assert frame["date"].is_monotonic_increasing
+    assert set(frame["category"]) <= set(CATEGORIES)
+    assert frame["product_id"].nunique() <= product_count(rows)
+    assert (frame.groupby("product_id")["category"].nunique() == 1).all()
+    assert not list(tmp_path.glob("*.partial"))
@@ -0,0 +1,40 @@
+"""Tests for the benchmark harness."""
+
+from pathlib import Path
+
+import pytest
+
+from src.benchmarks import harness
+
+
+def test_regressions() -> None:
+    """Test only slowdowns past both the threshold and the noise floor."""
+
+    baselines = {"slower": 0.010, "noise": 0.0001, "faster": 0.010}
+    results = {"slower": 0.020, "noise": 0.0003, "faster": 0.005, "new": 1.0}
+
+    assert harness.regressions(results, baselines, threshold=0.25) == ["slower"]
+
+
+def test_main_updates_and_checks_baselines(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test a run is stored as baseline, then checked against it."""
+
+    monkeypatch.setattr(harness, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(harness, "BASELINES", tmp_path / "baselines.json")
+    args = ["--rows", "2000", "--repeat", "1", "--only", "filter_data"]
+
+    assert harness.main([*args, "--update"]) == 0
+    assert "filter_data[all]" in capsys.readouterr().out
+    assert "filter_data[none]" in (tmp_path / "baselines.json").read_text()
+
+    # every run is far slower than a baseline of zero seconds
+    monkeypatch.setattr(harness, "NOISE_FLOOR", -1.0)
+    (tmp_path / "baselines.json").write_text(
+        '{"2000": {"filter_data[all]": 0.0}}'
+    )
+    assert harness.main(args) == 1
+    assert "SLOW" in capsys.readouterr().out
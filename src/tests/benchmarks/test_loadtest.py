@@ -0,0 +1,101 @@
+"""Tests for the load test of the summary endpoint."""
+
+import asyncio
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+import httpx
+import pytest
+
+from main import app
+from src.benchmarks.loadtest import (
+    LoadProfile,
+    LoadTestResult,
+    percentile,
+    report,
+    run_load,
+    stage_timings,
+)
+from src.core.settings import settings
+
+
+def test_percentile() -> None:
+    """Test the nearest-rank percentile."""
+
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+
+    assert percentile(values, 0.5) == 3.0  # noqa: PLR2004
+    assert percentile(values, 0.99) == 5.0  # noqa: PLR2004
+    assert percentile(values, 0.0) == 1.0
+
+
+def test_stage_timings() -> None:
+    """Test the stage timings are the difference between two scrapes."""
+
+    before = (
+        'sales_stage_seconds_sum{stage="filter_data"} 1.0\n'
+        'sales_stage_seconds_count{stage="filter_data"} 10\n'
+    )
+    after = (
+        'sales_stage_seconds_sum{stage="filter_data"} 2.0\n'
+        'sales_stage_seconds_count{stage="filter_data"} 14\n'
+        'sales_stage_seconds_sum{stage="serialize"} 0.5\n'
+        'sales_stage_seconds_count{stage="serialize"} 5\n'
+    )
+
+    assert stage_timings(before, after) == {
+        "filter_data": (4, 0.25),
+        "serialize": (5, 0.1),
+    }
+
+
+def test_report() -> None:
+    """Test the report has the throughput, percentiles and histogram."""
+
+    result = LoadTestResult(
+        seconds=2.0,
+        latencies=[0.004, 0.004, 0.015],
+        errors=Counter({"503": 1}),
+    )
+
+    text = report(result, {"filter_data": (3, 0.001)})
+
+    assert "requests     4 in 2.0 s" in text
+    assert "throughput   1.5 req/s" in text
+    assert "errors       1  503: 1" in text
+    assert "p50 4.0" in text
+    assert "<= 5 ms        2" in text
+    assert "filter_data" in text
+
+
+@pytest.mark.parametrize("rate", [0.0, 50.0])
+def test_run_load(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, rate: float
+) -> None:
+    """Test the mix is replayed against the app, closed or open loop."""
+
+    file_path = tmp_path / "sales_data.csv"
+    file_path.write_text(
+        "date,product_id,category,quantity_sold,price_per_unit\n"
+        "2023-01-01,1001,Electronics,10,5.0\n"
+        "2023-01-02,1002,Clothing,20,7.0\n"
+    )
+    monkeypatch.setattr(settings, "sales_data", file_path)
+    mix: list[dict[str, Any]] = [
+        {"weight": 2, "request": {}},
+        {"request": {"filters": {"category": ["Unknown"]}}},
+    ]
+
+    async def scenario() -> LoadTestResult:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            return await run_load(
+                client, mix, LoadProfile(duration=0.2, concurrency=2, rate=rate)
+            )
+
+    result = asyncio.run(scenario())
+
+    assert result.latencies
+    assert set(result.errors) == {"422"}
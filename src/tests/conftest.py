@@ -0,0 +1,24 @@
+"""Fixtures shared by the tests."""
+
+from pathlib import Path
+
+import pytest
+
+from src.core.settings import settings
+
+CSV_HEADER = "date,product_id,category,quantity_sold,price_per_unit\n"
+
+
+@pytest.fixture
+def sales_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Fixture providing a small sales data file set in the settings."""
+
+    file_path = tmp_path / "sales_data.csv"
+    file_path.write_text(
+        CSV_HEADER
+        + "2023-01-01,1001,Electronics,10,5.0\n"
+        + "2023-01-15,1002,Clothing,20,15.0\n"
+    )
+    monkeypatch.setattr(settings, "sales_data", file_path)
+    monkeypatch.setattr(settings, "columnar_cache", False)
+    return file_path
@@ -0,0 +1,129 @@
+"""Tests for the compute executor."""
+
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.apps.sales.data_utils import SalesDataset, get_dataset
+from src.core.executor import ComputeExecutor, ComputeOverloadedError
+from src.core.metrics import stage_seconds
+
+
+@stage_seconds.timed("executor_test")
+def _timed_stage() -> int:
+    """Return a result after a stage timed in the worker."""
+
+    return 42
+
+
+def _rows(dataset: SalesDataset) -> int:
+    """Return the number of rows of a dataset."""
+
+    return len(dataset.frame)
+
+
+def _load_count() -> int:
+    """Return the number of dataset loads recorded."""
+
+    prefix = 'sales_stage_seconds_count{stage="load"} '
+    return next(
+        (
+            int(line.removeprefix(prefix))
+            for line in stage_seconds.render()
+            if line.startswith(prefix)
+        ),
+        0,
+    )
+
+
+def test_compute_executor_runs_off_the_event_loop() -> None:
+    """Test the call runs in a worker thread and returns its result."""
+
+    executor = ComputeExecutor(
+        kind="thread", workers=1, queue_depth=0, timeout=5
+    )
+
+    thread_name = asyncio.run(
+        executor.run(lambda: threading.current_thread().name)
+    )
+    executor.shutdown()
+
+    assert thread_name.startswith("compute")
+    assert executor.in_flight == 0
+
+
+def test_compute_executor_rejects_when_full() -> None:
+    """Test calls beyond the workers and queue depth are rejected."""
+
+    executor = ComputeExecutor(
+        kind="thread", workers=1, queue_depth=0, timeout=5
+    )
+    release = threading.Event()
+
+    async def _run() -> None:
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(ComputeOverloadedError):
+                await executor.run(release.wait)
+        finally:
+            release.set()
+            await running
+
+    asyncio.run(_run())
+    executor.shutdown()
+
+
+def test_compute_executor_times_out() -> None:
+    """Test a call running longer than the timeout raises TimeoutError."""
+
+    executor = ComputeExecutor(
+        kind="thread", workers=1, queue_depth=0, timeout=0.01
+    )
+    release = threading.Event()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(executor.run(release.wait))
+
+    release.set()
+    executor.shutdown()
+
+
+def test_compute_executor_records_worker_process_stages() -> None:
+    """Test stages timed in a worker process are recorded by the parent."""
+
+    executor = ComputeExecutor(
+        kind="process", workers=1, queue_depth=0, timeout=30
+    )
+
+    result = asyncio.run(executor.run(_timed_stage))
+    executor.shutdown()
+
+    assert result == 42  # noqa: PLR2004
+    assert 'sales_stage_seconds_count{stage="executor_test"} 1' in (
+        stage_seconds.render()
+    )
+
+
+def test_compute_executor_records_worker_process_loads(
+    sales_file: Path,  # noqa: ARG001
+) -> None:
+    """Test a dataset loaded by a worker process to unpickle it is recorded."""
+
+    executor = ComputeExecutor(
+        kind="process", workers=1, queue_depth=0, timeout=30
+    )
+
+    async def _run() -> tuple[int, int]:
+        # the worker is started before the dataset is loaded here
+        await executor.run(_timed_stage)
+        dataset = get_dataset()
+        loads = _load_count()
+        return await executor.run(_rows, dataset), _load_count() - loads
+
+    rows, loads = asyncio.run(_run())
+    executor.shutdown()
+
+    assert (rows, loads) == (2, 1)
@@ -0,0 +1,76 @@
+"""Tests for the health probes and the application lifespan."""
+
+import time
+from http.client import OK, SERVICE_UNAVAILABLE
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.core.settings import settings
+from src.tests.conftest import CSV_HEADER
+
+
+@pytest.fixture
+def sales_file(sales_file: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Fixture providing a watched sales data file, written by the tests."""
+
+    sales_file.unlink()
+    monkeypatch.setattr(settings, "watch_interval", 0.05)
+    return sales_file
+
+
+def _wait_until_ready(client: TestClient) -> int:
+    """Return the readiness status once ready, or after a few seconds."""
+
+    deadline = time.monotonic() + 5
+    status = client.get("/healthz/ready").status_code
+    while status != OK and time.monotonic() < deadline:
+        time.sleep(0.01)
+        status = client.get("/healthz/ready").status_code
+    return status
+
+
+def test_live_without_lifespan() -> None:
+    """Test the liveness probe answers while the app is not ready."""
+
+    client = TestClient(app)
+
+    assert client.get("/healthz/live").json() == {"status": "live"}
+    assert client.get("/healthz/ready").status_code == SERVICE_UNAVAILABLE
+
+
+def test_ready_after_warm_up(sales_file: Path) -> None:
+    """Test the app gets ready once the sales data could be loaded."""
+
+    with TestClient(app) as client:
+        # the missing file keeps the app from getting ready
+        time.sleep(0.1)
+        assert client.get("/healthz/ready").status_code == SERVICE_UNAVAILABLE
+        assert client.get("/healthz/live").status_code == OK
+
+        sales_file.write_text(
+            CSV_HEADER + "2023-01-01,1001,Electronics,10,5.0\n"
+        )
+
+        assert _wait_until_ready(client) == OK
+
+    assert client.get("/healthz/ready").status_code == SERVICE_UNAVAILABLE
+
+
+@pytest.mark.parametrize("error", [TimeoutError, RuntimeError])
+def test_ready_when_warm_up_summaries_fail(
+    sales_file: Path, monkeypatch: pytest.MonkeyPatch, error: type[Exception]
+) -> None:
+    """Test a warm-up summary failing neither blocks nor fails the app."""
+
+    sales_file.write_text(CSV_HEADER + "2023-01-01,1001,Electronics,10,5.0\n")
+
+    async def _fail(*_args: object) -> None:
+        raise error
+
+    monkeypatch.setattr("src.apps.sales.warmup.summarize", _fail)
+
+    with TestClient(app) as client:
+        assert _wait_until_ready(client) == OK
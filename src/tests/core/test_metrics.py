@@ -0,0 +1,114 @@
+"""Tests for the Prometheus metrics of the application."""
+
+from http.client import OK
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.core.metrics import Counter, Gauge, Histogram, MetricsRegistry
+from src.core.settings import settings
+
+
+def test_histogram_render() -> None:
+    """Test a histogram renders cumulative buckets, sum and count."""
+
+    histogram = Histogram(
+        "stage_seconds", "Stage durations.", "stage", (0.1, 1)
+    )
+    histogram.observe("load", 0.05)
+    histogram.observe("load", 0.5)
+    histogram.observe("load", 5.0)
+
+    assert histogram.render() == [
+        "# HELP stage_seconds Stage durations.",
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="load",le="0.1"} 1',
+        'stage_seconds_bucket{stage="load",le="1"} 2',
+        'stage_seconds_bucket{stage="load",le="+Inf"} 3',
+        'stage_seconds_sum{stage="load"} 5.55',
+        'stage_seconds_count{stage="load"} 3',
+    ]
+
+
+def test_histogram_timed() -> None:
+    """Test decorated calls are timed, including the ones that raise."""
+
+    histogram = Histogram("stage_seconds", "Stage durations.", "stage")
+
+    @histogram.timed("fail")
+    def fail() -> None:
+        raise ValueError
+
+    with pytest.raises(ValueError):  # noqa: PT011
+        fail()
+
+    assert 'stage_seconds_count{stage="fail"} 1' in histogram.render()
+
+
+def test_histogram_collected() -> None:
+    """Test values observed while collecting are returned, not recorded."""
+
+    histogram = Histogram("stage_seconds", "Stage durations.", "stage")
+
+    with histogram.collected() as observations:
+        histogram.observe("load", 0.5)
+    histogram.observe("load", 1.0)
+
+    assert observations == [("load", 0.5)]
+    assert 'stage_seconds_count{stage="load"} 1' in histogram.render()
+
+
+def test_registry_render() -> None:
+    """Test the registry renders counters and gauges sorted by name."""
+
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("responses", "Responses.", "code"))
+    registry.register(Gauge("depth", "Queue depth.", lambda: 3))
+    counter.inc("200")
+    counter.inc("200")
+    counter.inc('a"b')
+
+    assert registry.render() == (
+        "# HELP depth Queue depth.\n"
+        "# TYPE depth gauge\n"
+        "depth 3\n"
+        "# HELP responses Responses.\n"
+        "# TYPE responses counter\n"
+        'responses{code="200"} 2\n'
+        'responses{code="a\\"b"} 1\n'
+    )
+
+
+def test_metrics_endpoint(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the endpoint exposes the stages and responses of a summary."""
+
+    file_path = tmp_path / "sales_data.csv"
+    file_path.write_text(
+        "date,product_id,category,quantity_sold,price_per_unit\n"
+        "2023-01-01,1001,Electronics,10,5.0\n"
+        "2023-01-02,1002,Electronics,20,7.0\n"
+    )
+    monkeypatch.setattr(settings, "sales_data", file_path)
+    client = TestClient(app)
+
+    client.post("/summary", json={"filters": {"category": ["Electronics"]}})
+    response = client.get("/metrics")
+
+    assert response.status_code == OK
+    assert response.headers["content-type"].startswith("text/plain")
+    for line in (
+        'sales_stage_seconds_count{stage="filter_data"}',
+        'sales_stage_seconds_count{stage="compute_statistics"}',
+        'sales_stage_seconds_count{stage="validate_categories"}',
+        'sales_stage_seconds_count{stage="serialize"}',
+        'http_responses_total{code="200"}',
+        "sales_dataset_rows 2",
+        "sales_summary_cache_hit_ratio",
+        "compute_executor_queue_depth 0",
+        "process_resident_memory_bytes",
+    ):
+        assert line in response.text
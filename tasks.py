@@ -104,6 +104,55 @@ def shell(c):
     c.run(f"{docker_command} exec web poetry run python manage.py shell", pty=True)
 
 
+@task
+def generate_data(c, rows=1_000_000, seed=0, path="sales_data.csv"):
+    """Generate a deterministic synthetic sales data file."""
+    c.run(
+        f"python -m src.benchmarks.generator {path} --rows {rows} --seed {seed}",
+        pty=True,
+    )
+
+
+@task
+def bench(c, rows=100_000, seed=0, repeat=5, threshold=0.25, only="", update=False):
+    """Run the benchmarks, failing on regressions past the stored baselines."""
+    command = (
+        f"python -m src.benchmarks.harness --rows {rows} --seed {seed} "
+        f"--repeat {repeat} --threshold {threshold}"
+    )
+    if only:
+        command += f" --only '{only}'"
+    if update:
+        command += " --update"
+    c.run(command, pty=True)
+
+
+@task
+def loadtest(
+    c,
+    rows=1_000_000,
+    duration=10.0,
+    concurrency=16,
+    rate=0.0,
+    seed=0,
+    mix="",
+    url="",
+    no_cache=False,
+):
+    """Load test /summary, on a locally started app unless url is given."""
+    command = (
+        f"python -m src.benchmarks.loadtest --rows {rows} --duration {duration} "
+        f"--concurrency {concurrency} --rate {rate} --seed {seed}"
+    )
+    if mix:
+        command += f" --mix '{mix}'"
+    if url:
+        command += f" --url '{url}'"
+    if no_cache:
+        command += " --no-cache"
+    c.run(command, pty=True)
+
+
 @task
 def server(c):
     """Run the server."""